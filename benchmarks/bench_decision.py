@@ -0,0 +1,83 @@
+"""
+Benchmark the columnar decision engine against the per-group reference.
+
+    python -m benchmarks.bench_decision --series 1000 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import decision
+
+
+def synthetic_forecast(n_series: int, n_days: int = 60, seed: int = 0) -> pd.DataFrame:
+    """Forecast-shaped frame with uneven history lengths, volatile series and zero demand."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-01-01", periods=n_days, freq="D")
+
+    # Some series start late (short history), a few have a demand spike in the last week
+    start = np.where(rng.random(n_series) < 0.1, rng.integers(0, n_days, n_series), 0)
+    lengths = n_days - start
+    series = np.repeat(np.arange(n_series), lengths)
+    day = np.concatenate([np.arange(s, n_days) for s in start])
+
+    base = np.repeat(rng.integers(0, 60, n_series), lengths)
+    spike = np.repeat(rng.random(n_series) < 0.05, lengths) & (day >= n_days - 7)
+    units = rng.poisson(base * np.where(spike, 3.0, 1.0))
+    target = np.r_[units[1:], 0].astype(np.float64)
+    prediction = target + rng.normal(0, np.sqrt(base + 1) * rng.choice([0.5, 3.0], len(day)))
+
+    df = pd.DataFrame({
+        "date": dates[day],
+        "sku": np.char.add("SKU_", (series // 2).astype(str)),
+        "channel": np.where(series % 2 == 0, "retail", "online"),
+        "units_sold": units,
+        "target_units_next_day": target,
+        "prediction": prediction,
+    })
+    df["abs_error"] = (df["target_units_next_day"] - df["prediction"]).abs()
+    return df
+
+
+def reference_metrics(recent: pd.DataFrame) -> pd.DataFrame:
+    return recent.groupby(["sku", "channel"]).apply(decision.compute_group_metrics).reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--series", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--reference-max", type=int, default=10_000,
+                        help="Only time the per-group reference up to this many series")
+    args = parser.parse_args(argv)
+
+    print(f"{'series':>8} {'rows':>10} {'metrics_s':>10} {'rules_s':>9} {'report_s':>9} {'reference_s':>12} {'match':>6}")
+    for n_series in args.series:
+        df = synthetic_forecast(n_series)
+        recent = df[df["date"] >= df["date"].max() - pd.Timedelta(days=28)]
+
+        t0 = time.perf_counter()
+        metrics = decision.compute_metrics(recent)
+        t_metrics = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        decision.apply_policy(metrics)
+        t_rules = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        decision.build_decision_report(df)
+        t_report = time.perf_counter() - t0
+
+        t_ref, match = float("nan"), "-"
+        if n_series <= args.reference_max:
+            t0 = time.perf_counter()
+            ref = reference_metrics(recent)
+            t_ref = time.perf_counter() - t0
+            match = str(ref.equals(metrics))
+
+        print(f"{n_series:>8} {len(df):>10} {t_metrics:>10.3f} {t_rules:>9.3f} {t_report:>9.3f} {t_ref:>12.3f} {match:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Read latency and memory of stage inputs from parquet vs the memory-mapped Arrow IPC mirror.
+
+Builds features and forecast datasets with --replicate renamed copies of every series in
+the current artifacts (written through src.store with their IPC mirrors) in a temp dir.
+Each read runs in a fresh interpreter, so RSS is that read's alone: RssAnon is memory the
+read allocated, RssFile is mapped file pages it touched (shared with the page cache).
+
+    python -m benchmarks.bench_ipc --replicate 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from src import store
+
+READ_CODE = """
+import json, sys, time
+from pathlib import Path
+def rss():
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return {k: int(fields[k].split()[0]) / 1024 for k in ("RssAnon", "RssFile")}
+from src import store
+root, artifact, kwargs = Path(sys.argv[1]), sys.argv[2], json.loads(sys.argv[3])
+before = rss()
+t0 = time.perf_counter()
+df = store.read(root, artifact, **kwargs)
+first = time.perf_counter() - t0
+after = rss()
+warm = []
+for _ in range(3):
+    t0 = time.perf_counter()
+    store.read(root, artifact, **kwargs)
+    warm.append(time.perf_counter() - t0)
+print(json.dumps({"rows": len(df), "first_s": first, "warm_s": min(warm),
+                  "anon_mb": after["RssAnon"] - before["RssAnon"], "file_mb": after["RssFile"] - before["RssFile"]}))
+"""
+
+
+def replicate(df: pd.DataFrame, n: int) -> pd.DataFrame:
+    df = df.astype({"sku": "str"})
+    return pd.concat([df.assign(sku=df["sku"] + f"_{i:04d}") for i in range(n)], ignore_index=True)
+
+
+def measure(root: Path, artifact: str, kwargs: dict, ipc: bool) -> dict:
+    env = {**os.environ, store.IPC_ENV: "1" if ipc else "0"}
+    out = subprocess.run([sys.executable, "-c", READ_CODE, str(root), artifact, json.dumps(kwargs)],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicate", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        roots = {}
+        for artifact, src_root in [("features", store.FEATURES_FILE), ("forecast", store.FORECAST_FILE)]:
+            df = replicate(store.read(src_root, artifact), args.replicate)
+            root = Path(tmp) / f"{artifact}.parquet"
+            store.write_partitioned(df, root, artifact, name="bench", mirror=True)
+            roots[artifact] = root
+            size = lambda paths: sum(p.stat().st_size for p in paths) / 2**20
+            print(f"{artifact}: {len(df):,} rows, parquet {size(root.rglob('*.parquet')):.1f} MB, "
+                  f"ipc {size(store.ipc_path(root).rglob('*.arrow')):.1f} MB")
+
+        _, today = store.date_bounds(roots["forecast"])
+        cases = [
+            ("features", "full (train)", {}),
+            ("forecast", "full (rollup, series file)", {}),
+            ("forecast", "today (reorder)", {"since": str(today.date())}),
+            ("forecast", "last 28 days (decision)", {"since": str((today - pd.Timedelta(days=28)).date())}),
+        ]
+        print(f"\n{'read':<38} {'format':<8} {'rows':>10} {'first_ms':>9} {'warm_ms':>9} {'anon_mb':>8} {'file_mb':>8}")
+        for artifact, label, kwargs in cases:
+            for fmt, ipc in [("parquet", False), ("ipc", True)]:
+                r = measure(roots[artifact], artifact, kwargs, ipc)
+                print(f"{artifact + ' ' + label:<38} {fmt:<8} {r['rows']:>10,} {r['first_s'] * 1000:>9.1f} "
+                      f"{r['warm_s'] * 1000:>9.1f} {r['anon_mb']:>8.1f} {r['file_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Overview page cost per interaction: filtering raw forecast rows vs the error rollup.
+
+Replicates every series in the current forecast --replicate times, then times one
+page refresh (KPIs, top SKUs, daily error) for a few date ranges both ways. The
+rollup build is timed separately; the page pays it once per predict run.
+
+    python -m benchmarks.bench_rollup --replicate 200
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import rollup, store
+
+
+def timed(fn, repeat: int = 3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def raw_refresh(df: pd.DataFrame, start, end, channel: str):
+    """What the page used to do on every interaction (after reading the slice)."""
+    m = (df["date"] >= start) & (df["date"] <= end)
+    if channel != rollup.ALL_CHANNELS:
+        m &= df["channel"] == channel
+    f = df[m].assign(abs_err=lambda x: np.abs(x["target_units_next_day"] - x["prediction"]))
+    y = f["target_units_next_day"].to_numpy()
+    kpis = (float(f["abs_err"].mean()), float(f["abs_err"].sum() / np.abs(y).sum()), len(f))
+    top = f.groupby("sku", observed=True, as_index=False)["abs_err"].sum().nlargest(10, "abs_err")
+    daily = f.groupby("date", as_index=False)["abs_err"].mean()
+    return kpis, top, daily
+
+
+def rollup_refresh(cube: pd.DataFrame, prefix: dict, start, end, channel: str):
+    kpis = rollup.range_kpis(prefix, start, end, channel)
+    return kpis, rollup.top_skus(cube, start, end, channel), rollup.daily_error(prefix, start, end, channel)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicate", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    base = store.read_forecast().astype({"sku": "str"})
+    df = pd.concat([base.assign(sku=base["sku"] + f"_{i:04d}") for i in range(args.replicate)], ignore_index=True)
+    df = df.astype({"sku": "category"})
+
+    seconds, cube = timed(lambda: rollup.build_cube(df), repeat=1)
+    prefix = rollup.build_prefix(cube)
+    print(f"forecast rows={len(df):,}  cube rows={len(cube):,}  rollup build {seconds:.2f}s")
+
+    last = df["date"].max()
+    ranges = {
+        "all history, All": (df["date"].min(), last, rollup.ALL_CHANNELS),
+        "last 90 days, online": (last - pd.Timedelta(days=89), last, "online"),
+        "last 7 days, retail": (last - pd.Timedelta(days=6), last, "retail"),
+    }
+    print(f"{'range':<24} {'raw ms':>10} {'rollup ms':>10} {'|mae diff|':>12}")
+    for name, (start, end, channel) in ranges.items():
+        t_raw, (raw_kpis, _, _) = timed(lambda: raw_refresh(df, start, end, channel))
+        t_new, (kpis, _, _) = timed(lambda: rollup_refresh(cube, prefix, start, end, channel))
+        print(f"{name:<24} {t_raw * 1000:10.1f} {t_new * 1000:10.1f} {abs(raw_kpis[0] - kpis['mae']):12.2e}")
+
+
+if __name__ == "__main__":
+    main()
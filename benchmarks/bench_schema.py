@@ -0,0 +1,98 @@
+"""
+Before/after report for the typed artifact schema (config.ARTIFACT_SCHEMAS).
+
+For each parquet artifact in data/processed, writes a "before" copy with the dtypes
+pandas used to infer (plain strings, int64, float64; unsorted) and an "after" copy via
+src.schema, then reports file size, in-memory size and the RSS growth of reading each
+copy in a fresh process (Linux: RSS comes from /proc/self/statm).
+
+    python -m benchmarks.bench_schema                 # artifacts as they are
+    python -m benchmarks.bench_schema --replicate 50  # 50 renamed copies of every series
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import schema, store
+from src.config import ARTIFACT_SCHEMAS, PROCESSED
+
+ARTIFACT_FILES = {
+    "clean_sales": PROCESSED / "clean_sales.parquet",
+    "features": PROCESSED / "features.parquet",
+    "forecast": PROCESSED / "forecast.parquet",
+    "forecast_horizon": PROCESSED / "forecast_horizon.parquet",
+}
+
+LEGACY_DTYPES = {"category": "str", "int8": "int64", "int16": "int64", "int32": "int64", "float32": "float64"}
+
+# Current (not peak) RSS: a child's ru_maxrss starts at the parent's peak after fork/exec
+READ_SNIPPET = """
+import os, sys, json
+import pandas as pd
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+before = rss()
+df = pd.read_parquet(sys.argv[1])
+after = rss()
+print(json.dumps({"rss_mb": (after - before) / 2**20, "mem_mb": df.memory_usage(deep=True).sum() / 2**20}))
+"""
+
+
+def legacy(df: pd.DataFrame, artifact: str) -> pd.DataFrame:
+    spec = ARTIFACT_SCHEMAS[artifact]
+    return df.astype({c: LEGACY_DTYPES.get(spec[c], spec[c]) for c in df.columns if c in spec})
+
+
+def replicate(df: pd.DataFrame, k: int) -> pd.DataFrame:
+    if k <= 1:
+        return df
+    df = df.astype({"sku": "str"})
+    return pd.concat([df.assign(sku=df["sku"] + f"_{i:04d}") for i in range(k)], ignore_index=True)
+
+
+def measure(path: Path) -> dict:
+    out = subprocess.run([sys.executable, "-c", READ_SNIPPET, str(path)], capture_output=True, text=True, check=True)
+    return {"file_mb": path.stat().st_size / 2**20, **json.loads(out.stdout)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicate", type=int, default=1, help="Copies of every series (scales rows and categories)")
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for artifact, path in ARTIFACT_FILES.items():
+            if not path.exists():
+                print(f"skip {artifact}: {path} not found")
+                continue
+            df = replicate(store.read(path, artifact), args.replicate)
+            shuffled = df.sample(frac=1.0, random_state=0)
+
+            before_path = Path(tmp) / f"{artifact}-before.parquet"
+            after_path = Path(tmp) / f"{artifact}-after.parquet"
+            legacy(shuffled, artifact).to_parquet(before_path, index=False)
+            schema.write_parquet(shuffled, after_path, artifact)
+
+            before, after = measure(before_path), measure(after_path)
+            rows.append({"artifact": artifact, "rows": len(df), **{f"{k}_before": v for k, v in before.items()},
+                         **{f"{k}_after": v for k, v in after.items()}})
+
+    report = pd.DataFrame(rows)
+    for metric in ["file_mb", "mem_mb", "rss_mb"]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            report[f"{metric}_saved"] = 1 - report[f"{metric}_after"] / report[f"{metric}_before"]
+
+    pd.set_option("display.width", 200)
+    print(report.round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold-start and latency of the compact scorer vs the pickled sklearn pipeline.
+
+Needs a trained model (`python -m src.train`) and features.
+
+    python -m benchmarks.bench_scorer --batch 1 100 10000 1000000
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.predict import FEATURES_FILE, MODEL_FILE
+from src.scorer import SCORER_FILE, LinearScorer
+
+COLD_START = {
+    "sklearn pipeline": (
+        "import joblib, pandas as pd\n"
+        f"X = pd.read_parquet('{FEATURES_FILE}').head(100)\n"
+        f"joblib.load('{MODEL_FILE}').predict(X)\n"
+    ),
+    "compact scorer": (
+        "import pandas as pd\n"
+        "from src.scorer import LinearScorer\n"
+        f"X = pd.read_parquet('{FEATURES_FILE}').head(100)\n"
+        f"LinearScorer.load('{SCORER_FILE}').predict(X)\n"
+    ),
+}
+
+
+def cold_start(code: str, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def with_edge_cases(X: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Inject missing numerics, missing and unseen categories to exercise imputation paths."""
+    rng = np.random.default_rng(seed)
+    X = X.copy()
+    X["sku"] = X["sku"].astype(object)
+    X.loc[rng.random(len(X)) < 0.05, "units_lag_7"] = np.nan
+    X.loc[rng.random(len(X)) < 0.05, "price"] = np.nan
+    X.loc[rng.random(len(X)) < 0.02, "sku"] = np.nan
+    X.loc[rng.random(len(X)) < 0.02, "sku"] = "UNSEEN_SKU"
+    return X
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 100, 10_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print("Cold start (new interpreter: imports + load + predict 100 rows), median seconds")
+    for name, code in COLD_START.items():
+        print(f"  {name:<18} {cold_start(code, args.repeats):.3f}")
+
+    pipe = joblib.load(MODEL_FILE)
+    scorer = LinearScorer.load(SCORER_FILE)
+    base = with_edge_cases(pd.read_parquet(FEATURES_FILE))
+
+    print("\nWarm predict latency, median seconds")
+    print(f"  {'rows':>9} {'sklearn':>9} {'scorer':>9} {'speedup':>8} {'max_abs_diff':>13}")
+    for n in args.batch:
+        X = base.sample(n, replace=n > len(base), random_state=0)
+        timings = {}
+        for name, model in [("sklearn", pipe), ("scorer", scorer)]:
+            runs = []
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                model.predict(X)
+                runs.append(time.perf_counter() - t0)
+            timings[name] = float(np.median(runs))
+        diff = float(np.max(np.abs(pipe.predict(X) - scorer.predict(X))))
+        print(f"  {n:>9} {timings['sklearn']:>9.4f} {timings['scorer']:>9.4f} "
+              f"{timings['sklearn'] / timings['scorer']:>7.1f}x {diff:>13.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Forecast Explorer cost per selection: store read of one series vs an offset-index slice
+of the memory-mapped series file, plus the chart payload before and after LTTB.
+
+Replicates every series in the current forecast --replicate times (and lengthens each
+series --stretch times) in a temp dir.
+
+    python -m benchmarks.bench_series --replicate 200 --stretch 4
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src import series_file, store
+
+
+def timed(fn, repeat: int = 5):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicate", type=int, default=200)
+    parser.add_argument("--stretch", type=int, default=4, help="Copies of the history laid end to end per series")
+    parser.add_argument("--points", type=int, default=800)
+    args = parser.parse_args(argv)
+
+    base = store.read_forecast().astype({"sku": "str"})
+    plan = store.read_features(columns=series_file.PLAN_COLUMNS).astype({"sku": "str"})
+    span = base["date"].max() - base["date"].min() + pd.Timedelta(days=1)
+
+    def grow(df):
+        df = pd.concat([df.assign(date=df["date"] + k * span) for k in range(args.stretch)], ignore_index=True)
+        return pd.concat([df.assign(sku=df["sku"] + f"_{i:04d}") for i in range(args.replicate)], ignore_index=True)
+
+    df, plan = grow(base), grow(plan)
+    sku, channel = df["sku"].iloc[len(df) // 2], "online"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "forecast.parquet"
+        store.write_partitioned(df, root, "forecast", name="bench")
+        series_file.SERIES_FILE = Path(tmp) / "forecast_series.arrow"
+        series_file.SERIES_INDEX_FILE = Path(tmp) / "forecast_series_index.parquet"
+        series_file.SEGMENTS_DIR = Path(tmp) / "forecast_series_segments"
+        t0 = time.perf_counter()
+        series_file.write(*series_file.build(df, plan))
+        print(f"rows={len(df):,}  series file built in {time.perf_counter() - t0:.2f}s")
+
+        t_store, old = timed(lambda: store.read(root, "forecast", skus=[sku], channels=[channel]).sort_values("date"))
+        tables, index = series_file.open_series()
+        t_slice, new = timed(lambda: series_file.read_series(tables, index, sku, channel))
+        lines = ["target_units_next_day", "prediction"]
+        t_lttb, small = timed(lambda: series_file.downsample(new, lines, args.points))
+
+        print(f"store read (filtered)   {t_store * 1000:8.1f} ms  rows={len(old):,}")
+        print(f"index slice (mmap)      {t_slice * 1000:8.1f} ms  rows={len(new):,}")
+        print(f"LTTB to {args.points} points     {t_lttb * 1000:8.1f} ms  chart points {len(new):,} -> {len(small):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Wall time of the sharded features -> decision run (src.shard) against the number of workers.
+
+Builds clean sales with --replicate renamed copies of every series in the current clean
+sales, next to a copy of models/, in a temp dir, then runs `python -m src.shard` there in
+a fresh process per worker count. Speedup is against one worker (the unsharded stages).
+
+    python -m benchmarks.bench_shard --replicate 200 --workers 1 2 4 8
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src import features, schema
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicate", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Worker counts to run (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--shards-per-worker", type=int, default=1)
+    args = parser.parse_args(argv)
+    cpus = os.cpu_count() or 1
+    workers = args.workers or [w for w in (1, 2, 4, 8, 16, 32, 64) if w <= cpus]
+
+    base = features.load_clean_sales().astype({"sku": "str"})
+    sales = pd.concat([base.assign(sku=base["sku"] + f"_{i:04d}") for i in range(args.replicate)], ignore_index=True)
+    n_series = sales[["sku", "channel"]].drop_duplicates().shape[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processed = Path(tmp) / features.CLEAN_PARQUET.parent
+        processed.mkdir(parents=True)
+        schema.write_parquet(sales, Path(tmp) / features.CLEAN_PARQUET, "clean_sales")
+        shutil.copytree(ROOT / "models", Path(tmp) / "models")
+        del base, sales
+
+        env = {**os.environ, "PYTHONPATH": str(ROOT)}
+        print(f"{n_series:,} series, {cpus} CPU(s)")
+        print(f"{'workers':>8} {'shards':>7} {'wall_s':>8} {'speedup':>8} {'efficiency':>10}")
+        baseline = None
+        for w in workers:
+            shards = w * args.shards_per_worker
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "src.shard", "--workers", str(w), "--shards", str(shards)],
+                           cwd=tmp, env=env, check=True, stdout=subprocess.DEVNULL)
+            wall = time.perf_counter() - t0
+            baseline = baseline or wall
+            print(f"{w:>8} {shards:>7} {wall:>8.2f} {baseline / wall:>8.2f} {baseline / wall / w:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Scale check for the Monte Carlo reorder simulation (src/simulate.py).
+
+Times synthetic series x days inputs for a number of paths and extrapolates the
+wall time of the full --target-paths run with the given number of workers.
+
+    python -m benchmarks.bench_simulate --series 10000 --days 365 --paths 100 --target-paths 1000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src import simulate
+
+
+def synthetic_inputs(n_series: int, n_days: int, seed: int = 0):
+    """Weekly-seasonal demand levels with multiplicative noise as forecast residuals."""
+    rng = np.random.default_rng(seed)
+    level = rng.gamma(2.0, 20.0, size=(n_series, 1))
+    weekly = 1 + 0.3 * np.sin(2 * np.pi * (np.arange(n_days) + rng.integers(0, 7, size=(n_series, 1))) / 7)
+    prediction = (level * weekly).astype(np.float32)
+    actual = np.maximum(np.round(prediction * rng.lognormal(0, 0.25, size=prediction.shape)), 0)
+    residual = (actual - prediction).astype(np.float32)
+    return prediction, np.abs(residual), residual
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--paths", type=int, default=100)
+    parser.add_argument("--target-paths", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    prediction, abs_error, residual = synthetic_inputs(args.series, args.days)
+    safety = simulate.safety_stock(abs_error, residual, simulate.SIM_POLICY)
+
+    t0 = time.perf_counter()
+    report = simulate.simulate(prediction, safety, residual, n_paths=args.paths, workers=args.workers)
+    seconds = time.perf_counter() - t0
+
+    cells = args.paths * args.series * args.days
+    estimate = seconds * args.target_paths / args.paths
+    print(f"{args.paths} paths x {args.series} series x {args.days} days = {cells:,} path-days "
+          f"in {seconds:.1f}s with {args.workers} worker(s) ({cells / seconds / 1e6:.1f}M path-days/s)")
+    print(f"mean fill rate {report['fill_rate'].mean():.3f}, stock-out days {report['stockout_days'].mean():.1f}")
+    print(f"estimated {args.target_paths} paths: {estimate:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Read cost of the partitioned forecast store: full history vs the slices stages and pages ask for.
+
+Builds a forecast dataset with --replicate renamed copies of every series in the current
+forecast (written through src.store) in a temp dir, then times store.read for each slice.
+
+    python -m benchmarks.bench_store --replicate 200
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src import store
+
+
+def timed(fn, repeat: int = 3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicate", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    base = store.read_forecast()
+    base = base.astype({"sku": "str"})
+    df = pd.concat([base.assign(sku=base["sku"] + f"_{i:04d}") for i in range(args.replicate)], ignore_index=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "forecast.parquet"
+        t0 = time.perf_counter()
+        store.write_partitioned(df, root, "forecast", name="bench")
+        print(f"rows={len(df):,} written in {time.perf_counter() - t0:.2f}s "
+              f"({sum(1 for _ in root.rglob('*.parquet'))} files)")
+
+        _, today = store.date_bounds(root)
+        one_sku = df["sku"].iloc[0]
+        slices = {
+            "full history (old read)": {},
+            "today (reorder)": {"since": today},
+            "last 28 days (decision)": {"since": today - pd.Timedelta(days=28)},
+            "one series (explorer)": {"skus": [one_sku], "channels": ["online"]},
+            "one channel, one month (overview)": {"since": today - pd.Timedelta(days=30), "channels": ["retail"]},
+        }
+        for name, kwargs in slices.items():
+            seconds, out = timed(lambda: store.read(root, "forecast", **kwargs))
+            print(f"{name:<36} rows={len(out):>10,}  {seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Scaled benchmark suite for the core function of each pipeline stage.
+
+Generates deterministic synthetic sales with the src.ingest demand model at each scale
+(SKU-channel series), then times and memory-profiles features.add_lag_and_rolling,
+train.fit, model.predict, reorder.build_reorder_plan and the decision metrics and rules.
+Results are saved as JSON; `compare` flags regressions between two result files.
+
+    python -m benchmarks.bench_suite run --series 12 1000 10000 100000
+    python -m benchmarks.bench_suite compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from src import decision, features, ingest, reorder, train
+from src.sketch import ResidualSketch
+
+RESULTS_DIR = Path("benchmarks/results")
+
+DEFAULT_SERIES = [12, 1_000, 10_000, 100_000]
+# Enough days for the 14-day lags, a train/valid split and the 28-day decision window
+DEFAULT_DAYS = 63
+START_DATE = "2025-04-01"
+# Share of the days used for training in train.fit
+TRAIN_SHARE = 0.75
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+def synthetic_sales(n_series: int, n_days: int = DEFAULT_DAYS, seed: int = 42) -> pd.DataFrame:
+    """
+    Clean-sales frame of n_series SKU-channel series (two channels per SKU), drawn with
+    ingest.generate_series from one Generator per series seeded by (seed, series id),
+    as in ingest.generate_sales_chunked. Sorted by (sku, channel, date).
+    """
+    catalog = ingest.generate_catalog((n_series + 1) // 2, seed=seed)
+    dates = pd.date_range(START_DATE, periods=n_days, freq="D")
+    cal_factor = ingest.calendar_factor(dates)
+
+    series = [
+        (sku, base_price, channel)
+        for sku, base_price in zip(catalog["sku"], catalog["base_price"])
+        for channel in sorted(ingest.CHANNELS)
+    ][:n_series]
+    units = np.empty(len(series) * n_days, dtype=np.int64)
+    price = np.empty(len(series) * n_days, dtype=np.float64)
+    promo = np.empty(len(series) * n_days, dtype=np.int64)
+    for i, (_, base_price, channel) in enumerate(series):
+        sl = slice(i * n_days, (i + 1) * n_days)
+        units[sl], price[sl], promo[sl] = ingest.generate_series(
+            np.random.default_rng([seed, i]), base_price, channel, cal_factor
+        )
+
+    return pd.DataFrame({
+        "date": np.tile(dates.values, len(series)),
+        "sku": np.repeat([s[0] for s in series], n_days),
+        "channel": np.repeat([s[2] for s in series], n_days),
+        "units_sold": units,
+        "price": price,
+        "promo_flag": promo,
+    })
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def measure(fn, repeats: int) -> dict:
+    """
+    One run under tracemalloc for the peak (it also warms caches), then the best of
+    `repeats` untraced runs as the wall time; the minimum is the least noisy estimate.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        out = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    runs = []
+    for _ in range(repeats):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {"wall_s": min(runs), "wall_runs": [round(r, 6) for r in runs],
+            "peak_traced_mb": round(peak / 2**20, 3), "out": out}
+
+
+def quiet(fn):
+    """Run fn with its progress prints (train.fit) suppressed."""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+
+def bench_scale(n_series: int, n_days: int, repeats: int, seed: int):
+    """Yield one result row per benchmark; each stage's output is the next stage's input."""
+    sales = synthetic_sales(n_series, n_days, seed)
+    calendar = features.add_calendar_features(sales)
+    split_date = str(sales["date"].min() + pd.Timedelta(days=int(n_days * TRAIN_SHARE)))[:10]
+
+    def row(name, rows, m):
+        return {"series": n_series, "benchmark": name, "rows": int(rows),
+                **{k: v for k, v in m.items() if k != "out"}}
+
+    m = measure(lambda: features.add_lag_and_rolling(calendar), repeats)
+    yield row("features.add_lag_and_rolling", len(calendar), m)
+
+    model_df = features.model_frame(features.add_target(m["out"]))
+    del calendar, m
+    m = measure(quiet(lambda: train.fit(model_df, split_date=split_date)), repeats)
+    pipe = m["out"][0]
+    yield row("train.fit", len(model_df), m)
+
+    X = model_df.drop(columns=[train.TARGET])
+    m = measure(lambda: pipe.predict(X), repeats)
+    yield row("predict.model_predict", len(X), m)
+
+    forecast = model_df[["date", "sku", "channel", "units_sold", train.TARGET]].copy()
+    forecast["prediction"] = m["out"]
+    forecast["abs_error"] = (forecast[train.TARGET] - forecast["prediction"]).abs()
+    del X, m, pipe
+    sketch = ResidualSketch.from_forecast(forecast)
+    m = measure(lambda: reorder.build_reorder_plan(forecast, sketch=sketch), repeats)
+    yield row("reorder.build_reorder_plan", len(forecast), m)
+
+    recent = forecast[forecast["date"] >= forecast["date"].max() - pd.Timedelta(days=decision.LOOKBACK_DAYS)]
+    m = measure(lambda: decision.compute_metrics(recent), repeats)
+    yield row("decision.compute_metrics", len(recent), m)
+
+    metrics = m["out"]
+    m = measure(lambda: decision.apply_policy(metrics), repeats)
+    yield row("decision.apply_policy", len(metrics), m)
+
+
+# -----------------------------
+# Result files
+# -----------------------------
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "git_commit": git_commit(),
+    }
+
+
+def compare(old: dict, new: dict, threshold: float, memory_threshold: float, min_seconds: float) -> list:
+    """
+    One row per (series, benchmark) present in both files with the new / old ratios.
+    A wall-time ratio above 1 + threshold (for timings of at least min_seconds) or a
+    peak-memory ratio above 1 + memory_threshold is a regression.
+    """
+    before = {(r["series"], r["benchmark"]): r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        o = before.get((r["series"], r["benchmark"]))
+        if o is None:
+            continue
+        wall = r["wall_s"] / o["wall_s"] if o["wall_s"] > 0 else float("nan")
+        peak = r["peak_traced_mb"] / o["peak_traced_mb"] if o["peak_traced_mb"] > 0 else float("nan")
+        flags = []
+        if max(o["wall_s"], r["wall_s"]) >= min_seconds and wall > 1 + threshold:
+            flags.append("SLOWER")
+        if peak > 1 + memory_threshold:
+            flags.append("MORE MEMORY")
+        rows.append({"series": r["series"], "benchmark": r["benchmark"], "wall_old": o["wall_s"],
+                     "wall_new": r["wall_s"], "wall_ratio": wall, "peak_old": o["peak_traced_mb"],
+                     "peak_new": r["peak_traced_mb"], "peak_ratio": peak, "flags": flags})
+    return rows
+
+
+def run(args):
+    started = datetime.now(timezone.utc)
+    record = {
+        "suite": "pipeline",
+        "created_at": started.isoformat(timespec="seconds"),
+        "params": {"days": args.days, "repeats": args.repeats, "seed": args.seed},
+        "environment": environment(),
+        "results": [],
+    }
+    print(f"{'series':>8} {'benchmark':<30} {'rows':>11} {'wall_s':>9} {'peak_mb':>9}")
+    for n_series in args.series:
+        for r in bench_scale(n_series, args.days, args.repeats, args.seed):
+            record["results"].append(r)
+            print(f"{r['series']:>8} {r['benchmark']:<30} {r['rows']:>11,} {r['wall_s']:>9.4f} {r['peak_traced_mb']:>9.1f}")
+        gc.collect()
+
+    out = args.out or RESULTS_DIR / f"suite-{started:%Y%m%dT%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    print(f"Results saved to: {out}")
+
+
+def run_compare(args) -> int:
+    with open(args.old, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    rows = compare(old, new, args.threshold, args.memory_threshold, args.min_seconds)
+
+    print(f"{'series':>8} {'benchmark':<30} {'wall old':>9} {'wall new':>9} {'ratio':>6} "
+          f"{'peak old':>9} {'peak new':>9} {'ratio':>6}  flags")
+    for r in rows:
+        print(f"{r['series']:>8} {r['benchmark']:<30} {r['wall_old']:>9.4f} {r['wall_new']:>9.4f} {r['wall_ratio']:>6.2f} "
+              f"{r['peak_old']:>9.1f} {r['peak_new']:>9.1f} {r['peak_ratio']:>6.2f}  {', '.join(r['flags'])}")
+    regressions = [r for r in rows if r["flags"]]
+    print(f"{len(regressions)} regression(s) over {len(rows)} benchmarks "
+          f"(wall > +{args.threshold:.0%}, peak memory > +{args.memory_threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("run", help="Run the suite and save a result file")
+    r.add_argument("--series", type=int, nargs="+", default=DEFAULT_SERIES)
+    r.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    r.add_argument("--repeats", type=int, default=3, help="Timed runs per benchmark (best reported)")
+    r.add_argument("--seed", type=int, default=42)
+    r.add_argument("--out", type=Path, default=None, help=f"Result file (default: {RESULTS_DIR}/suite-<timestamp>.json)")
+    c = sub.add_parser("compare", help="Flag regressions of NEW against OLD (exit status 1 if any)")
+    c.add_argument("old", type=Path)
+    c.add_argument("new", type=Path)
+    c.add_argument("--threshold", type=float, default=0.15, help="Allowed relative wall-time increase")
+    c.add_argument("--memory-threshold", type=float, default=0.10, help="Allowed relative peak-memory increase")
+    c.add_argument("--min-seconds", type=float, default=0.05,
+                   help="Wall-time changes are only flagged when either timing is at least this long")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(run_compare(args))
+
+
+if __name__ == "__main__":
+    main()
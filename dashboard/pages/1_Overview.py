@@ -2,15 +2,22 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import json
+import sys
 from pathlib import Path
 
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from src import rollup, store
+
 FORECAST_FILE = Path("data/processed/forecast.parquet")
 META_FILE = Path("models/metadata.json")
 DECISION_FILE = Path("data/processed/decision_report.csv")
 
-def wape(y_true, y_pred):
-    denom = np.sum(np.abs(y_true))
-    return np.nan if denom == 0 else float(np.sum(np.abs(y_true - y_pred)) / denom)
+@st.cache_data
+def load_rollup(cube_mtime: float, prefix_mtime: float):
+    """Rollup cube + prefix sums; the mtimes are the cache key, so a new predict run reloads them."""
+    return rollup.load_cube(), rollup.load_prefix()
 
 st.title("Overview")
 
@@ -18,34 +25,34 @@ if not FORECAST_FILE.exists():
     st.error("Missing forecast file. Run: `python -m src.predict`")
     st.stop()
 
-df = pd.read_parquet(FORECAST_FILE)
-df["date"] = pd.to_datetime(df["date"])
+if not (rollup.ROLLUP_CUBE_FILE.exists() and rollup.ROLLUP_PREFIX_FILE.exists()):
+    st.error("Missing error rollup. Run: `python -m src.rollup`")
+    st.stop()
+
+cube, prefix = load_rollup(rollup.ROLLUP_CUBE_FILE.stat().st_mtime, rollup.ROLLUP_PREFIX_FILE.stat().st_mtime)
 
 # Sidebar filters
 st.sidebar.header("Filters")
-min_d, max_d = df["date"].min(), df["date"].max()
+min_d, max_d = pd.Timestamp(prefix["dates"][0]), pd.Timestamp(prefix["dates"][-1])
 date_range = st.sidebar.date_input("Date range", value=(min_d.date(), max_d.date()))
-channels = ["All"] + sorted(df["channel"].unique().tolist())
-sel_channel = st.sidebar.selectbox("Channel", channels)
+sel_channel = st.sidebar.selectbox("Channel", prefix["channels"].tolist())
 
-filtered = df.copy()
-start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-filtered = filtered[(filtered["date"] >= start) & (filtered["date"] <= end)]
-if sel_channel != "All":
-    filtered = filtered[filtered["channel"] == sel_channel]
+start = pd.to_datetime(date_range[0])
+end = pd.to_datetime(date_range[1] if len(date_range) > 1 else date_range[0])
 
-# KPIs
-mae = float(np.mean(np.abs(filtered["target_units_next_day"] - filtered["prediction"])))
-wape_val = wape(filtered["target_units_next_day"].to_numpy(), filtered["prediction"].to_numpy())
+# KPIs: two prefix-sum lookups, independent of the number of forecast rows
+kpis = rollup.range_kpis(prefix, start, end, sel_channel)
 
 k1, k2, k3 = st.columns(3)
-k1.metric("MAE (avg abs error)", f"{mae:.3f}")
-k2.metric("WAPE", f"{wape_val:.3f}")
-k3.metric("Rows", f"{len(filtered)}")
+k1.metric("MAE (avg abs error)", f"{kpis['mae']:.3f}")
+k2.metric("WAPE", f"{kpis['wape']:.3f}")
+k3.metric("Rows", f"{kpis['rows']}")
 
 st.subheader("Decision Summary (Today)")
 if DECISION_FILE.exists():
-    dec = pd.read_csv(DECISION_FILE)
+    dec = store.read_ipc(DECISION_FILE)
+    if dec is None:
+        dec = pd.read_csv(DECISION_FILE)
     st.dataframe(dec.head(25), use_container_width=True)
 else:
     st.warning("Decision report missing. Run: `python -m src.decision`")
@@ -59,17 +66,9 @@ if META_FILE.exists():
         st.json(meta)
 
 st.subheader("Top SKUs by Total Absolute Error")
-sku_err = (
-    filtered.assign(abs_err=lambda x: np.abs(x["target_units_next_day"] - x["prediction"]))
-            .groupby("sku", as_index=False)["abs_err"].sum()
-            .sort_values("abs_err", ascending=False)
-            .head(10)
-)
+sku_err = rollup.top_skus(cube, start, end, sel_channel, n=10)
 st.dataframe(sku_err, use_container_width=True)
 
 st.subheader("Forecast Error Over Time (Total)")
-daily = (
-    filtered.assign(abs_err=lambda x: np.abs(x["target_units_next_day"] - x["prediction"]))
-            .groupby("date", as_index=False)["abs_err"].mean()
-)
+daily = rollup.daily_error(prefix, start, end, sel_channel)
 st.line_chart(daily, x="date", y="abs_err")
@@ -1,27 +1,50 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import sys
 from pathlib import Path
 
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from src import series_file
+
 FORECAST_FILE = Path("data/processed/forecast.parquet")
 
+# Points sent to the chart for the full history (about one per horizontal pixel)
+DEFAULT_CHART_POINTS = 800
+
+@st.cache_resource
+def load_series(series_mtime: float, index_mtime: float):
+    """Memory-mapped series file and segments + offset index; the mtimes are the cache key."""
+    return series_file.open_series()
+
 st.title("Forecast Explorer")
 
 if not FORECAST_FILE.exists():
     st.error("Missing forecast file. Run: `python -m src.predict`")
     st.stop()
 
-df = pd.read_parquet(FORECAST_FILE)
-df["date"] = pd.to_datetime(df["date"])
+if not (series_file.SERIES_FILE.exists() and series_file.SERIES_INDEX_FILE.exists()):
+    st.error("Missing series file. Run: `python -m src.series_file`")
+    st.stop()
+
+tables, index = load_series(series_file.SERIES_FILE.stat().st_mtime, series_file.SERIES_INDEX_FILE.stat().st_mtime)
 
 st.sidebar.header("Selection")
-sku = st.sidebar.selectbox("SKU", sorted(df["sku"].unique().tolist()))
-channel = st.sidebar.selectbox("Channel", sorted(df["channel"].unique().tolist()))
+sku = st.sidebar.selectbox("SKU", sorted(index["sku"].unique().tolist()))
+channel = st.sidebar.selectbox("Channel", sorted(index["channel"].unique().tolist()))
+max_points = st.sidebar.number_input("Chart points", min_value=50, max_value=10000, value=DEFAULT_CHART_POINTS, step=50)
 
-sub = df[(df["sku"] == sku) & (df["channel"] == channel)].sort_values("date")
+# Index lookups + slices of the memory-mapped files
+sub = series_file.read_series(tables, index, sku, channel)
 
 st.subheader(f"{sku} — {channel}")
 
+if len(sub) == 0:
+    st.warning("No forecast rows for this SKU/channel.")
+    st.stop()
+
 # Metrics
 mae = float(np.mean(np.abs(sub["target_units_next_day"] - sub["prediction"])))
 st.metric("MAE", f"{mae:.3f}")
@@ -30,7 +53,23 @@ st.metric("MAE", f"{mae:.3f}")
 plot_df = sub[["date", "target_units_next_day", "prediction"]].rename(
     columns={"target_units_next_day": "actual_next_day"}
 )
-st.line_chart(plot_df, x="date", y=["actual_next_day", "prediction"])
+lines = ["actual_next_day", "prediction"]
+
+# Full history, LTTB-downsampled to the point budget
+overview = series_file.downsample(plot_df, lines, int(max_points))
+st.caption(f"{len(overview)} of {len(plot_df)} points (LTTB)")
+st.line_chart(overview, x="date", y=lines)
+
+# Zoom window at full resolution
+st.subheader("Zoom")
+first, last = sub["date"].min().date(), sub["date"].max().date()
+zoom_start = max(first, last - pd.Timedelta(days=90).to_pytimedelta())
+zoom = st.slider("Window", min_value=first, max_value=last, value=(zoom_start, last))
+window = plot_df[(plot_df["date"] >= pd.Timestamp(zoom[0])) & (plot_df["date"] <= pd.Timestamp(zoom[1]))]
+if len(window) > max_points:
+    window = series_file.downsample(window, lines, int(max_points))
+    st.caption(f"Window has more than {int(max_points)} points: downsampled (LTTB)")
+st.line_chart(window, x="date", y=lines)
 
 st.subheader("Recent rows")
 st.dataframe(
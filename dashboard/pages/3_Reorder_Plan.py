@@ -1,19 +1,30 @@
 import streamlit as st
 import pandas as pd
+import sys
 from pathlib import Path
 
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from src import store
+
 DECISION_FILE = Path("data/processed/decision_report.csv")
 REORDER_FILE = Path("data/processed/reorder_plan.csv")
 
+def load_report(path: Path) -> pd.DataFrame:
+    """Memory-mapped IPC mirror written next to the CSV when it is current, else the CSV."""
+    df = store.read_ipc(path)
+    return pd.read_csv(path) if df is None else df
+
 st.title("Reorder Plan")
 
 # Prefer decision report (more human), fallback to reorder plan
 if DECISION_FILE.exists():
-    df = pd.read_csv(DECISION_FILE)
+    df = load_report(DECISION_FILE)
     st.caption("Showing decision report (confidence + reasons + adjusted reorder).")
     download_name = "decision_report.csv"
 elif REORDER_FILE.exists():
-    df = pd.read_csv(REORDER_FILE)
+    df = load_report(REORDER_FILE)
     st.caption("Showing reorder plan (basic).")
     download_name = "reorder_plan.csv"
 else:
@@ -0,0 +1,258 @@
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src import schema
+from src.config import SALES_SCHEMA
+from src.profiling import profiled
+
+RAW_DATA_DIR = Path("data/raw")
+RAW_SALES_CSV = RAW_DATA_DIR / "sales.csv"
+RAW_SALES_DATASET = RAW_DATA_DIR / "sales"       # written by `python -m src.ingest --chunked`
+
+PROCESSED = Path("data/processed")
+CLEAN_PARQUET = PROCESSED / "clean_sales.parquet"
+REJECTS_FILE = PROCESSED / "clean_rejects.csv"
+SUMMARY_FILE = PROCESSED / "clean_summary.json"
+SPILL_DIR = PROCESSED / "_clean_spill"
+
+RAW_COLUMNS = ["date", "sku", "channel", "units_sold", "price", "promo_flag"]
+KEY_COLS = ["sku", "channel"]
+
+# Output schema (what features.py / visualize.py read back), see config.SALES_SCHEMA
+CLEAN_SCHEMA = schema.arrow_schema("clean_sales")
+# Larger unit counts do not fit the narrowed units_sold dtype and are rejected
+UNITS_MAX = np.iinfo(SALES_SCHEMA["units_sold"]).max
+
+# Streaming knobs: memory is bounded by one input batch + one output row group
+CSV_BLOCK_BYTES = 64 << 20
+BATCH_ROWS = 1_000_000
+ROWS_PER_GROUP = 1_000_000
+
+def default_input() -> Path:
+    return RAW_SALES_DATASET if RAW_SALES_DATASET.exists() else RAW_SALES_CSV
+
+def iter_raw_batches(path: Path, columns=None):
+    """
+    Yield raw sales as pandas batches without loading the whole file.
+    CSV columns are read as strings so that coercion happens in validate_batch.
+    """
+    columns = columns or RAW_COLUMNS
+    if path.is_dir() or path.suffix == ".parquet":
+        dataset = ds.dataset(path, format="parquet")
+        for batch in dataset.to_batches(columns=columns, batch_size=BATCH_ROWS):
+            yield batch.to_pandas()
+    else:
+        reader = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: pa.string() for c in RAW_COLUMNS},
+                include_columns=columns,
+            ),
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+
+def validate_batch(raw: pd.DataFrame):
+    """
+    Coerce one raw batch with vectorized masks.
+    Returns (clean, rejects); rejects keep the raw values plus a `reject_reason`.
+    """
+    sku = raw["sku"].astype("string").str.strip()
+    channel = raw["channel"].astype("string").str.strip()
+    date = pd.to_datetime(raw["date"], errors="coerce", format="ISO8601")
+    units = pd.to_numeric(raw["units_sold"], errors="coerce")
+    price = pd.to_numeric(raw["price"], errors="coerce")
+    promo = pd.to_numeric(raw["promo_flag"], errors="coerce")
+
+    checks = [
+        ("missing_key", (sku.isna() | (sku == "") | channel.isna() | (channel == "")).to_numpy(dtype=bool)),
+        ("bad_date", date.isna().to_numpy()),
+        ("bad_units", ~(units.notna() & np.isfinite(units) & (units >= 0) & (units <= UNITS_MAX)
+                          & (units == np.floor(units))).to_numpy(dtype=bool)),
+        ("bad_price", ~(price.notna() & np.isfinite(price) & (price > 0)).to_numpy(dtype=bool)),
+        ("bad_promo", ~promo.isin([0, 1]).to_numpy(dtype=bool)),
+    ]
+    # First failing check wins
+    reason = np.select([m for _, m in checks], [name for name, _ in checks], default="")
+    ok = reason == ""
+
+    clean = pd.DataFrame({
+        "date": date[ok].astype("datetime64[ns]"),
+        "sku": sku[ok].astype(str),
+        "channel": channel[ok].astype(str),
+        "units_sold": units[ok].astype("int64"),
+        "price": price[ok].astype("float64"),
+        "promo_flag": promo[ok].astype("int64"),
+    })
+    rejects = raw[~ok].astype(str).assign(reject_reason=reason[~ok])
+    return clean, rejects
+
+@profiled()
+def clean_frame(raw: pd.DataFrame):
+    """
+    In-memory version of the clean stage, used by src.pipeline for sales ingest just generated.
+    Returns (clean, rejects) with clean sorted by (sku, channel, date) and duplicates rejected.
+    """
+    clean, rejects = validate_batch(raw)
+    clean = clean.sort_values(KEY_COLS + ["date"], kind="stable").reset_index(drop=True)
+    dup = clean.duplicated(subset=KEY_COLS + ["date"], keep="first").to_numpy()
+    if dup.any():
+        rejects = pd.concat([rejects, clean[dup].astype(str).assign(reject_reason="duplicate")], ignore_index=True)
+    return schema.cast(clean[~dup].reset_index(drop=True), "clean_sales"), rejects
+
+@profiled()
+def write_clean_frame(clean: pd.DataFrame, rejects: pd.DataFrame, rows_in: int, source: str):
+    PROCESSED.mkdir(parents=True, exist_ok=True)
+    pq.write_table(
+        pa.Table.from_pandas(clean, schema=CLEAN_SCHEMA, preserve_index=False),
+        CLEAN_PARQUET,
+        row_group_size=ROWS_PER_GROUP,
+        write_statistics=True,
+    )
+    if REJECTS_FILE.exists():
+        REJECTS_FILE.unlink()
+    if len(rejects):
+        rejects.to_csv(REJECTS_FILE, index=False)
+    stats = {
+        "rows_in": rows_in,
+        "rejected": {k: int(v) for k, v in rejects["reject_reason"].value_counts().items()},
+        "rows_out": len(clean),
+        "input": source,
+    }
+    with open(SUMMARY_FILE, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+def plan_partitions(path: Path, rows_per_group: int) -> pd.DataFrame:
+    """
+    First pass over the key columns only: count rows per (sku, channel) and assign
+    contiguous ranges of sorted series to output partitions of ~rows_per_group rows.
+    Memory scales with the number of series, not rows.
+    """
+    counts = None
+    for batch in iter_raw_batches(path, columns=KEY_COLS):
+        keys = batch[KEY_COLS].astype("string").apply(lambda s: s.str.strip())
+        c = keys.value_counts()
+        counts = c if counts is None else counts.add(c, fill_value=0)
+
+    if counts is None:
+        return pd.DataFrame(columns=KEY_COLS + ["partition"])
+
+    plan = counts.rename("rows").sort_index().reset_index()
+    # Keys never straddle partitions, so every series stays in one sort run
+    plan["partition"] = ((plan["rows"].cumsum() - plan["rows"]) // rows_per_group).astype("int64")
+    plan[KEY_COLS] = plan[KEY_COLS].astype(str)
+    return plan[KEY_COLS + ["partition"]]
+
+@profiled()
+def spill_batches(path: Path, plan: pd.DataFrame, rejects_file: Path) -> dict:
+    """
+    Second pass: validate each batch and route clean rows to per-partition spill files.
+    Rejected rows are appended to rejects_file as they are found.
+    """
+    if SPILL_DIR.exists():
+        shutil.rmtree(SPILL_DIR)
+    SPILL_DIR.mkdir(parents=True)
+    if rejects_file.exists():
+        rejects_file.unlink()
+
+    writers = {}
+    stats = {"rows_in": 0, "rejected": {}}
+    try:
+        for raw in iter_raw_batches(path):
+            stats["rows_in"] += len(raw)
+            clean, rejects = validate_batch(raw)
+
+            if len(rejects):
+                rejects.to_csv(rejects_file, mode="a", header=not rejects_file.exists(), index=False)
+                for reason, n in rejects["reject_reason"].value_counts().items():
+                    stats["rejected"][reason] = stats["rejected"].get(reason, 0) + int(n)
+
+            clean = clean.merge(plan, on=KEY_COLS, how="left")
+            for part, chunk in clean.groupby("partition", sort=False):
+                table = pa.Table.from_pandas(chunk.drop(columns="partition"), schema=CLEAN_SCHEMA, preserve_index=False)
+                if part not in writers:
+                    writers[part] = pq.ParquetWriter(SPILL_DIR / f"part-{int(part):05d}.parquet", CLEAN_SCHEMA)
+                writers[part].write_table(table)
+    finally:
+        for w in writers.values():
+            w.close()
+    return stats
+
+@profiled()
+def write_sorted(out_file: Path, rejects_file: Path, stats: dict) -> int:
+    """
+    Final pass: sort each spilled partition by (sku, channel, date), drop duplicate
+    keys, and write it as one row group. Partitions are already in key order.
+    """
+    rows_out = 0
+    with pq.ParquetWriter(out_file, CLEAN_SCHEMA) as writer:
+        for spill in sorted(SPILL_DIR.glob("part-*.parquet")):
+            part = schema.read_parquet(spill, "clean_sales")
+            part = part.sort_values(KEY_COLS + ["date"], kind="stable").reset_index(drop=True)
+
+            dup = part.duplicated(subset=KEY_COLS + ["date"], keep="first").to_numpy()
+            if dup.any():
+                dups = part[dup].astype(str).assign(reject_reason="duplicate")
+                dups.to_csv(rejects_file, mode="a", header=not rejects_file.exists(), index=False)
+                stats["rejected"]["duplicate"] = stats["rejected"].get("duplicate", 0) + int(dup.sum())
+                part = part[~dup]
+
+            writer.write_table(pa.Table.from_pandas(part, schema=CLEAN_SCHEMA, preserve_index=False))
+            rows_out += len(part)
+    return rows_out
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validate raw sales and write clean_sales.parquet.")
+    parser.add_argument("--input", type=Path, default=None,
+                        help=f"Raw sales CSV or parquet dataset (default: {RAW_SALES_DATASET} if present, else {RAW_SALES_CSV})")
+    parser.add_argument("--rows-per-group", type=int, default=ROWS_PER_GROUP)
+    return parser.parse_args(argv)
+
+def run(src: Path, rows_per_group: int = ROWS_PER_GROUP) -> dict:
+    """
+    Out-of-core clean stage: plan, spill and sort-merge raw sales into CLEAN_PARQUET.
+    Memory is bounded by one batch or one output partition, not the input size.
+    """
+    if not src.exists():
+        raise FileNotFoundError("Missing raw sales. Run `python -m src.ingest` first.")
+
+    PROCESSED.mkdir(parents=True, exist_ok=True)
+
+    plan = plan_partitions(src, rows_per_group)
+    try:
+        stats = spill_batches(src, plan, REJECTS_FILE)
+        stats["rows_out"] = write_sorted(CLEAN_PARQUET, REJECTS_FILE, stats)
+    finally:
+        shutil.rmtree(SPILL_DIR, ignore_errors=True)
+    stats["input"] = str(src)
+
+    with open(SUMMARY_FILE, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+    stats = run(args.input or default_input(), args.rows_per_group)
+
+    print(f"Clean sales saved to: {CLEAN_PARQUET}")
+    print("Rows in :", stats["rows_in"])
+    print("Rows out:", stats["rows_out"])
+    n_rejected = sum(stats["rejected"].values())
+    print("Rejected:", n_rejected, stats["rejected"] if n_rejected else "")
+    if n_rejected:
+        print(f"Rejected rows saved to: {REJECTS_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import importlib
+import sys
+
+# Subcommand -> (module whose main() runs it, help). Only the chosen module is imported,
+# so `bevops --help` and argument errors never load pandas, pyarrow or sklearn.
+COMMANDS = {
+    "ingest": ("src.ingest", "Generate raw products and sales data"),
+    "clean": ("src.clean", "Clean raw sales into data/processed/clean_sales.parquet"),
+    "features": ("src.features", "Build model features from clean sales"),
+    "train": ("src.train", "Train the forecast model"),
+    "predict": ("src.predict", "Score features and write forecast.parquet"),
+    "reorder": ("src.reorder", "Build the reorder plan from the latest forecast"),
+    "decision": ("src.decision", "Score confidence and write the decision report"),
+    "evaluate": ("src.evaluate", "Walk-forward backtest"),
+    "simulate": ("src.simulate", "Monte Carlo replay of the reorder policy"),
+    "tune-policy": ("src.tune_policy", "Grid-search decision.POLICY thresholds and buffers"),
+    "rollup": ("src.rollup", "Rebuild the forecast error rollup"),
+    "series-file": ("src.series_file", "Rebuild the Forecast Explorer series file"),
+    "pipeline": ("src.pipeline", "Run all stages in one process with stage caching"),
+    "shard": ("src.shard", "Run features -> decision per series shard in a process pool"),
+    "serve": ("src.serve", "Local forecast server"),
+    "visualize": ("src.visualize", "Save exploratory sales figures to reports/"),
+    "profile": ("src.profiling", "List, show and diff profiling run records"),
+}
+
+DASHBOARD_APP = "dashboard/app.py"
+
+# Rows of the --import-profile report
+IMPORT_PROFILE_TOP = 15
+
+# -----------------------------
+# Import profile: re-run the command under `python -X importtime` and summarize
+# -----------------------------
+def parse_importtime(lines) -> list:
+    """(module, self_us, cumulative_us, depth) per `-X importtime` line, in import order."""
+    out = []
+    for line in lines:
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        out.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return out
+
+
+def import_report(entries: list, top: int = IMPORT_PROFILE_TOP) -> str:
+    """Total import time, the slowest top-level packages and the slowest modules (own time)."""
+    total = sum(e[1] for e in entries)
+    packages = {}
+    for name, self_us, _, _ in entries:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+
+    lines = [f"Import time: {total / 1e6:.3f}s over {len(entries)} modules"]
+    lines.append(f"\n{'package':<32} {'total_ms':>9} {'share':>6}")
+    for root, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        lines.append(f"{root:<32} {us / 1e3:>9.1f} {us / max(total, 1):>6.1%}")
+    lines.append(f"\n{'module':<48} {'self_ms':>8} {'cumulative_ms':>14}")
+    for name, self_us, cumulative_us, _ in sorted(entries, key=lambda e: -e[1])[:top]:
+        lines.append(f"{name[-48:]:<48} {self_us / 1e3:>8.1f} {cumulative_us / 1e3:>14.1f}")
+    return "\n".join(lines)
+
+
+def run_import_profile(argv: list) -> int:
+    import subprocess
+
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "src.cli", *argv],
+                          stderr=subprocess.PIPE, text=True)
+    lines = proc.stderr.splitlines()
+    # The command's own stderr is passed through unchanged
+    for line in lines:
+        if not line.startswith("import time:"):
+            print(line, file=sys.stderr)
+    print("\n" + import_report(parse_importtime(lines)), file=sys.stderr)
+    return proc.returncode
+
+# -----------------------------
+# Dispatch
+# -----------------------------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="bevops",
+        description="BevOps pipeline commands. Arguments after the command go to that stage "
+                    "(`bevops train --help` shows its options).",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(
+            f"  {name:<13} {help_text}" for name, (_, help_text) in COMMANDS.items()
+        ) + f"\n  {'dashboard':<13} Start the Streamlit dashboard ({DASHBOARD_APP})",
+    )
+    parser.add_argument("--import-profile", action="store_true",
+                        help="Run the command and report import time per package and module")
+    parser.add_argument("command", nargs="?", choices=[*COMMANDS, "dashboard"], metavar="command")
+    return parser
+
+
+def split_argv(argv: list):
+    """Options before the command are bevops' own; everything after it belongs to the command."""
+    for i, arg in enumerate(argv):
+        if not arg.startswith("-"):
+            return argv[:i + 1], argv[i + 1:]
+    return argv, []
+
+
+def run_command(command: str, rest: list) -> int:
+    import inspect
+    import subprocess
+
+    if command == "dashboard":
+        return subprocess.call([sys.executable, "-m", "streamlit", "run", DASHBOARD_APP, *rest])
+
+    module_name, help_text = COMMANDS[command]
+    main = importlib.import_module(module_name).main
+    if not inspect.signature(main).parameters:
+        # Stages without options (reorder, decision, visualize)
+        if rest in (["-h"], ["--help"]):
+            print(f"usage: bevops {command}\n\n{help_text}")
+            return 0
+        if rest:
+            print(f"bevops {command}: takes no arguments (got {' '.join(rest)})", file=sys.stderr)
+            return 2
+        main()
+    else:
+        main(rest)
+    return 0
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    own, rest = split_argv(argv)
+    parser = build_parser()
+    args = parser.parse_args(own)
+
+    if args.import_profile:
+        return run_import_profile([a for a in own if a != "--import-profile"] + rest)
+    if args.command is None:
+        parser.print_help()
+        return 0
+    # Stage parsers take their usage prog from sys.argv[0]; make it read "bevops <command>"
+    sys.argv = [f"bevops {args.command}", *rest]
+    return run_command(args.command, rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
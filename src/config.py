@@ -0,0 +1,146 @@
+from pathlib import Path
+
+# -----------------------------
+# Paths
+# -----------------------------
+DATA_DIR = Path("data")
+RAW_DATA_DIR = DATA_DIR / "raw"
+PROCESSED = DATA_DIR / "processed"
+MODELS_DIR = Path("models")
+
+# -----------------------------
+# Pipeline runner (python -m src.pipeline)
+# -----------------------------
+# Stages in execution order; each maps to the stage logic in src/<name>.py
+PIPELINE_STAGES = ["ingest", "clean", "features", "train", "predict", "reorder", "decision"]
+
+# Source files whose content is part of each stage's fingerprint (a code change re-runs the stage).
+# Every stage reads and writes through the artifact schemas and store, so those count for all of them.
+SHARED_CODE = ["src/config.py", "src/schema.py", "src/store.py"]
+STAGE_CODE = {
+    "ingest": ["src/ingest.py"],
+    "clean": ["src/clean.py"],
+    "features": ["src/features.py"],
+    "train": ["src/train.py", "src/scorer.py"],
+    "predict": ["src/predict.py", "src/features.py", "src/scorer.py", "src/rollup.py", "src/series_file.py",
+                "src/sketch.py", "src/reorder.py"],
+    "reorder": ["src/reorder.py", "src/sketch.py"],
+    "decision": ["src/decision.py"],
+}
+STAGE_CODE = {stage: SHARED_CODE + paths for stage, paths in STAGE_CODE.items()}
+
+# Upstream stages whose fingerprints feed each stage's fingerprint
+STAGE_INPUTS = {
+    "ingest": [],
+    "clean": [],            # fingerprinted on the raw sales content instead
+    "features": ["clean"],
+    "train": ["features"],
+    "predict": ["features", "train", "clean"],
+    "reorder": ["predict"],
+    "decision": ["predict", "reorder"],
+}
+
+# Stage parameters (also part of the fingerprint)
+PIPELINE_PARAMS = {
+    "train": {"split_date": "2025-07-01", "local": False},   # local: per-series models (train --local)
+    "predict": {"horizon": 14},
+}
+
+# Manifest of the last run: fingerprints, status, wall time and peak memory per stage
+RUN_MANIFEST = PROCESSED / "run_manifest.json"
+
+# -----------------------------
+# Artifact schemas (enforced by src/schema.py on every read and write)
+# -----------------------------
+# sku/channel are dictionary-encoded (pandas category with sorted categories); calendar and
+# flag fields are small ints; lags, rolling means, targets and predictions are float32.
+SALES_SCHEMA = {
+    "date": "datetime64[ns]",
+    "sku": "category",
+    "channel": "category",
+    "units_sold": "int32",
+    "price": "float64",
+    "promo_flag": "int8",
+}
+
+# Lag and rolling feature parameters (used as features.LAGS, LAG_COLUMNS, ROLLING_WINDOWS);
+# kept here so the features schema is derived from the same values
+# Lag features: source column -> output prefix, shifted by each lag (yesterday, last week, two weeks)
+FEATURE_LAGS = (1, 7, 14)
+FEATURE_LAG_COLUMNS = {"units_sold": "units", "price": "price", "promo_flag": "promo"}
+# Past-only rolling means of units_sold: window -> min_periods
+FEATURE_ROLLING_WINDOWS = {7: 3, 14: 5}
+
+FEATURES_SCHEMA = {
+    **SALES_SCHEMA,
+    "dayofweek": "int8",
+    "month": "int8",
+    "weekofyear": "int8",
+    "is_weekend": "int8",
+    **{f"{prefix}_lag_{lag}": "float32" for lag in FEATURE_LAGS for prefix in FEATURE_LAG_COLUMNS.values()},
+    **{f"units_roll{window}_mean": "float32" for window in FEATURE_ROLLING_WINDOWS},
+    "target_units_next_day": "float32",
+}
+
+FORECAST_SCHEMA = {
+    "date": "datetime64[ns]",
+    "sku": "category",
+    "channel": "category",
+    "units_sold": "int32",
+    "target_units_next_day": "float32",
+    "prediction": "float32",
+    "abs_error": "float32",
+}
+
+FORECAST_HORIZON_SCHEMA = {
+    "sku": "category",
+    "channel": "category",
+    "origin_date": "datetime64[ns]",
+    "horizon": "int16",
+    "date": "datetime64[ns]",
+    "prediction": "float32",
+}
+
+# Forecast plus the price/promo inputs, one contiguous row range per series (src/series_file.py)
+FORECAST_SERIES_SCHEMA = {
+    **FORECAST_SCHEMA,
+    "price": "float64",
+    "promo_flag": "int8",
+}
+
+# Daily error sums per series (src/rollup.py); float64 so range sums stay exact enough
+ROLLUP_SCHEMA = {
+    "date": "datetime64[ns]",
+    "sku": "category",
+    "channel": "category",
+    "rows": "int32",
+    "abs_error": "float64",
+    "abs_actual": "float64",
+}
+
+ARTIFACT_SCHEMAS = {
+    "clean_sales": SALES_SCHEMA,      # also the features state tail
+    "features": FEATURES_SCHEMA,
+    "forecast": FORECAST_SCHEMA,
+    "forecast_horizon": FORECAST_HORIZON_SCHEMA,
+    "forecast_series": FORECAST_SERIES_SCHEMA,
+    "rollup": ROLLUP_SCHEMA,
+}
+
+# Row order of each parquet artifact (row-group statistics make these keys prunable)
+ARTIFACT_SORT_KEYS = {
+    "clean_sales": ["sku", "channel", "date"],
+    "features": ["sku", "channel", "date"],
+    "forecast": ["sku", "channel", "date"],
+    "forecast_horizon": ["sku", "channel", "horizon"],
+    "forecast_series": ["sku", "channel", "date"],
+    "rollup": ["date", "sku", "channel"],       # date-sorted: a date range is one contiguous slice
+}
+
+# -----------------------------
+# Partitioned artifact store (src/store.py): features.parquet and forecast.parquet are
+# hive-partitioned by year_month=YYYY-MM / sku_bucket=crc32(sku) % STORE_SKU_BUCKETS
+# -----------------------------
+STORE_PARTITION_COLS = ["year_month", "sku_bucket"]
+STORE_SKU_BUCKETS = 8
+STORE_ROWS_PER_GROUP = 128_000
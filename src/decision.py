@@ -1,12 +1,19 @@
+import json
 from pathlib import Path
 import numpy as np
 import pandas as pd
 
+from src import store
+from src.profiling import profiled
+
 PROCESSED = Path("data/processed")
 FORECAST_FILE = PROCESSED / "forecast.parquet"
 REORDER_FILE = PROCESSED / "reorder_plan.csv"       # optional, if you’ve generated it
 DECISION_FILE = PROCESSED / "decision_report.csv"
 
+# Diagnostics window before "today"
+LOOKBACK_DAYS = 28
+
 # Tunable policy knobs (this is YOU)
 POLICY = {
     "high_wape_threshold": 0.25,      # above this, model is considered unreliable for that SKU-channel
@@ -17,71 +24,200 @@ POLICY = {
     "buffer_high_conf": 0.10,         # add +10% buffer when high confidence (optional)
 }
 
+# Versioned tuned policies (policy_vNNN.json, written by `python -m src.tune_policy`). Only the
+# version promoted into ACTIVE_POLICY_FILE (tune_policy --apply / --promote) is used
+POLICY_DIR = Path("models/policies")
+ACTIVE_POLICY_FILE = POLICY_DIR / "active.json"
+
+def policy_file(version: int) -> Path:
+    return POLICY_DIR / f"policy_v{version:03d}.json"
+
+def active_policy_file():
+    """File of the promoted policy version; None when none was promoted."""
+    if not ACTIVE_POLICY_FILE.exists():
+        return None
+    with open(ACTIVE_POLICY_FILE, "r", encoding="utf-8") as f:
+        path = policy_file(json.load(f)["version"])
+    if not path.exists():
+        raise FileNotFoundError(f"Promoted policy {path} is missing. Promote another version with "
+                                "`python -m src.tune_policy --promote N` (0 for the defaults).")
+    return path
+
+def load_policy() -> dict:
+    """The promoted tuned policy over the defaults above; POLICY itself if none was promoted."""
+    path = active_policy_file()
+    if path is None:
+        return POLICY
+    with open(path, "r", encoding="utf-8") as f:
+        return {**POLICY, **json.load(f)["policy"]}
+
 def wape(y_true, y_pred) -> float:
     denom = np.sum(np.abs(y_true))
     if denom == 0:
         return np.nan
     return float(np.sum(np.abs(y_true - y_pred)) / denom)
 
-def add_reason(reasons, text):
-    if text and text not in reasons:
-        reasons.append(text)
+def compute_group_metrics(g: pd.DataFrame) -> pd.Series:
+    """
+    Per-group reference implementation of the diagnostics.
+    compute_metrics produces the same values for all groups at once.
+    """
+    # Use columns produced by predict.py
+    y_true = g["target_units_next_day"].to_numpy()
+    y_pred = g["prediction"].to_numpy()
+
+    # Reliability metrics
+    g_wape = wape(y_true, y_pred)
+    mae = float(np.mean(np.abs(y_true - y_pred)))
+
+    # Demand stability metrics
+    demand = g["units_sold"].to_numpy()
+    mean_d = float(np.mean(demand))
+    std_d = float(np.std(demand))
+    cv = float(std_d / mean_d) if mean_d != 0 else np.nan
+
+    # Regime change heuristic: compare last 7 days to prior 7 days
+    g_sorted = g.sort_values("date")
+    last7 = g_sorted.tail(7)["units_sold"].to_numpy()
+    prev7 = g_sorted.tail(14).head(7)["units_sold"].to_numpy() if len(g_sorted) >= 14 else np.array([])
+
+    regime_z = np.nan
+    if len(prev7) == 7 and std_d > 0:
+        regime_z = float((np.mean(last7) - np.mean(prev7)) / std_d)
+
+    # History length
+    history_days = int(g_sorted["date"].nunique())
+
+    return pd.Series({
+        "wape_28d": g_wape,
+        "mae_28d": mae,
+        "demand_mean_28d": mean_d,
+        "demand_cv_28d": cv,
+        "regime_z": regime_z,
+        "history_days": history_days,
+    })
+
+METRIC_COLS = ["wape_28d", "mae_28d", "demand_mean_28d", "demand_cv_28d", "regime_z", "history_days"]
+
+@profiled()
+def compute_metrics(recent: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columnar version of compute_group_metrics for every SKU-channel at once.
+
+    Groups are located by segment offsets in the frame sorted by (sku, channel, date).
+    Groups of equal length are gathered into one 2-D block and reduced along rows,
+    which uses the same summation order as NumPy on each 1-D group, so the values
+    match the per-group implementation exactly.
+    """
+    group_cols = ["sku", "channel"]
+    recent = recent.sort_values(group_cols + ["date"], kind="stable")
 
-def main():
-    if not FORECAST_FILE.exists():
-        raise FileNotFoundError("Missing forecast.parquet. Run `python -m src.predict` first.")
+    if len(recent) == 0:
+        return pd.DataFrame(columns=group_cols + METRIC_COLS)
 
-    df = pd.read_parquet(FORECAST_FILE)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values(["sku", "channel", "date"]).reset_index(drop=True)
+    codes = recent.groupby(group_cols, sort=True).ngroup().to_numpy()
+    n = len(codes)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.diff(np.r_[starts, n])
 
-    # Define "today" as last date in file
-    today = df["date"].max()
-    lookback_days = 28
-    cutoff = today - pd.Timedelta(days=lookback_days)
+    y_true = recent["target_units_next_day"].to_numpy(dtype=np.float64)
+    y_pred = recent["prediction"].to_numpy(dtype=np.float64)
+    demand = recent["units_sold"].to_numpy()
+    dates = recent["date"].to_numpy()
 
-    recent = df[df["date"] >= cutoff].copy()
+    out = np.full((len(starts), len(METRIC_COLS)), np.nan)
 
-    # Compute per SKU-channel diagnostics
-    group_cols = ["sku", "channel"]
+    # History length: distinct dates per group (dates are sorted within a group)
+    new_date = np.r_[True, (dates[1:] != dates[:-1]) | (codes[1:] != codes[:-1])]
+    out[:, 5] = np.add.reduceat(new_date.astype(np.int64), starts)
+
+    for length in np.unique(lengths):
+        sel = np.flatnonzero(lengths == length)
+        idx = starts[sel, None] + np.arange(length)
 
-    def compute_group_metrics(g: pd.DataFrame) -> pd.Series:
-        # Use columns produced by predict.py
-        y_true = g["target_units_next_day"].to_numpy()
-        y_pred = g["prediction"].to_numpy()
+        yt, yp, d = y_true[idx], y_pred[idx], demand[idx]
 
         # Reliability metrics
-        g_wape = wape(y_true, y_pred)
-        mae = float(np.mean(np.abs(y_true - y_pred)))
+        abs_err = np.abs(yt - yp)
+        denom = np.sum(np.abs(yt), axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[sel, 0] = np.where(denom == 0, np.nan, np.sum(abs_err, axis=1) / denom)
+        out[sel, 1] = np.mean(abs_err, axis=1)
 
         # Demand stability metrics
-        demand = g["units_sold"].to_numpy()
-        mean_d = float(np.mean(demand))
-        std_d = float(np.std(demand))
-        cv = float(std_d / mean_d) if mean_d != 0 else np.nan
+        mean_d = np.mean(d, axis=1)
+        std_d = np.std(d, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[sel, 2] = mean_d
+            out[sel, 3] = np.where(mean_d != 0, std_d / mean_d, np.nan)
 
         # Regime change heuristic: compare last 7 days to prior 7 days
-        g_sorted = g.sort_values("date")
-        last7 = g_sorted.tail(7)["units_sold"].to_numpy()
-        prev7 = g_sorted.tail(14).head(7)["units_sold"].to_numpy() if len(g_sorted) >= 14 else np.array([])
-
-        regime_z = np.nan
-        if len(prev7) == 7 and std_d > 0:
-            regime_z = float((np.mean(last7) - np.mean(prev7)) / std_d)
+        if length >= 14:
+            last7 = np.mean(d[:, -7:], axis=1)
+            prev7 = np.mean(d[:, -14:-7], axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[sel, 4] = np.where(std_d > 0, (last7 - prev7) / std_d, np.nan)
+
+    metrics = recent.iloc[starts][group_cols].reset_index(drop=True)
+    return pd.concat([metrics, pd.DataFrame(out, columns=METRIC_COLS)], axis=1)
+
+def _fmt(values: pd.Series) -> np.ndarray:
+    return np.char.mod("%.2f", values.to_numpy(dtype=np.float64)).astype(object)
+
+@profiled()
+def apply_policy(report: pd.DataFrame, policy: dict = POLICY) -> pd.DataFrame:
+    """
+    Rule-based confidence scoring, vectorized with boolean masks.
+    Adds confidence, buffer_pct, recommended_action and human-readable reasons.
+    """
+    n = len(report)
+    reasons = np.full(n, "", dtype=object)
+
+    def add_reasons(mask: np.ndarray, text):
+        sep = np.where(reasons == "", "", "; ").astype(object)
+        reasons[:] = np.where(mask, reasons + sep + text, reasons)
+
+    history = report["history_days"]
+    wape_28d = report["wape_28d"]
+    cv = report["demand_cv_28d"]
+    regime_z = report["regime_z"]
+
+    low_history = (history.isna() | (history < policy["min_history_days"])).to_numpy()
+    high_error = (wape_28d.notna() & (wape_28d >= policy["high_wape_threshold"])).to_numpy()
+    volatile = (cv.notna() & (cv >= policy["volatility_cv_threshold"])).to_numpy()
+    regime_change = (regime_z.notna() & (regime_z.abs() >= policy["regime_change_z"])).to_numpy()
+
+    add_reasons(low_history, f"Not enough history (<{policy['min_history_days']} days)")
+    add_reasons(high_error, "High recent error (WAPE " + _fmt(wape_28d) + f" ≥ {policy['high_wape_threshold']})")
+    add_reasons(volatile, "High demand volatility (CV " + _fmt(cv) + f" ≥ {policy['volatility_cv_threshold']})")
+    add_reasons(regime_change, "Possible regime change (z " + _fmt(regime_z) + f" ≥ {policy['regime_change_z']})")
+
+    low_conf = low_history | high_error | volatile | regime_change
+    add_reasons(low_conf, "Use conservative buffer due to low confidence")
+    add_reasons(~low_conf, "Model appears stable on recent window")
+
+    report = report.copy()
+    report["confidence"] = np.where(low_conf, "LOW", "HIGH")
+    report["buffer_pct"] = np.where(low_conf, policy["buffer_low_conf"], policy["buffer_high_conf"])
+    report["recommended_action"] = np.where(low_conf, "ORDER_CONSERVATIVE", "ORDER_BASELINE")
+    report["reason"] = reasons
+    return report
+
+@profiled()
+def build_decision_report(df: pd.DataFrame, reorder: pd.DataFrame = None, policy: dict = POLICY) -> pd.DataFrame:
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values(["sku", "channel", "date"]).reset_index(drop=True)
 
-        # History length
-        history_days = int(g_sorted["date"].nunique())
+    # Define "today" as last date in file
+    today = df["date"].max()
+    cutoff = today - pd.Timedelta(days=LOOKBACK_DAYS)
 
-        return pd.Series({
-            "wape_28d": g_wape,
-            "mae_28d": mae,
-            "demand_mean_28d": mean_d,
-            "demand_cv_28d": cv,
-            "regime_z": regime_z,
-            "history_days": history_days,
-        })
+    recent = df[df["date"] >= cutoff]
 
-    metrics = recent.groupby(group_cols).apply(compute_group_metrics).reset_index()
+    # Compute per SKU-channel diagnostics
+    group_cols = ["sku", "channel"]
+    metrics = compute_metrics(recent)
 
     # Pull today's forecast row per SKU-channel (the “current” recommended demand)
     today_rows = df[df["date"] == today].copy()
@@ -91,8 +227,7 @@ def main():
     report = today_rows.merge(metrics, on=group_cols, how="left")
 
     # If reorder plan exists, merge it in
-    if REORDER_FILE.exists():
-        reorder = pd.read_csv(REORDER_FILE)
+    if reorder is not None:
         report = report.merge(reorder, on=group_cols, how="left")
     else:
         report["reorder_qty"] = np.nan
@@ -101,53 +236,7 @@ def main():
         report["safety_stock"] = np.nan
 
     # Decision logic + human-readable reasons
-    confidence = []
-    recommended_action = []
-    buffer_pct = []
-    reasons_out = []
-
-    for _, row in report.iterrows():
-        reasons = []
-
-        # Confidence scoring (rule-based, transparent)
-        low_conf = False
-
-        if pd.isna(row["history_days"]) or row["history_days"] < POLICY["min_history_days"]:
-            low_conf = True
-            add_reason(reasons, f"Not enough history (<{POLICY['min_history_days']} days)")
-
-        if not pd.isna(row["wape_28d"]) and row["wape_28d"] >= POLICY["high_wape_threshold"]:
-            low_conf = True
-            add_reason(reasons, f"High recent error (WAPE {row['wape_28d']:.2f} ≥ {POLICY['high_wape_threshold']})")
-
-        if not pd.isna(row["demand_cv_28d"]) and row["demand_cv_28d"] >= POLICY["volatility_cv_threshold"]:
-            low_conf = True
-            add_reason(reasons, f"High demand volatility (CV {row['demand_cv_28d']:.2f} ≥ {POLICY['volatility_cv_threshold']})")
-
-        if not pd.isna(row["regime_z"]) and abs(row["regime_z"]) >= POLICY["regime_change_z"]:
-            low_conf = True
-            add_reason(reasons, f"Possible regime change (z {row['regime_z']:.2f} ≥ {POLICY['regime_change_z']})")
-
-        if low_conf:
-            conf = "LOW"
-            buf = POLICY["buffer_low_conf"]
-            action = "ORDER_CONSERVATIVE"
-            add_reason(reasons, "Use conservative buffer due to low confidence")
-        else:
-            conf = "HIGH"
-            buf = POLICY["buffer_high_conf"]
-            action = "ORDER_BASELINE"
-            add_reason(reasons, "Model appears stable on recent window")
-
-        confidence.append(conf)
-        buffer_pct.append(buf)
-        recommended_action.append(action)
-        reasons_out.append("; ".join(reasons) if reasons else "")
-
-    report["confidence"] = confidence
-    report["buffer_pct"] = buffer_pct
-    report["recommended_action"] = recommended_action
-    report["reason"] = reasons_out
+    report = apply_policy(report, policy)
 
     # If reorder_qty exists, produce an adjusted recommendation
     # (If reorder_qty is NaN because reorder.py hasn’t run, we still output a suggested adjustment conceptually.)
@@ -170,12 +259,29 @@ def main():
         "inventory_on_hand", "lead_time_demand", "safety_stock", "reorder_qty", "reorder_qty_adjusted"
     ]
     cols = [c for c in cols if c in report.columns]
-    out = report[cols].copy()
+    return report[cols].copy()
+
+@profiled(entry=True)
+def main():
+    if not FORECAST_FILE.exists():
+        raise FileNotFoundError("Missing forecast.parquet. Run `python -m src.predict` first.")
+
+    # The report only looks at the last LOOKBACK_DAYS (+ today)
+    _, today = store.date_bounds(FORECAST_FILE)
+    df = store.read_forecast(since=today - pd.Timedelta(days=LOOKBACK_DAYS))
+    reorder = store.read_ipc(REORDER_FILE)
+    if reorder is None and REORDER_FILE.exists():
+        # round_trip: parse lead_time_demand exactly as reorder wrote it
+        reorder = pd.read_csv(REORDER_FILE, float_precision="round_trip")
+
+    out = build_decision_report(df, reorder, load_policy())
 
     out.to_csv(DECISION_FILE, index=False)
+    store.write_ipc(out, DECISION_FILE)
     print(f"Decision report saved to: {DECISION_FILE}")
     print("Rows:", len(out))
     print("LOW confidence rows:", int((out["confidence"] == "LOW").sum()))
+    print("Policy:", active_policy_file() or "decision.POLICY defaults")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import store
+from src.profiling import profiled
+from src.train import (
+    CATEGORICAL_FEATURES,
+    META_FILE,
+    NUMERIC_FEATURES,
+    TARGET,
+    baseline_naive,
+    build_pipeline,
+    wape,
+)
+
+PROCESSED = Path("data/processed")
+FEATURES_FILE = PROCESSED / "features.parquet"
+BACKTEST_FOLDS_FILE = PROCESSED / "backtest_folds.csv"
+BACKTEST_SERIES_FILE = PROCESSED / "backtest_series.csv"
+
+# Rolling-origin defaults: 26 weekly cutoffs, each validated on the following 7 days
+DEFAULT_FOLDS = 26
+DEFAULT_STEP_DAYS = 7
+DEFAULT_VALID_DAYS = 7
+MIN_TRAIN_DAYS = 90
+
+MODELS = ("baseline", "ridge")
+
+# -----------------------------
+# Fold layout: the matrix is sorted by date once, so every fold is a pair of row
+# ranges [0, train_end) and [train_end, valid_end) found with searchsorted
+# -----------------------------
+@profiled()
+def load_matrix(path: Path = FEATURES_FILE):
+    """
+    Read the feature matrix once, sorted by date (stable, so series order within a day is kept).
+    Returns (df, series) where series holds the (sku, channel) of each integer series code.
+    """
+    df = store.read(path, "features", columns=["date"] + NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TARGET])
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+
+    codes, series = pd.MultiIndex.from_frame(df[["sku", "channel"]]).factorize()
+    df["series_code"] = codes
+    return df, series.to_frame(index=False, name=["sku", "channel"])
+
+def make_folds(dates: np.ndarray, n_folds: int, step_days: int, valid_days: int, min_train_days: int) -> pd.DataFrame:
+    """
+    Cutoffs step back from the last date; fold k trains on dates < cutoff and validates on
+    [cutoff, cutoff + valid_days). Folds with less than min_train_days of history are dropped.
+    """
+    dates = dates.astype("datetime64[D]")
+    first, end = dates[0], dates[-1] + np.timedelta64(1, "D")
+    last_cutoff = end - np.timedelta64(valid_days, "D")
+    cutoffs = last_cutoff - np.arange(n_folds)[::-1] * np.timedelta64(step_days, "D")
+    cutoffs = cutoffs[cutoffs >= first + np.timedelta64(min_train_days, "D")]
+
+    folds = pd.DataFrame({
+        "fold": np.arange(len(cutoffs)),
+        "cutoff": cutoffs,
+        "train_end": np.searchsorted(dates, cutoffs, side="left"),
+        "valid_end": np.searchsorted(dates, cutoffs + np.timedelta64(valid_days, "D"), side="left"),
+    })
+    return folds[folds["valid_end"] > folds["train_end"]].reset_index(drop=True)
+
+# -----------------------------
+# Fold worker: the matrix is shipped once per process, tasks are just row bounds
+# -----------------------------
+_worker_df = None
+_worker_n_series = 0
+
+def _init_worker(df: pd.DataFrame, n_series: int):
+    global _worker_df, _worker_n_series
+    _worker_df = df
+    _worker_n_series = n_series
+
+def _run_fold(task) -> dict:
+    fold, train_end, valid_end = task
+    # Positional slices of the shared matrix; nothing is copied until the estimator needs it
+    train_df = _worker_df.iloc[:train_end]
+    valid_df = _worker_df.iloc[train_end:valid_end]
+
+    pipe = build_pipeline()
+    pipe.fit(train_df[NUMERIC_FEATURES + CATEGORICAL_FEATURES], train_df[TARGET].to_numpy())
+
+    y = valid_df[TARGET].to_numpy(dtype=np.float64)
+    preds = {
+        "baseline": baseline_naive(valid_df).astype(np.float64),
+        "ridge": pipe.predict(valid_df[NUMERIC_FEATURES + CATEGORICAL_FEATURES]),
+    }
+
+    codes = valid_df["series_code"].to_numpy()
+    out = {
+        "fold": fold,
+        "train_rows": int(train_end),
+        "valid_rows": int(valid_end - train_end),
+        "metrics": {name: {"mae": float(np.mean(np.abs(y - p))), "wape": wape(y, p)} for name, p in preds.items()},
+        # Per-series sums so folds can be pooled exactly afterwards
+        "series_n": np.bincount(codes, minlength=_worker_n_series),
+        "series_actual": np.bincount(codes, weights=np.abs(y), minlength=_worker_n_series),
+        "series_abs_err": {
+            name: np.bincount(codes, weights=np.abs(y - p), minlength=_worker_n_series) for name, p in preds.items()
+        },
+    }
+    return out
+
+@profiled()
+def run_backtest(df: pd.DataFrame, series: pd.DataFrame, folds: pd.DataFrame, workers: int):
+    """
+    Fit the Ridge pipeline and the naive baseline on every fold.
+    Returns (fold_table, series_table).
+    """
+    tasks = list(folds[["fold", "train_end", "valid_end"]].itertuples(index=False, name=None))
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df, len(series))) as pool:
+            results = list(pool.map(_run_fold, tasks))
+    else:
+        _init_worker(df, len(series))
+        results = [_run_fold(t) for t in tasks]
+
+    fold_rows = []
+    for r, cutoff in zip(results, folds["cutoff"]):
+        row = {"fold": r["fold"], "cutoff": pd.Timestamp(cutoff).date(), "train_rows": r["train_rows"], "valid_rows": r["valid_rows"]}
+        for name in MODELS:
+            row[f"{name}_mae"] = r["metrics"][name]["mae"]
+            row[f"{name}_wape"] = r["metrics"][name]["wape"]
+        fold_rows.append(row)
+    fold_table = pd.DataFrame(fold_rows)
+
+    n = sum(r["series_n"] for r in results)
+    actual = sum(r["series_actual"] for r in results)
+    series_table = series.copy()
+    series_table["valid_rows"] = n
+    series_table["folds"] = sum((r["series_n"] > 0).astype(int) for r in results)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name in MODELS:
+            abs_err = sum(r["series_abs_err"][name] for r in results)
+            series_table[f"{name}_mae"] = abs_err / n
+            series_table[f"{name}_wape"] = np.where(actual > 0, abs_err / actual, np.nan)
+    series_table = series_table[series_table["valid_rows"] > 0]
+    series_table = series_table.sort_values(["sku", "channel"]).reset_index(drop=True)
+    return fold_table, series_table
+
+def summarize(fold_table: pd.DataFrame) -> dict:
+    summary = {
+        "folds": int(len(fold_table)),
+        "first_cutoff": str(fold_table["cutoff"].min()),
+        "last_cutoff": str(fold_table["cutoff"].max()),
+        "metrics": {},
+    }
+    for name in MODELS:
+        summary["metrics"][name] = {
+            "mae_mean": float(fold_table[f"{name}_mae"].mean()),
+            "wape_mean": float(fold_table[f"{name}_wape"].mean()),
+            "wape_std": float(fold_table[f"{name}_wape"].std(ddof=0)),
+        }
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the Ridge model vs the naive baseline.")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS)
+    parser.add_argument("--step-days", type=int, default=DEFAULT_STEP_DAYS, help="Days between consecutive cutoffs")
+    parser.add_argument("--valid-days", type=int, default=DEFAULT_VALID_DAYS, help="Days validated after each cutoff")
+    parser.add_argument("--min-train-days", type=int, default=MIN_TRAIN_DAYS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    return parser.parse_args(argv)
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+    if not FEATURES_FILE.exists():
+        raise FileNotFoundError("Missing features.parquet. Run `python -m src.features` first.")
+
+    df, series = load_matrix()
+    folds = make_folds(df["date"].to_numpy(), args.folds, args.step_days, args.valid_days, args.min_train_days)
+    if len(folds) == 0:
+        raise ValueError("No backtest folds fit in the feature history. Lower --folds or --min-train-days.")
+
+    fold_table, series_table = run_backtest(df, series, folds, args.workers)
+    fold_table.to_csv(BACKTEST_FOLDS_FILE, index=False)
+    series_table.to_csv(BACKTEST_SERIES_FILE, index=False)
+
+    summary = summarize(fold_table)
+    # Attach to the model metadata so the single-split metrics have a fold-averaged companion
+    if META_FILE.exists():
+        with open(META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["backtest"] = {**summary, "step_days": args.step_days, "valid_days": args.valid_days}
+        with open(META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    print(f"=== Walk-forward backtest ({summary['folds']} folds, {summary['first_cutoff']} .. {summary['last_cutoff']}) ===")
+    for name in MODELS:
+        m = summary["metrics"][name]
+        print(f"{name:<9}: MAE={m['mae_mean']:.3f} | WAPE={m['wape_mean']:.3f} ± {m['wape_std']:.3f}")
+    print(f"Per-fold metrics saved to: {BACKTEST_FOLDS_FILE}")
+    print(f"Per-series metrics saved to: {BACKTEST_SERIES_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,349 @@
+import argparse
+import json
+import re
+import shutil
+import uuid
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from src import schema, store
+from src.config import FEATURE_LAG_COLUMNS, FEATURE_LAGS, FEATURE_ROLLING_WINDOWS
+from src.profiling import profiled
+
 PROCESSED = Path("data/processed")
+# Partitioned parquet dataset (see src/store.py): one file set per full or incremental run
 FEATURES_FILE = PROCESSED / "features.parquet"
 
+# Incremental mode: last rows per series + high-water mark of the sales already featurized
+FEATURES_STATE_FILE = PROCESSED / "features_state.parquet"
+FEATURES_STATE_META = PROCESSED / "features_state.json"
+
 CLEAN_PARQUET = PROCESSED / "clean_sales.parquet"
 CLEAN_CSV = PROCESSED / "clean_sales.csv"
 
-def load_clean_sales() -> pd.DataFrame:
+GROUP_COLS = ["sku", "channel"]
+
+# Lag features: source column -> output prefix, shifted by each lag (yesterday, last week, two weeks).
+# Defined in config, which derives the features schema from them
+LAGS = FEATURE_LAGS
+LAG_COLUMNS = FEATURE_LAG_COLUMNS
+
+# Past-only rolling means of units_sold: window -> min_periods
+ROLLING_WINDOWS = FEATURE_ROLLING_WINDOWS
+
+SALES_COLUMNS = ["date", "sku", "channel", "units_sold", "price", "promo_flag"]
+
+@profiled()
+def load_clean_sales(since=None) -> pd.DataFrame:
+    """Load clean sales, optionally only rows with date > since (pushed down to parquet)."""
     if CLEAN_PARQUET.exists():
-        df = pd.read_parquet(CLEAN_PARQUET)
+        filters = None if since is None else [("date", ">", pd.Timestamp(since))]
+        df = schema.read_parquet(CLEAN_PARQUET, "clean_sales", filters=filters)
     elif CLEAN_CSV.exists():
         df = pd.read_csv(CLEAN_CSV)
         df["date"] = pd.to_datetime(df["date"])
+        df = schema.cast(df, "clean_sales")
+        if since is not None:
+            df = df[df["date"] > pd.Timestamp(since)]
     else:
         raise FileNotFoundError("Run `python -m src.clean` first.")
     return df
 
 def add_calendar_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["dayofweek"] = df["date"].dt.dayofweek  # 0=Mon
-    df["month"] = df["date"].dt.month
-    df["weekofyear"] = df["date"].dt.isocalendar().week.astype(int)
-    df["is_weekend"] = (df["dayofweek"] >= 5).astype(int)
-    return df
+    dayofweek = df["date"].dt.dayofweek  # 0=Mon
+    return pd.concat([df, pd.DataFrame({
+        "dayofweek": dayofweek,
+        "month": df["date"].dt.month,
+        "weekofyear": df["date"].dt.isocalendar().week.astype(int),
+        "is_weekend": (dayofweek >= 5).astype(int),
+    }, index=df.index)], axis=1)
 
-def add_lag_and_rolling(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    group_cols = ["sku", "channel"]
+# -----------------------------
+# Segmented-array engine
+# -----------------------------
+class SeriesLayout:
+    """
+    Row layout of a frame grouped by (sku, channel).
 
-    # Lags (yesterday, last week, two weeks)
-    for lag in [1, 7, 14]:
-        df[f"units_lag_{lag}"] = df.groupby(group_cols)["units_sold"].shift(lag)
-        df[f"price_lag_{lag}"] = df.groupby(group_cols)["price"].shift(lag)
-        df[f"promo_lag_{lag}"] = df.groupby(group_cols)["promo_flag"].shift(lag)
+    Rows are viewed in group-contiguous order (a stable sort by group, which keeps
+    each series in its original row order, like groupby().shift does). When the frame
+    is already sorted by (sku, channel, date) no reordering is needed at all.
+    """
 
-    # Rolling means based on past values only (shift(1) prevents leakage)
-    df["units_roll7_mean"] = df.groupby(group_cols)["units_sold"].transform(
-        lambda s: s.shift(1).rolling(window=7, min_periods=3).mean()
-    )
+    def __init__(self, df: pd.DataFrame):
+        codes = df.groupby(GROUP_COLS, sort=False).ngroup().to_numpy()
+        if len(codes) and np.any(codes[1:] < codes[:-1]):
+            self.order = np.argsort(codes, kind="stable")
+            codes = codes[self.order]
+        else:
+            self.order = None
 
-    df["units_roll14_mean"] = df.groupby(group_cols)["units_sold"].transform(
-        lambda s: s.shift(1).rolling(window=14, min_periods=5).mean()
-    )
+        n = len(codes)
+        self.starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if n else np.array([], dtype=np.int64)
+        self.lengths = np.diff(np.r_[self.starts, n])
+        # Position of each row within its series, counted from the start and from the end
+        self.pos = np.arange(n) - np.repeat(self.starts, self.lengths)
+        self.pos_from_end = np.repeat(self.lengths, self.lengths) - 1 - self.pos
 
-    return df
+    def gather(self, values: np.ndarray) -> np.ndarray:
+        return values if self.order is None else values[self.order]
+
+    def scatter(self, values: np.ndarray) -> np.ndarray:
+        if self.order is None:
+            return values
+        out = np.empty_like(values)
+        out[self.order] = values
+        return out
+
+    def shift(self, values: np.ndarray, periods: int) -> np.ndarray:
+        """Per-series shift of group-contiguous values; positive periods look back."""
+        out = np.full(len(values), np.nan)
+        if periods > 0:
+            out[periods:] = values[:-periods]
+            out[self.pos < periods] = np.nan
+        elif periods < 0:
+            out[:periods] = values[-periods:]
+            out[self.pos_from_end < -periods] = np.nan
+        else:
+            out[:] = values
+        return out
+
+    def rolling_mean(self, values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+        """
+        Per-series trailing mean over `window` rows, ignoring NaNs, via cumulative sums.
+        Sums of integer-valued inputs (units) are exact in float64, so the result equals
+        pandas' rolling().mean() bit for bit.
+        """
+        valid = ~np.isnan(values)
+        csum = np.r_[0.0, np.cumsum(np.where(valid, values, 0.0))]
+        ccount = np.r_[0, np.cumsum(valid)]
+
+        idx = np.arange(len(values))
+        lo = np.maximum(idx - window + 1, idx - self.pos)
+        total = csum[idx + 1] - csum[lo]
+        count = ccount[idx + 1] - ccount[lo]
+
+        out = np.full(len(values), np.nan)
+        ok = count >= min_periods
+        out[ok] = total[ok] / count[ok]
+        return out
+
+@profiled()
+def add_lag_and_rolling(df: pd.DataFrame, lags=LAGS, rolling_windows=None) -> pd.DataFrame:
+    rolling_windows = ROLLING_WINDOWS if rolling_windows is None else rolling_windows
+    layout = SeriesLayout(df)
+    new_cols = {}
+
+    # Lags
+    sources = {col: layout.gather(df[col].to_numpy(dtype=np.float64)) for col in LAG_COLUMNS}
+    for lag in lags:
+        for col, prefix in LAG_COLUMNS.items():
+            new_cols[f"{prefix}_lag_{lag}"] = layout.scatter(layout.shift(sources[col], lag))
+
+    # Rolling means based on past values only (shift(1) prevents leakage)
+    past_units = layout.shift(sources["units_sold"], 1)
+    for window, min_periods in rolling_windows.items():
+        new_cols[f"units_roll{window}_mean"] = layout.scatter(
+            layout.rolling_mean(past_units, window, min_periods)
+        )
+
+    return pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
 
 
 def add_target(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    group_cols = ["sku", "channel"]
+    layout = SeriesLayout(df)
 
     # Predict next-day units
-    df["target_units_next_day"] = df.groupby(group_cols)["units_sold"].shift(-1)
-    return df
+    units = layout.gather(df["units_sold"].to_numpy(dtype=np.float64))
+    target = layout.scatter(layout.shift(units, -1))
+    return pd.concat([df, pd.DataFrame({"target_units_next_day": target}, index=df.index)], axis=1)
 
-def main():
-    df = load_clean_sales()
+@profiled()
+def build_features(df: pd.DataFrame, lags=LAGS, rolling_windows=None) -> pd.DataFrame:
     df = df.sort_values(["sku", "channel", "date"]).reset_index(drop=True)
 
     df = add_calendar_features(df)
-    df = add_lag_and_rolling(df)
+    df = add_lag_and_rolling(df, lags=lags, rolling_windows=rolling_windows)
     df = add_target(df)
+    return df
+
+# -----------------------------
+# Incremental materialization
+# -----------------------------
+def state_rows(lags=LAGS, rolling_windows=None) -> int:
+    """Rows kept per series: the history the newest row's lags/windows need, plus that row."""
+    rolling_windows = ROLLING_WINDOWS if rolling_windows is None else rolling_windows
+    return max(max(lags), max(rolling_windows)) + 1
+
+def state_config() -> dict:
+    return {"lags": list(LAGS), "rolling_windows": {str(k): v for k, v in ROLLING_WINDOWS.items()}}
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+def full_run_id():
+    """Id of the full rebuild the features dataset descends from (None without state)."""
+    if not FEATURES_STATE_META.exists():
+        return None
+    with open(FEATURES_STATE_META, "r", encoding="utf-8") as f:
+        return json.load(f).get("run_id")
+
+def save_state(sales: pd.DataFrame, high_water_mark: pd.Timestamp, run_id: str = None):
+    """
+    Save the per-series tail and high-water mark. Full rebuilds pass a new run_id;
+    incremental runs keep the current one (predict.cache_key hashes it).
+    """
+    run_id = run_id or full_run_id()
+    tail = (
+        sales[SALES_COLUMNS]
+        .sort_values(["sku", "channel", "date"])
+        .groupby(GROUP_COLS, sort=False)
+        .tail(state_rows())
+        .reset_index(drop=True)
+    )
+    schema.write_parquet(tail, FEATURES_STATE_FILE, "clean_sales")
+    with open(FEATURES_STATE_META, "w", encoding="utf-8") as f:
+        json.dump({"high_water_mark": str(high_water_mark.date()), "run_id": run_id, **state_config()}, f, indent=2)
+
+def load_state():
+    """Return (tail, high_water_mark), or None if there is no state usable with the current config."""
+    if not (FEATURES_STATE_FILE.exists() and FEATURES_STATE_META.exists() and FEATURES_FILE.is_dir()):
+        return None
+    with open(FEATURES_STATE_META, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if {k: meta.get(k) for k in state_config()} != state_config():
+        return None
+    return schema.read_parquet(FEATURES_STATE_FILE, "clean_sales"), pd.Timestamp(meta["high_water_mark"])
+
+def load_series_tail(n_rows: int = None) -> pd.DataFrame:
+    """
+    Last n_rows raw sales rows per series (default: state_rows()), sorted by (sku, channel, date).
+    Uses the tail saved by the last features run when available, otherwise scans clean sales.
+    """
+    n_rows = state_rows() if n_rows is None else n_rows
+    state = load_state() if n_rows <= state_rows() else None
+    sales = state[0] if state is not None else load_clean_sales()[SALES_COLUMNS]
+    return (
+        sales.sort_values(["sku", "channel", "date"])
+        .groupby(GROUP_COLS, sort=False)
+        .tail(n_rows)
+        .reset_index(drop=True)
+    )
+
+def model_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows with complete features and target, in the features artifact schema."""
+    return schema.cast(df.dropna().reset_index(drop=True), "features")
+
+def reset_features_dir():
+    store.drop_ipc(FEATURES_FILE)
+    if FEATURES_FILE.exists():
+        if FEATURES_FILE.is_dir():
+            shutil.rmtree(FEATURES_FILE)
+        else:
+            FEATURES_FILE.unlink()
+    FEATURES_FILE.mkdir(parents=True)
+
+# Fragments are named after the high-water mark of the run that wrote them (src/shard.py adds
+# a -shardNNN suffix); predict selects the rows it has not scored yet by it
+FRAGMENT_PATTERN = re.compile(r"part-(\d{8})-")
+
+def fragment_name(high_water_mark: pd.Timestamp) -> str:
+    return f"part-{pd.Timestamp(high_water_mark):%Y%m%d}"
+
+def fragment_high_water_mark(path):
+    """High-water mark of the run that wrote a features file, or None for other file names."""
+    match = FRAGMENT_PATTERN.match(Path(path).name)
+    return None if match is None else pd.Timestamp(match.group(1))
+
+def fragment_files(after: pd.Timestamp = None) -> list:
+    """Files of the features dataset, only those of runs with a high-water mark after `after` when given."""
+    files = sorted(FEATURES_FILE.rglob("*.parquet")) if FEATURES_FILE.is_dir() else []
+    if after is None:
+        return files
+    marks = [fragment_high_water_mark(f) for f in files]
+    return [f for f, mark in zip(files, marks) if mark is not None and mark > pd.Timestamp(after)]
+
+def stored_high_water_mark():
+    """Newest high-water mark among the features fragments (None without named fragments)."""
+    return max((m for m in map(fragment_high_water_mark, fragment_files()) if m is not None), default=None)
+
+@profiled()
+def write_fragment(model_df: pd.DataFrame, high_water_mark: pd.Timestamp, reset: bool = False):
+    if reset:
+        reset_features_dir()
+    FEATURES_FILE.mkdir(parents=True, exist_ok=True)
+    store.write_partitioned(model_df, FEATURES_FILE, "features", name=fragment_name(high_water_mark), mirror=True)
+    return FEATURES_FILE
+
+@profiled()
+def run_full():
+    sales = load_clean_sales()
+    df = build_features(sales)
 
     # Drop rows where features/target are missing (first days have no lag, last day has no target)
-    model_df = df.dropna().reset_index(drop=True)
+    model_df = model_frame(df)
+
+    high_water_mark = sales["date"].max()
+    path = write_fragment(model_df, high_water_mark, reset=True)
+    save_state(sales, high_water_mark, run_id=new_run_id())
+    return df, model_df, path
+
+@profiled()
+def run_incremental():
+    """
+    Featurize only sales newer than the high-water mark.
+
+    The stored tail gives every series enough history for its lags and rolling means.
+    Each series' last stored row never made it into features.parquet (it had no target
+    yet), so it is emitted now with its back-filled target, together with the new rows.
+    Returns None when there is no usable state and a full run is needed.
+    """
+    state = load_state()
+    if state is None:
+        return None
+    tail, high_water_mark = state
+
+    new = load_clean_sales(since=high_water_mark)
+    if len(new) == 0:
+        return new, new, None
+
+    # Rows to emit: every series' pending last row + all new rows
+    tail = tail.assign(_emit=tail.groupby(GROUP_COLS, sort=False).cumcount(ascending=False) == 0)
+    combined = pd.concat([tail, new[SALES_COLUMNS].assign(_emit=True)], ignore_index=True)
+
+    df = build_features(combined)
+    df = df[df["_emit"]].drop(columns="_emit")
+    model_df = model_frame(df)
 
-    model_df.to_parquet(FEATURES_FILE)
+    new_high_water_mark = new["date"].max()
+    path = write_fragment(model_df, new_high_water_mark)
+    save_state(combined, new_high_water_mark)
+    return df, model_df, path
 
-    print(f"Saved features to: {FEATURES_FILE}")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build model features from clean sales.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only featurize sales newer than the stored high-water mark and append a fragment")
+    return parser.parse_args(argv)
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+
+    result = run_incremental() if args.incremental else None
+    if result is None:
+        if args.incremental:
+            print("No usable incremental state; running a full rebuild.")
+        result = run_full()
+    df, model_df, path = result
+
+    if path is None:
+        print("No new sales since the last run; features are up to date.")
+        return
+
+    print(f"Saved features to: {path}")
     print("Rows before dropna:", len(df))
     print("Rows after dropna :", len(model_df))
     print("Columns:", len(model_df.columns))
@@ -77,5 +352,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
@@ -1,14 +1,22 @@
+import argparse
+import shutil
+
 import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+from src.profiling import profiled
+
 # -----------------------------
 # Config
 # -----------------------------
 RAW_DATA_DIR = Path("data/raw")
 RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+# Partitioned parquet dataset written by the chunked generator (one file per series block)
+SALES_DATASET_DIR = RAW_DATA_DIR / "sales"
+
 START_DATE = "2024-01-01"
 END_DATE = "2025-12-31"
 CHANNELS = ["retail", "online"]
@@ -39,9 +47,24 @@ def generate_products():
 
     return pd.DataFrame(products)
 
+def generate_catalog(n_skus: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Synthetic catalog of any size for load testing.
+    Same price/cost ranges as generate_products, drawn from a seeded Generator.
+    """
+    rng = np.random.default_rng(seed)
+    idx = np.arange(n_skus)
+    return pd.DataFrame({
+        "sku": [f"SKU_{i:06d}" for i in idx],
+        "brand": np.where(idx % 2 == 0, "Frozen Bean", "Harmony Matcha"),
+        "base_price": np.round(rng.uniform(8, 14, size=n_skus), 2),
+        "unit_cost": np.round(rng.uniform(3, 6, size=n_skus), 2),
+    })
+
 # -----------------------------
 # Sales generation
 # -----------------------------
+@profiled()
 def generate_sales(products: pd.DataFrame):
     dates = pd.date_range(START_DATE, END_DATE, freq="D")
     rows = []
@@ -86,19 +109,128 @@ def generate_sales(products: pd.DataFrame):
 
     return pd.DataFrame(rows)
 
+def calendar_factor(dates: pd.DatetimeIndex) -> np.ndarray:
+    """Weekend and summer multipliers of the demand model, as one array over dates."""
+    weekly_factor = np.where(dates.dayofweek >= 5, 1.2, 1.0)
+    summer_factor = np.where(np.isin(dates.month, [6, 7, 8]), 1.3, 1.0)
+    return weekly_factor * summer_factor
+
+def generate_series(rng: np.random.Generator, base_price: float, channel: str, cal_factor: np.ndarray):
+    """
+    Vectorized version of the generate_sales demand model for one SKU-channel series.
+    Returns (units_sold, price, promo_flag) arrays aligned with the calendar.
+    """
+    n_days = len(cal_factor)
+    base_demand = rng.integers(20, 60)
+    price_multiplier = 1.2 if channel == "online" else 1.0
+
+    promo_flag = rng.random(n_days) < 0.1
+    expected_demand = base_demand * cal_factor * np.where(promo_flag, 1.5, 1.0)
+    units_sold = rng.poisson(expected_demand)
+
+    price = np.round(base_price * price_multiplier, 2) * np.where(promo_flag, 0.85, 1.0)
+    return units_sold.astype(np.int64), np.round(price, 2), promo_flag.astype(np.int64)
+
+@profiled()
+def generate_sales_chunked(
+    products: pd.DataFrame,
+    out_dir: Path = SALES_DATASET_DIR,
+    start_date: str = START_DATE,
+    end_date: str = END_DATE,
+    seed: int = 42,
+    rows_per_chunk: int = 2_000_000,
+) -> int:
+    """
+    Stream synthetic sales to a parquet dataset, one block of series per file.
+
+    Every series gets its own Generator seeded from (seed, series_id), so the output
+    is identical regardless of rows_per_chunk and memory stays bounded by one block.
+    Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    dates = pd.date_range(start_date, end_date, freq="D")
+    n_days = len(dates)
+    cal_factor = calendar_factor(dates)
+    date_values = dates.values.astype("datetime64[D]")
+
+    series = [
+        (sku, base_price, channel)
+        for sku, base_price in zip(products["sku"], products["base_price"])
+        for channel in CHANNELS
+    ]
+    series_per_chunk = max(1, rows_per_chunk // n_days)
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    total_rows = 0
+    for chunk_id, block_start in enumerate(range(0, len(series), series_per_chunk)):
+        block = series[block_start:block_start + series_per_chunk]
+        units = np.empty(len(block) * n_days, dtype=np.int64)
+        price = np.empty(len(block) * n_days, dtype=np.float64)
+        promo = np.empty(len(block) * n_days, dtype=np.int64)
+
+        for i, (sku, base_price, channel) in enumerate(block):
+            rng = np.random.default_rng([seed, block_start + i])
+            sl = slice(i * n_days, (i + 1) * n_days)
+            units[sl], price[sl], promo[sl] = generate_series(rng, base_price, channel, cal_factor)
+
+        table = pa.table({
+            "date": pa.array(np.tile(date_values, len(block)), type=pa.date32()),
+            "sku": pa.array(np.repeat([s[0] for s in block], n_days)),
+            "channel": pa.array(np.repeat([s[2] for s in block], n_days)),
+            "units_sold": units,
+            "price": price,
+            "promo_flag": promo,
+        })
+        pq.write_table(table, out_dir / f"part-{chunk_id:05d}.parquet")
+        total_rows += table.num_rows
+
+    return total_rows
+
 # -----------------------------
 # Main
 # -----------------------------
-def main():
-    products = generate_products()
-    sales = generate_sales(products)
-
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate raw products and sales data.")
+    parser.add_argument("--chunked", action="store_true",
+                        help=f"Stream sales to a parquet dataset at {SALES_DATASET_DIR} instead of sales.csv")
+    parser.add_argument("--skus", type=int, default=None,
+                        help="Generate a synthetic catalog of this many SKUs (default: the 6 demo SKUs)")
+    parser.add_argument("--start", default=START_DATE, help="First sales date (chunked mode)")
+    parser.add_argument("--end", default=END_DATE, help="Last sales date (chunked mode)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rows-per-chunk", type=int, default=2_000_000)
+    return parser.parse_args(argv)
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+
+    products = generate_products() if args.skus is None else generate_catalog(args.skus, seed=args.seed)
     products.to_csv(RAW_DATA_DIR / "products.csv", index=False)
-    sales.to_csv(RAW_DATA_DIR / "sales.csv", index=False)
+
+    if args.chunked:
+        n_rows = generate_sales_chunked(
+            products,
+            start_date=args.start,
+            end_date=args.end,
+            seed=args.seed,
+            rows_per_chunk=args.rows_per_chunk,
+        )
+        sales_path = SALES_DATASET_DIR
+    else:
+        sales = generate_sales(products)
+        sales.to_csv(RAW_DATA_DIR / "sales.csv", index=False)
+        n_rows = len(sales)
+        sales_path = RAW_DATA_DIR / "sales.csv"
 
     print("Raw data generated:")
     print(f"- {len(products)} products")
-    print(f"- {len(sales)} sales rows")
+    print(f"- {n_rows} sales rows -> {sales_path}")
 
 if __name__ == "__main__":
     main()
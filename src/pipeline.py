@@ -0,0 +1,309 @@
+import argparse
+import hashlib
+import importlib
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src import config, profiling
+from src.profiling import profiled
+from src.utils import file_digest
+
+# -----------------------------
+# Stage logic: each takes the in-memory artifact store and returns the frames it produced.
+# Artifacts are still written to disk (dashboard + standalone stages), but downstream
+# stages in the same run receive them in memory instead of re-reading them.
+# -----------------------------
+def run_ingest(store, params):
+    import numpy as np
+    ingest = importlib.import_module("src.ingest")
+
+    np.random.seed(42)  # same stream as a fresh `python -m src.ingest`
+    products = ingest.generate_products()
+    sales = ingest.generate_sales(products)
+    products.to_csv(ingest.RAW_DATA_DIR / "products.csv", index=False)
+    sales.to_csv(ingest.RAW_DATA_DIR / "sales.csv", index=False)
+    return {"products": products, "raw_sales": sales}
+
+def run_clean(store, params):
+    clean = importlib.import_module("src.clean")
+
+    if "raw_sales" not in store.frames:
+        # Same out-of-core path as `python -m src.clean`; features reads clean_sales from disk
+        clean.run(clean.default_input())
+        return {}
+
+    raw = store.frames["raw_sales"]
+    clean_df, rejects = clean.clean_frame(raw)
+    clean.write_clean_frame(clean_df, rejects, rows_in=len(raw), source="memory:ingest")
+    return {"clean_sales": clean_df}
+
+def run_features(store, params):
+    features = importlib.import_module("src.features")
+
+    sales = store.get("clean_sales")
+    df = features.build_features(sales)
+    model_df = features.model_frame(df)
+
+    high_water_mark = sales["date"].max()
+    features.write_fragment(model_df, high_water_mark, reset=True)
+    features.save_state(sales, high_water_mark, run_id=features.new_run_id())
+    return {"features": model_df}
+
+def run_train(store, params):
+    train = importlib.import_module("src.train")
+
+    df = store.get("features")
+    pipe, meta, X_valid = train.fit(df, split_date=params["split_date"])
+    local = None
+    if params.get("local"):
+        local, meta["local_models"] = train.fit_local(df, pipe, split_date=params["split_date"])
+    train.save_model(pipe, meta, X_valid)
+    if local is not None:
+        train.save_local_models(local)
+    # Downstream scores with the same model object a standalone `python -m src.predict` would load
+    return {"model": _load_model()}
+
+def run_predict(store, params):
+    features = importlib.import_module("src.features")
+    predict = importlib.import_module("src.predict")
+    rollup = importlib.import_module("src.rollup")
+    schema = importlib.import_module("src.schema")
+    series_file = importlib.import_module("src.series_file")
+
+    model = store.get("model")
+    forecast_df = predict.score_features(store.get("features"), model)
+    predict.write_full_forecast(forecast_df)
+    cube = rollup.build_cube(forecast_df)
+    rollup.write_rollup(cube)
+    series_file.write(*series_file.build(forecast_df, store.get("features")))
+    sketch = predict.ResidualSketch.from_forecast(forecast_df, window=predict.LEAD_TIME_DAYS)
+    sketch.save(predict.SKETCH_FILE)
+
+    tail = store.get("clean_sales").groupby(features.GROUP_COLS, sort=False).tail(features.state_rows())
+    horizon_df = predict.forecast_horizon(model, tail, params["horizon"])
+    schema.write_parquet(horizon_df, predict.FORECAST_HORIZON_FILE, "forecast_horizon")
+    return {"forecast": forecast_df, "forecast_horizon": horizon_df, "rollup": cube, "residual_sketch": sketch}
+
+def run_reorder(store, params):
+    reorder = importlib.import_module("src.reorder")
+
+    plan = reorder.build_reorder_plan(store.get("forecast"), store.get("forecast_horizon"), store.get("residual_sketch"))
+    plan.to_csv(reorder.REORDER_FILE, index=False)
+    _write_ipc(plan, reorder.REORDER_FILE)
+    return {"reorder_plan": plan}
+
+def run_decision(store, params):
+    decision = importlib.import_module("src.decision")
+
+    report = decision.build_decision_report(store.get("forecast"), store.get("reorder_plan"), decision.load_policy())
+    report.to_csv(decision.DECISION_FILE, index=False)
+    _write_ipc(report, decision.DECISION_FILE)
+    return {"decision_report": report}
+
+STAGE_RUNNERS = {name: globals()[f"run_{name}"] for name in config.PIPELINE_STAGES}
+
+# -----------------------------
+# Artifact store: in-memory frames, with disk loaders for stages that were skipped
+# -----------------------------
+def _read_parquet(path, artifact):
+    return importlib.import_module("src.schema").read_parquet(path, artifact)
+
+def _read_store(path, artifact):
+    return importlib.import_module("src.store").read(path, artifact)
+
+def _write_ipc(frame, path):
+    importlib.import_module("src.store").write_ipc(frame, path)
+
+def _read_csv(path):
+    """CSV export, from its memory-mapped IPC mirror when that is current."""
+    frame = importlib.import_module("src.store").read_ipc(path)
+    if frame is not None:
+        return frame
+    import pandas as pd
+    return pd.read_csv(path, float_precision="round_trip")
+
+def _load_sketch():
+    return importlib.import_module("src.sketch").ResidualSketch.load()
+
+def _load_model():
+    return importlib.import_module("src.predict").load_model()
+
+ARTIFACTS = {
+    # name: (producing stage, output paths, loader)
+    "raw_sales": ("ingest", [config.RAW_DATA_DIR / "sales.csv", config.RAW_DATA_DIR / "products.csv"], None),
+    "clean_sales": ("clean", [config.PROCESSED / "clean_sales.parquet"],
+                    lambda: _read_parquet(config.PROCESSED / "clean_sales.parquet", "clean_sales")),
+    "features": ("features", [config.PROCESSED / "features.parquet", config.PROCESSED / "features_state.parquet"],
+                 lambda: _read_store(config.PROCESSED / "features.parquet", "features")),
+    "model": ("train", [config.MODELS_DIR / "model.pkl", config.MODELS_DIR / "scorer.npz", config.MODELS_DIR / "metadata.json"],
+              _load_model),
+    "forecast": ("predict", [config.PROCESSED / "forecast.parquet"],
+                 lambda: _read_store(config.PROCESSED / "forecast.parquet", "forecast")),
+    "forecast_horizon": ("predict", [config.PROCESSED / "forecast_horizon.parquet"],
+                         lambda: _read_parquet(config.PROCESSED / "forecast_horizon.parquet", "forecast_horizon")),
+    "forecast_series": ("predict", [config.PROCESSED / "forecast_series.arrow",
+                                    config.PROCESSED / "forecast_series_index.parquet"], None),
+    "residual_sketch": ("predict", [config.PROCESSED / "residual_sketch.npz"], _load_sketch),
+    "rollup": ("predict", [config.PROCESSED / "rollup_cube.parquet", config.PROCESSED / "rollup_prefix.npz"],
+               lambda: _read_parquet(config.PROCESSED / "rollup_cube.parquet", "rollup")),
+    "reorder_plan": ("reorder", [config.PROCESSED / "reorder_plan.csv"],
+                     lambda: _read_csv(config.PROCESSED / "reorder_plan.csv")),
+    "decision_report": ("decision", [config.PROCESSED / "decision_report.csv"], None),
+}
+
+def stage_outputs(stage: str):
+    return [p for _, (producer, paths, _) in ARTIFACTS.items() if producer == stage for p in paths]
+
+class ArtifactStore:
+    def __init__(self):
+        self.frames = {}
+
+    def get(self, name: str):
+        if name not in self.frames:
+            loader = ARTIFACTS[name][2]
+            if loader is None:
+                raise KeyError(f"Artifact {name!r} is not available in memory")
+            self.frames[name] = loader()
+        return self.frames[name]
+
+# -----------------------------
+# Fingerprints
+# -----------------------------
+def _raw_sales_digest() -> str:
+    """Content hash of the raw sales input (CSV or parquet dataset)."""
+    dataset = config.RAW_DATA_DIR / "sales"
+    files = sorted(dataset.glob("*.parquet")) if dataset.exists() else [config.RAW_DATA_DIR / "sales.csv"]
+    h = hashlib.sha256()
+    for f in files:
+        h.update(f.name.encode())
+        h.update(file_digest(f).encode() if f.exists() else b"missing")
+    return h.hexdigest()
+
+def _policy_digest() -> str:
+    """Name + content hash of the promoted policy decision.load_policy would use."""
+    path = importlib.import_module("src.decision").active_policy_file()
+    if path is None:
+        return "defaults"
+    return f"{path.name}:{file_digest(path)}"
+
+def stage_fingerprint(stage: str, upstream: dict) -> str:
+    h = hashlib.sha256(stage.encode())
+    for path in config.STAGE_CODE[stage]:
+        h.update(file_digest(Path(path)).encode())
+    h.update(json.dumps(config.PIPELINE_PARAMS.get(stage, {}), sort_keys=True).encode())
+    for dep in config.STAGE_INPUTS[stage]:
+        h.update(upstream[dep].encode())
+    if stage == "clean":
+        h.update(_raw_sales_digest().encode())
+    if stage == "decision":
+        h.update(_policy_digest().encode())
+    return h.hexdigest()
+
+# -----------------------------
+# Runner
+# -----------------------------
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def load_manifest() -> dict:
+    if not config.RUN_MANIFEST.exists():
+        return {}
+    with open(config.RUN_MANIFEST, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def run_pipeline(stages=None, force=(), trace_memory: bool = True) -> dict:
+    stages = stages or config.PIPELINE_STAGES
+    previous = {s["name"]: s for s in load_manifest().get("stages", [])}
+    store = ArtifactStore()
+    fingerprints = {}
+    records = []
+    started = time.perf_counter()
+
+    # Under BEVOPS_PROFILE the run record's tracemalloc session is already active
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    for stage in config.PIPELINE_STAGES:
+        if stage not in stages:
+            # Not requested: reuse the last recorded fingerprint so downstream keys stay stable
+            fingerprints[stage] = previous.get(stage, {}).get("fingerprint", "")
+            continue
+
+        fp = stage_fingerprint(stage, fingerprints)
+        fingerprints[stage] = fp
+        outputs = stage_outputs(stage)
+
+        cached = (
+            stage not in force
+            and previous.get(stage, {}).get("fingerprint") == fp
+            and previous.get(stage, {}).get("status") in ("ran", "skipped")
+            and all(p.exists() for p in outputs)
+        )
+        record = {"name": stage, "fingerprint": fp, "outputs": [str(p) for p in outputs]}
+
+        if cached:
+            record.update(status="skipped", wall_s=0.0)
+            print(f"[{stage}] unchanged, skipped")
+        else:
+            print(f"[{stage}] running")
+            if trace_memory:
+                tracemalloc.reset_peak()
+            t0 = time.perf_counter()
+            with profiling.span(f"stage.{stage}") as s:
+                produced = STAGE_RUNNERS[stage](store, config.PIPELINE_PARAMS.get(stage, {}))
+            store.frames.update(produced)
+            record.update(status="ran", wall_s=round(time.perf_counter() - t0, 4))
+            if s is not None:
+                # Nested spans reset the tracemalloc peak; the span folds them back together
+                record["peak_traced_mb"] = round(s["peak_traced_mb"], 2)
+            elif trace_memory:
+                record["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            record["max_rss_mb"] = round(_max_rss_mb(), 1)
+            print(f"[{stage}] done in {record['wall_s']:.2f}s")
+        records.append(record)
+
+    if started_tracing:
+        tracemalloc.stop()
+
+    manifest = {
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "total_wall_s": round(time.perf_counter() - started, 4),
+        "stages": records,
+    }
+    config.RUN_MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    with open(config.RUN_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the pipeline in one process with stage caching.")
+    parser.add_argument("--stages", nargs="+", choices=config.PIPELINE_STAGES, default=None,
+                        help="Only run these stages (default: all)")
+    parser.add_argument("--force", nargs="*", choices=config.PIPELINE_STAGES, default=None,
+                        help="Re-run these stages even if unchanged (no names: all)")
+    parser.add_argument("--no-trace-memory", action="store_true",
+                        help="Skip tracemalloc peak tracking (it slows allocation-heavy stages)")
+    return parser.parse_args(argv)
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+    force = config.PIPELINE_STAGES if args.force == [] else (args.force or [])
+    manifest = run_pipeline(stages=args.stages, force=force, trace_memory=not args.no_trace_memory)
+
+    print(f"\nRun manifest saved to: {config.RUN_MANIFEST}")
+    print(f"{'stage':<10} {'status':<8} {'wall_s':>8} {'peak_mb':>9}")
+    for r in manifest["stages"]:
+        peak = r.get("peak_traced_mb")
+        print(f"{r['name']:<10} {r['status']:<8} {r['wall_s']:>8.2f} {peak if peak is not None else '-':>9}")
+    print(f"Total: {manifest['total_wall_s']:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,151 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-import joblib
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from pathlib import Path
 
+from src import features, rollup, schema, series_file, store
+from src.profiling import profiled
+from src.reorder import LEAD_TIME_DAYS
+from src.scorer import LOCAL_MODELS_FILE, SCORER_FILE, LinearScorer, LocalLinearScorer
+from src.sketch import SKETCH_FILE, ResidualSketch, window_sums
+from src.utils import file_digest
+
 PROCESSED = Path("data/processed")
 MODELS = Path("models")
 
 FEATURES_FILE = PROCESSED / "features.parquet"
+# Partitioned parquet dataset (see src/store.py): full backfill files + one appended file set per daily run
 FORECAST_FILE = PROCESSED / "forecast.parquet"
+# Cache key (model + feature schema), date watermark of the rows already scored, and the
+# high-water mark of the newest features fragment scored (later fragments are the new rows)
+FORECAST_CACHE_META = PROCESSED / "forecast_cache.json"
+FORECAST_HORIZON_FILE = PROCESSED / "forecast_horizon.parquet"
 MODEL_FILE = MODELS / "model.pkl"
 
 TARGET = "target_units_next_day"
 
-def main():
-    # Load data + model
-    df = pd.read_parquet(FEATURES_FILE)
-    model = joblib.load(MODEL_FILE)
+# Days ahead covered by the multi-horizon forecast (reorder sums the lead time out of it)
+DEFAULT_HORIZON = 14
+
+def future_plan(tail: pd.DataFrame, last_rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Default price/promo assumption for future days: no promo, regular price
+    (the last non-promo price in the tail, else the last observed price).
+    """
+    regular = tail[tail["promo_flag"] == 0].groupby(["sku", "channel"], sort=False)["price"].last()
+    plan = last_rows[["sku", "channel", "price"]].set_index(["sku", "channel"])
+    plan["price"] = regular.reindex(plan.index).fillna(plan["price"])
+    plan["promo_flag"] = 0
+    return plan.reset_index()
+
+@profiled()
+def forecast_horizon(model, tail: pd.DataFrame, horizon: int, plan: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Recursive multi-horizon forecast for every series at once.
+
+    `tail` holds the last features.state_rows() raw sales rows per series. Units, price
+    and promo are laid out as (series x slot) matrices; each step builds the feature row
+    of day T+k for all series from those matrices, calls model.predict once on the stacked
+    rows, and writes the (floored at 0) prediction for T+k+1 back as a future lag.
+    `plan` optionally sets price/promo_flag per (sku, channel, date) inside the horizon,
+    e.g. a scheduled promo; other future days assume no promo at the regular price.
+
+    Returns one row per series and horizon step: sku, channel, origin_date, horizon, date, prediction.
+    """
+    tail = tail.sort_values(["sku", "channel", "date"]).reset_index(drop=True)
+    n_hist = features.state_rows()
+
+    # Row-based slots (like the groupby shifts): the last row of each series sits in slot n_hist - 1
+    pos_from_end = tail.groupby(["sku", "channel"], sort=False).cumcount(ascending=False).to_numpy()
+    tail = tail[pos_from_end < n_hist]
+    pos_from_end = pos_from_end[pos_from_end < n_hist]
+    series_id = tail.groupby(["sku", "channel"], sort=False).ngroup().to_numpy()
+    slot = n_hist - 1 - pos_from_end
+
+    last_rows = tail[pos_from_end == 0].reset_index(drop=True)
+    n_series = len(last_rows)
+    n_slots = n_hist + horizon
+
+    mats = {}
+    for col in features.LAG_COLUMNS:
+        m = np.full((n_series, n_slots), np.nan)
+        m[series_id, slot] = tail[col].to_numpy(dtype=np.float64)
+        mats[col] = m
+
+    # Price/promo for future days: default plan, overridden by an explicit plan where given
+    origin = last_rows["date"].to_numpy(dtype="datetime64[D]")
+    default = future_plan(tail, last_rows)
+    for col in ["price", "promo_flag"]:
+        mats[col][:, n_hist:] = default[col].to_numpy(dtype=np.float64)[:, None]
+    if plan is not None:
+        keyed = last_rows[["sku", "channel"]].assign(_sid=np.arange(n_series))
+        p = plan.merge(keyed, on=["sku", "channel"])
+        step = (pd.to_datetime(p["date"]).to_numpy(dtype="datetime64[D]") - origin[p["_sid"]]).astype(int)
+        ok = (step >= 1) & (step < horizon)
+        for col in ["price", "promo_flag"]:
+            if col in p.columns:
+                mats[col][p["_sid"].to_numpy()[ok], n_hist - 1 + step[ok]] = p[col].to_numpy(dtype=np.float64)[ok]
 
+    units = mats["units_sold"]
+    out = np.empty((n_series, horizon))
+
+    for k in range(horizon):
+        r = n_hist - 1 + k
+        dates = pd.DatetimeIndex(origin + np.timedelta64(k, "D"))
+
+        X = {
+            "date": dates,
+            "sku": last_rows["sku"].to_numpy(),
+            "channel": last_rows["channel"].to_numpy(),
+            "units_sold": units[:, r],
+            "price": mats["price"][:, r],
+            "promo_flag": mats["promo_flag"][:, r],
+            "dayofweek": dates.dayofweek,
+            "month": dates.month,
+            "weekofyear": dates.isocalendar().week.to_numpy(dtype=int),
+            "is_weekend": (dates.dayofweek >= 5).astype(int),
+        }
+        for lag in features.LAGS:
+            for col, prefix in features.LAG_COLUMNS.items():
+                X[f"{prefix}_lag_{lag}"] = mats[col][:, r - lag]
+        for window, min_periods in features.ROLLING_WINDOWS.items():
+            past = units[:, r - window:r]
+            count = np.sum(~np.isnan(past), axis=1)
+            with np.errstate(invalid="ignore"):
+                mean = np.nansum(past, axis=1) / count
+            X[f"units_roll{window}_mean"] = np.where(count >= min_periods, mean, np.nan)
+
+        y_pred = np.maximum(model.predict(pd.DataFrame(X)), 0.0)
+        units[:, r + 1] = y_pred
+        out[:, k] = y_pred
+
+    steps = np.arange(1, horizon + 1)
+    return schema.cast(pd.DataFrame({
+        "sku": np.repeat(last_rows["sku"].to_numpy(), horizon),
+        "channel": np.repeat(last_rows["channel"].to_numpy(), horizon),
+        "origin_date": np.repeat(last_rows["date"].to_numpy(), horizon),
+        "horizon": np.tile(steps, n_series),
+        "date": (np.repeat(origin, horizon) + np.tile(steps, n_series).astype("timedelta64[D]")).astype("datetime64[ns]"),
+        "prediction": out.ravel(),
+    }), "forecast_horizon")
+
+# -----------------------------
+# Scoring + prediction cache
+# -----------------------------
+@profiled()
+def score_features(df: pd.DataFrame, model) -> pd.DataFrame:
+    df = schema.cast(df, "features")
     df["date"] = pd.to_datetime(df["date"])
     df = df.sort_values(["sku", "channel", "date"]).reset_index(drop=True)
 
-    # Keep a copy of ground truth for evaluation / dashboard
-    y_true = df[TARGET]
-
     # Drop target from features before predicting
     X = df.drop(columns=[TARGET])
 
@@ -39,12 +163,207 @@ def main():
 
     forecast_df["prediction"] = y_pred
     forecast_df["abs_error"] = (forecast_df[TARGET] - forecast_df["prediction"]).abs()
+    return schema.cast(forecast_df, "forecast")
+
+@profiled()
+def load_model():
+    """
+    Compact NumPy scorer when it was exported from the current model.pkl,
+    otherwise the pickled sklearn pipeline. Per-series local models trained
+    against the same model.pkl (`train --local`) are layered on top.
+    """
+    digest = file_digest(MODEL_FILE)
+    model = None
+    if SCORER_FILE.exists():
+        scorer = LinearScorer.load(SCORER_FILE)
+        if scorer.model_digest == digest:
+            model = scorer
+    if model is None:
+        import joblib  # only needed (with sklearn) for the pickled fallback
+
+        model = joblib.load(MODEL_FILE)
+
+    if LOCAL_MODELS_FILE.exists() and LocalLinearScorer.digest(LOCAL_MODELS_FILE) == digest:
+        return LocalLinearScorer.load(model, LOCAL_MODELS_FILE)
+    return model
+
+def cache_key(features_run_id: str = None) -> str:
+    """
+    Hash of the model artifacts plus the feature schema; any change invalidates cached predictions.
+    The id of the full features rebuild is included too (features_state.json, or
+    features_run_id while that file is still being written): a rebuild may change
+    history, while incremental runs keep the id and only append newer fragments.
+    """
+    h = hashlib.sha256(file_digest(MODEL_FILE).encode())
+    if LOCAL_MODELS_FILE.exists():
+        h.update(file_digest(LOCAL_MODELS_FILE).encode())
+    dataset = ds.dataset(FEATURES_FILE, format="parquet")
+    h.update(",".join(f"{field.name}:{field.type}" for field in dataset.schema).encode())
+    # Without a run id (state from before run ids), any change to the dataset invalidates
+    run_id = features_run_id or features.full_run_id() or store.source_signature(FEATURES_FILE)
+    h.update(run_id.encode())
+    return h.hexdigest()
+
+def load_cache_meta() -> dict:
+    if not (FORECAST_CACHE_META.exists() and FORECAST_FILE.is_dir()):
+        return {}
+    with open(FORECAST_CACHE_META, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_cache_meta(key: str, watermark: pd.Timestamp, features_high_water_mark: pd.Timestamp):
+    """watermark / features_high_water_mark may be None (nothing scored yet): the next run backfills."""
+    meta = {"cache_key": key}
+    for name, value in [("watermark", watermark), ("features_high_water_mark", features_high_water_mark)]:
+        meta[name] = None if value is None else str(pd.Timestamp(value).date())
+    with open(FORECAST_CACHE_META, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+def _backfill_tasks():
+    """(task id, file, row_group) covering the whole features dataset."""
+    files = sorted(FEATURES_FILE.rglob("*.parquet")) if FEATURES_FILE.is_dir() else [FEATURES_FILE]
+    pairs = [(str(f), rg) for f in files for rg in range(pq.ParquetFile(f).num_row_groups)]
+    return [(i, path, rg) for i, (path, rg) in enumerate(pairs)]
+
+_worker_model = None
+
+def _init_worker():
+    global _worker_model
+    _worker_model = load_model()
+
+def _score_task(task) -> tuple:
+    task_id, path, row_group = task
+    part = pq.ParquetFile(path).read_row_group(row_group).to_pandas()
+    forecast_df = score_features(part, _worker_model)
+    store.write_partitioned(forecast_df, FORECAST_FILE, "forecast", name=f"full-{task_id:05d}", mirror=True)
+    return len(forecast_df), float(forecast_df["abs_error"].sum()), forecast_df["date"].max()
+
+def reset_forecast_dir():
+    store.drop_ipc(FORECAST_FILE)
+    if FORECAST_FILE.exists():
+        if FORECAST_FILE.is_dir():
+            shutil.rmtree(FORECAST_FILE)
+        else:
+            FORECAST_FILE.unlink()
+    FORECAST_FILE.mkdir(parents=True)
+
+def write_full_forecast(forecast_df: pd.DataFrame):
+    """Replace the forecast dataset with the scored frame of all features and reset the cache watermarks."""
+    reset_forecast_dir()
+    store.write_partitioned(forecast_df, FORECAST_FILE, "forecast", name="full-00000", mirror=True)
+    save_cache_meta(cache_key(), forecast_df["date"].max(), features.stored_high_water_mark())
+
+@profiled()
+def update_sketch(since: pd.DataFrame = None) -> ResidualSketch:
+    """
+    Sketch of residuals summed over rolling LEAD_TIME_DAYS-day windows per series (what
+    reorder reads its safety stock from). `since` holds the first newly scored date per
+    series (sku, channel, date): only the windows of those series ending on or after it,
+    i.e. the ones holding a new row, are added to the persisted sketch. Without it (or
+    when the persisted sketch does not fit) the sketch is rebuilt from the whole forecast.
+    """
+    columns = ["sku", "channel", "date", TARGET, "prediction"]
+    sketch = ResidualSketch.load(SKETCH_FILE) if since is not None and SKETCH_FILE.exists() else None
+    if sketch is None or sketch.window != LEAD_TIME_DAYS:
+        sketch = ResidualSketch.from_forecast(store.read_forecast(columns=columns), window=LEAD_TIME_DAYS)
+    else:
+        first = since["date"].min() - pd.Timedelta(days=LEAD_TIME_DAYS - 1)
+        windows = window_sums(store.read_forecast(since=first, columns=columns), LEAD_TIME_DAYS)
+        windows = windows.merge(since.astype({"sku": "str", "channel": "str"}).rename(columns={"date": "since"}),
+                                on=["sku", "channel"])
+        windows = windows[windows["date"] >= windows["since"]]
+        sketch.add(windows["sku"], windows["channel"], windows["residual"])
+    sketch.save(SKETCH_FILE)
+    return sketch
+
+@profiled()
+def backfill(workers: int):
+    """Re-score the whole features dataset, one task per row group, in parallel chunks."""
+    reset_forecast_dir()
+
+    tasks = _backfill_tasks()
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            results = list(pool.map(_score_task, tasks))
+    else:
+        _init_worker()
+        results = [_score_task(t) for t in tasks]
+    return results
+
+@profiled()
+def score_new_rows(model, features_high_water_mark: pd.Timestamp):
+    """
+    Score the features fragments written after the one with features_high_water_mark and
+    append them as one forecast fragment. Selecting by fragment rather than date also
+    scores the back-filled rows of series with gaps, which can predate the last watermark.
+    Returns (results, first newly scored date per series: sku, channel, date).
+    """
+    files = features.fragment_files(after=features_high_water_mark)
+    new = store.read(FEATURES_FILE, "features", files=files) if files else None
+    if new is None or len(new) == 0:
+        return [], None
+    forecast_df = score_features(new, model)
+    store.write_partitioned(forecast_df, FORECAST_FILE, "forecast", name=f"part-{forecast_df['date'].max():%Y%m%d}",
+                            mirror=True)
+    first = forecast_df.groupby(["sku", "channel"], observed=True, as_index=False)["date"].min()
+    return [(len(forecast_df), float(forecast_df["abs_error"].sum()), forecast_df["date"].max())], first
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score features and write forecast artifacts.")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON,
+                        help="Days ahead for the multi-horizon forecast (0 disables it)")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore cached predictions and re-score the full history")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used for a full backfill")
+    return parser.parse_args(argv)
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+
+    key = cache_key()
+    meta = load_cache_meta()
+    model = load_model()
+
+    if not args.full and meta.get("cache_key") == key and meta.get("features_high_water_mark"):
+        results, first = score_new_rows(model, pd.Timestamp(meta["features_high_water_mark"]))
+        watermark = pd.Timestamp(meta["watermark"]) if meta.get("watermark") else None
+        mode = "incremental"
+    else:
+        results, first = backfill(args.workers), None
+        watermark = None
+        mode = "full backfill"
+
+    if results:
+        watermark = max([r[2] for r in results] + ([watermark] if watermark is not None else []))
+    save_cache_meta(key, watermark, features.stored_high_water_mark())
+    if watermark is None:
+        print(f"No feature rows to score in {FEATURES_FILE}. Run `python -m src.features` first.")
+        return
+    # Back-filled rows of gapped series can predate the old watermark: refresh from the oldest new row
+    since = None if first is None else first["date"].min()
+    if results or not rollup.ROLLUP_CUBE_FILE.exists():
+        rollup.refresh(since=since)
+    if results or not series_file.SERIES_FILE.exists():
+        series_file.refresh(since=first)
+    if results or not SKETCH_FILE.exists():
+        update_sketch(since=first)
 
-    forecast_df.to_parquet(FORECAST_FILE)
+    n_rows = sum(r[0] for r in results)
+    print(f"Forecast saved to: {FORECAST_FILE} ({mode})")
+    print("Rows scored:", n_rows)
+    if n_rows:
+        print("Mean absolute error:", sum(r[1] for r in results) / n_rows)
+    print("Watermark:", watermark.date())
+    print(f"Error rollup saved to: {rollup.ROLLUP_CUBE_FILE}")
+    print(f"Series file saved to: {series_file.SERIES_FILE}")
+    print(f"Residual sketch saved to: {SKETCH_FILE}")
 
-    print(f"Forecast saved to: {FORECAST_FILE}")
-    print("Rows:", len(forecast_df))
-    print("Mean absolute error:", forecast_df["abs_error"].mean())
+    if args.horizon > 0:
+        horizon_df = forecast_horizon(model, features.load_series_tail(), args.horizon)
+        schema.write_parquet(horizon_df, FORECAST_HORIZON_FILE, "forecast_horizon")
+        print(f"{args.horizon}-day forecast saved to: {FORECAST_HORIZON_FILE}")
+        print("Series:", horizon_df[["sku", "channel"]].drop_duplicates().shape[0])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,297 @@
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Opt-in: BEVOPS_PROFILE=1 records spans, BEVOPS_PROFILE=cprofile also runs the entry point under cProfile
+PROFILE_ENV = "BEVOPS_PROFILE"
+PROFILE_DIR_ENV = "BEVOPS_PROFILE_DIR"
+PROFILE_DIR = Path("data/processed/profiles")
+
+# Functions listed from the cProfile stats in the run record
+CPROFILE_TOP = 25
+
+def mode() -> str:
+    value = os.environ.get(PROFILE_ENV, "").strip().lower()
+    return "" if value in ("", "0", "false", "no", "off") else value
+
+def enabled() -> bool:
+    return mode() != ""
+
+def profile_dir() -> Path:
+    return Path(os.environ.get(PROFILE_DIR_ENV, PROFILE_DIR))
+
+# -----------------------------
+# Counters
+# -----------------------------
+def _io_bytes():
+    """(bytes read, bytes written) by this process's read/write calls (Linux /proc), else (None, None)."""
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except OSError:
+        return None, None
+
+def _rows(value):
+    """Row count of a DataFrame (or the first DataFrame in a tuple), else None."""
+    if isinstance(value, tuple):
+        value = next((v for v in value if hasattr(v, "shape") and hasattr(v, "columns")), None)
+    if hasattr(value, "shape") and hasattr(value, "columns"):
+        return int(value.shape[0])
+    return None
+
+# -----------------------------
+# Spans: a tree of timed sections per run, written as one JSON record by the entry point
+# -----------------------------
+_stack = []
+
+def _open_span(name: str) -> dict:
+    current, peak = tracemalloc.get_traced_memory()
+    if _stack:
+        # Fold the parent's peak so far before resetting it for the child
+        _stack[-1]["_peak"] = max(_stack[-1]["_peak"], peak)
+    tracemalloc.reset_peak()
+    rchar, wchar = _io_bytes()
+    span = {
+        "name": name,
+        "children": [],
+        "_wall": time.perf_counter(),
+        "_cpu": time.process_time(),
+        "_peak": current,
+        "_io": (rchar, wchar),
+    }
+    if _stack:
+        _stack[-1]["children"].append(span)
+    _stack.append(span)
+    return span
+
+def _close_span(span: dict):
+    _stack.pop()
+    peak = max(span.pop("_peak"), tracemalloc.get_traced_memory()[1])
+    if _stack:
+        _stack[-1]["_peak"] = max(_stack[-1]["_peak"], peak)
+    rchar0, wchar0 = span.pop("_io")
+    rchar, wchar = _io_bytes()
+    children = span.pop("children")
+    span.update(
+        wall_s=round(time.perf_counter() - span.pop("_wall"), 6),
+        cpu_s=round(time.process_time() - span.pop("_cpu"), 6),
+        peak_traced_mb=round(peak / 2**20, 3),
+        bytes_read=None if rchar is None else rchar - rchar0,
+        bytes_written=None if wchar is None else wchar - wchar0,
+    )
+    span.setdefault("rows_in", None)
+    span.setdefault("rows_out", None)
+    span["children"] = children
+
+def set_rows(rows_in=None, rows_out=None):
+    """Annotate the innermost open span with row counts (no-op when not profiling)."""
+    if _stack:
+        if rows_in is not None:
+            _stack[-1]["rows_in"] = int(rows_in)
+        if rows_out is not None:
+            _stack[-1]["rows_out"] = int(rows_out)
+
+@contextmanager
+def span(name: str):
+    """
+    Time a section as a child of the open span. Outside a profiled run this yields None
+    and records nothing, so sub-functions can be wrapped unconditionally.
+    """
+    if not _stack:
+        yield None
+        return
+    s = _open_span(name)
+    try:
+        yield s
+    finally:
+        _close_span(s)
+
+@contextmanager
+def run(name: str, argv=None):
+    """
+    Root span of a profiled run: starts tracemalloc (and cProfile in cprofile mode) and
+    writes the run record to profile_dir()/<name>-<timestamp>.json on exit.
+    Nested under an open run (pipeline -> stage main) it is just another span.
+    """
+    if not enabled() or _stack:
+        with span(name) as s:
+            yield s
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = None
+    if mode() == "cprofile":
+        import cProfile  # only paid for in cprofile mode
+        profiler = cProfile.Profile()
+    started_at = datetime.now(timezone.utc)
+    root = _open_span(name)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield root
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _close_span(root)
+        if started_tracing:
+            tracemalloc.stop()
+        write_record(root, started_at, argv, profiler)
+
+def _module_name(fn) -> str:
+    """Short module name, resolved through __spec__ when run as `python -m src.<module>`."""
+    module = fn.__module__
+    if module == "__main__":
+        spec = getattr(sys.modules["__main__"], "__spec__", None)
+        module = spec.name if spec is not None else Path(sys.argv[0]).stem
+    return module.rsplit(".", 1)[-1]
+
+def profiled(name: str = None, entry: bool = False):
+    """
+    Decorator form of span()/run(). Row counts default to the length of a DataFrame
+    first argument (rows_in) and of a DataFrame result (rows_out).
+    entry=True marks a stage main: it starts and writes a run record when profiling is on.
+    """
+    def decorate(fn):
+        # Run records are named after the stage module, inner spans after module.function
+        label = name or (_module_name(fn) if entry else f"{_module_name(fn)}.{fn.__name__}")
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _stack and not (entry and enabled()):
+                return fn(*args, **kwargs)
+            ctx = run(label, argv=kwargs.get("argv", args[0] if args else None)) if entry else span(label)
+            with ctx as s:
+                if args:
+                    set_rows(rows_in=_rows(args[0]))
+                result = fn(*args, **kwargs)
+                if s is not None and s.get("rows_out") is None:
+                    set_rows(rows_out=_rows(result))
+                return result
+        return wrapper
+    return decorate
+
+# -----------------------------
+# Run records
+# -----------------------------
+def write_record(root: dict, started_at: datetime, argv, profiler) -> Path:
+    out_dir = profile_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"{root['name']}-{started_at:%Y%m%dT%H%M%S%f}"
+    record = {
+        "run": stem,
+        "entry": root["name"],
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "argv": list(argv) if isinstance(argv, (list, tuple)) else sys.argv[1:],
+        "python": sys.version.split()[0],
+        "pid": os.getpid(),
+        "root": root,
+    }
+    if profiler is not None:
+        import io
+        import pstats
+
+        stats_file = out_dir / f"{stem}.pstats"
+        profiler.dump_stats(str(stats_file))
+        buf = io.StringIO()
+        pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(CPROFILE_TOP)
+        record["cprofile"] = {"stats_file": str(stats_file), "top_cumulative": buf.getvalue().splitlines()}
+    path = out_dir / f"{stem}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    print(f"[profile] {root['name']}: {root['wall_s']:.3f}s wall, {root['cpu_s']:.3f}s cpu, "
+          f"{root['peak_traced_mb']:.1f} MB peak traced -> {path}", file=sys.stderr)
+    return path
+
+def load_record(path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def flatten(record: dict) -> dict:
+    """{"a/b/c": span} for every span; repeated names under one parent get a #n suffix."""
+    out = {}
+
+    def walk(s, prefix):
+        key = f"{prefix}/{s['name']}" if prefix else s["name"]
+        n, base = 1, key
+        while key in out:
+            n += 1
+            key = f"{base}#{n}"
+        out[key] = s
+        for child in s["children"]:
+            walk(child, key)
+
+    walk(record["root"], "")
+    return out
+
+METRICS = ["wall_s", "cpu_s", "peak_traced_mb", "rows_in", "rows_out", "bytes_read", "bytes_written"]
+
+def diff(old: dict, new: dict, threshold: float = 0.10) -> list:
+    """Per-span metric changes between two run records; ratio is new / old."""
+    a, b = flatten(old), flatten(new)
+    rows = []
+    for key in list(a) + [k for k in b if k not in a]:
+        row = {"span": key, "status": "removed" if key not in b else "added" if key not in a else ""}
+        for m in METRICS:
+            va, vb = a.get(key, {}).get(m), b.get(key, {}).get(m)
+            row[f"{m}_old"], row[f"{m}_new"] = va, vb
+            row[f"{m}_ratio"] = vb / va if va and vb is not None else None
+        ratio = row["wall_s_ratio"]
+        if not row["status"] and ratio is not None and (a[key]["wall_s"] or 0) >= 0.01:
+            row["status"] = "slower" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        rows.append(row)
+    return rows
+
+def _fmt(v, unit=""):
+    if v is None:
+        return "-"
+    if isinstance(v, float):
+        return f"{v:.3f}{unit}"
+    return f"{v:,}{unit}"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and diff profiling run records (BEVOPS_PROFILE=1).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ls = sub.add_parser("list", help="List recorded runs")
+    ls.add_argument("--dir", type=Path, default=None)
+    show = sub.add_parser("show", help="Print the span tree of one run")
+    show.add_argument("record", type=Path)
+    d = sub.add_parser("diff", help="Compare two runs span by span")
+    d.add_argument("old", type=Path)
+    d.add_argument("new", type=Path)
+    d.add_argument("--threshold", type=float, default=0.10, help="Relative wall-time change flagged as slower/faster")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "list":
+        for path in sorted((args.dir or profile_dir()).glob("*.json")):
+            rec = load_record(path)
+            print(f"{path}  {rec['entry']:<24} {rec['root']['wall_s']:>9.3f}s  {rec['started_at']}")
+    elif args.command == "show":
+        for key, s in flatten(load_record(args.record)).items():
+            depth = key.count("/")
+            print(f"{'  ' * depth}{s['name']:<{40 - 2 * depth}} wall={_fmt(s['wall_s'], 's'):>10} "
+                  f"cpu={_fmt(s['cpu_s'], 's'):>10} peak={_fmt(s['peak_traced_mb'], 'MB'):>11} "
+                  f"rows={_fmt(s['rows_in'])}->{_fmt(s['rows_out'])} read={_fmt(s['bytes_read'])} "
+                  f"written={_fmt(s['bytes_written'])}")
+    else:
+        rows = diff(load_record(args.old), load_record(args.new), args.threshold)
+        print(f"{'span':<56} {'wall old':>10} {'wall new':>10} {'ratio':>7} {'peak old':>10} {'peak new':>10}  status")
+        for r in rows:
+            ratio = r["wall_s_ratio"]
+            print(f"{r['span'][-56:]:<56} {_fmt(r['wall_s_old']):>10} {_fmt(r['wall_s_new']):>10} "
+                  f"{'-' if ratio is None else f'{ratio:.2f}':>7} {_fmt(r['peak_traced_mb_old']):>10} "
+                  f"{_fmt(r['peak_traced_mb_new']):>10}  {r['status']}")
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,13 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from src import schema, store
+from src.profiling import profiled
+from src.sketch import SKETCH_FILE, ResidualSketch
+
 PROCESSED = Path("data/processed")
 FORECAST_FILE = PROCESSED / "forecast.parquet"
+FORECAST_HORIZON_FILE = PROCESSED / "forecast_horizon.parquet"
 REORDER_FILE = PROCESSED / "reorder_plan.csv"
 
 # Simple inventory assumptions (can be tuned later)
@@ -11,24 +16,94 @@ LEAD_TIME_DAYS = 7
 SERVICE_LEVEL_Z = 1.65  # ~95% service level
 MIN_ORDER_QTY = 50
 
-def main():
-    if not FORECAST_FILE.exists():
-        raise FileNotFoundError("Run `python -m src.predict` first.")
-
-    df = pd.read_parquet(FORECAST_FILE)
+# Residual quantile that plays the role of SERVICE_LEVEL_Z when the residual sketch is available
+SERVICE_QUANTILE = 0.95
+# Series with fewer lead-time windows in the sketch keep the abs_error proxy
+SKETCH_MIN_COUNT = 28
+ERROR_QUANTILES = {"lead_time_error_p50": 0.50, "lead_time_error_p90": 0.90, "lead_time_error_p95": SERVICE_QUANTILE}
+
+def lead_time_error_quantiles(sketch: ResidualSketch, lead_time: int = LEAD_TIME_DAYS) -> pd.DataFrame:
+    """
+    Lead-time forecast error quantiles per series, read directly from a sketch of
+    residuals summed over rolling lead_time-day windows (predict writes one per series).
+    """
+    if sketch.window != lead_time:
+        raise ValueError(f"Residual sketch sums {sketch.window}-day windows, not the {lead_time}-day lead time. "
+                         "Re-run `python -m src.predict --full`.")
+    q = sketch.quantiles(list(ERROR_QUANTILES.values()))
+    q.columns = ["sku", "channel"] + list(ERROR_QUANTILES)
+    q["sketch_count"] = sketch.count()
+    return q
+
+def apply_error_quantiles(recent: pd.DataFrame, quantiles: pd.DataFrame) -> pd.DataFrame:
+    """
+    Join the lead-time error quantiles onto recent (sku, channel, safety_stock) and, for
+    series with enough windows, replace safety_stock with the SERVICE_QUANTILE error.
+    """
+    keys = recent[["sku", "channel"]].astype(str)
+    recent[list(ERROR_QUANTILES) + ["sketch_count"]] = keys.merge(quantiles, on=["sku", "channel"], how="left")[
+        list(ERROR_QUANTILES) + ["sketch_count"]
+    ].to_numpy()
+    use = recent["sketch_count"] >= SKETCH_MIN_COUNT
+    recent.loc[use, "safety_stock"] = recent.loc[use, "lead_time_error_p95"].clip(lower=0)
+    return recent
+
+def lead_time_demand(recent: pd.DataFrame, horizon: pd.DataFrame = None, lead_time: int = LEAD_TIME_DAYS) -> pd.Series:
+    """
+    Demand over the lead time per row of recent (sku, channel, prediction): the
+    multi-horizon forecast (predict.forecast_horizon) summed over its first lead_time
+    steps, which keeps weekly seasonality and planned promos. Series without all
+    lead_time steps (or no horizon at all) fall back to the flat next-day prediction.
+    """
+    flat = recent["prediction"].to_numpy(dtype=np.float64) * lead_time
+    if horizon is None:
+        return pd.Series(flat, index=recent.index)
+    horizon = horizon[horizon["horizon"] <= lead_time].astype({"sku": "str", "channel": "str", "prediction": "float64"})
+    summed = horizon.groupby(["sku", "channel"], as_index=False).agg(
+        horizon_demand=("prediction", "sum"), steps=("horizon", "count")
+    )
+    summed = summed[summed["steps"] == lead_time]
+    keys = recent[["sku", "channel"]].astype(str)
+    demand = keys.merge(summed, on=["sku", "channel"], how="left")["horizon_demand"].to_numpy()
+    return pd.Series(np.where(np.isnan(demand), flat, demand), index=recent.index)
+
+def order_quantity(target_stock: pd.Series, inventory_on_hand) -> pd.Series:
+    """Units to order up to target_stock; orders below MIN_ORDER_QTY are skipped."""
+    qty = (target_stock - inventory_on_hand).clip(lower=0)
+    return qty.apply(lambda x: 0 if x < MIN_ORDER_QTY else int(round(x)))
+
+def simulated_inventory(n_series: int) -> np.ndarray:
+    """Placeholder on-hand inventory for n_series series in (sku, channel) order."""
+    np.random.seed(42)
+    return np.random.randint(100, 400, size=n_series)
+
+@profiled()
+def build_reorder_plan(df: pd.DataFrame, horizon: pd.DataFrame = None, sketch: ResidualSketch = None,
+                       inventory: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    inventory: optional sku, channel, inventory_on_hand per series; by default it is
+    simulated for the series in df (src/shard.py draws it once for all shards).
+    """
+    df = df.copy()
     df["date"] = pd.to_datetime(df["date"])
 
     # Use the most recent date as "today"
     today = df["date"].max()
 
-    recent = df[df["date"] == today].copy()
+    recent = df[df["date"] == today].sort_values(["sku", "channel"]).reset_index(drop=True)
+    # Stored as float32; plan in float64
+    recent = recent.astype({"prediction": "float64", "abs_error": "float64"})
 
     # Simulate current inventory (placeholder but realistic)
-    np.random.seed(42)
-    recent["inventory_on_hand"] = np.random.randint(100, 400, size=len(recent))
+    if inventory is None:
+        recent["inventory_on_hand"] = simulated_inventory(len(recent))
+    else:
+        keys = recent[["sku", "channel"]].astype(str)
+        recent["inventory_on_hand"] = keys.merge(inventory.astype({"sku": "str", "channel": "str"}),
+                                                 on=["sku", "channel"], how="left")["inventory_on_hand"].to_numpy()
 
-    # Estimate lead-time demand using prediction
-    recent["lead_time_demand"] = recent["prediction"] * LEAD_TIME_DAYS
+    # Estimate lead-time demand from the multi-horizon forecast
+    recent["lead_time_demand"] = lead_time_demand(recent, horizon)
 
     # Estimate demand variability (use recent error as proxy)
     recent["demand_std"] = recent["abs_error"].clip(lower=1)
@@ -36,18 +111,17 @@ def main():
     # Safety stock
     recent["safety_stock"] = SERVICE_LEVEL_Z * recent["demand_std"] * np.sqrt(LEAD_TIME_DAYS)
 
+    # With enough residual history, the lead-time error quantile replaces z * std * sqrt(L)
+    for col in ERROR_QUANTILES:
+        recent[col] = np.nan
+    if sketch is not None:
+        recent = apply_error_quantiles(recent, lead_time_error_quantiles(sketch))
+
     # Target stock level
     recent["target_stock"] = recent["lead_time_demand"] + recent["safety_stock"]
 
-    # Reorder quantity
-    recent["reorder_qty"] = (
-        recent["target_stock"] - recent["inventory_on_hand"]
-    ).clip(lower=0)
-
-    # Apply minimum order quantity
-    recent["reorder_qty"] = recent["reorder_qty"].apply(
-        lambda x: 0 if x < MIN_ORDER_QTY else int(round(x))
-    )
+    # Reorder quantity (minimum order quantity applied)
+    recent["reorder_qty"] = order_quantity(recent["target_stock"], recent["inventory_on_hand"])
 
     reorder_cols = [
         "sku",
@@ -56,14 +130,31 @@ def main():
         "lead_time_demand",
         "safety_stock",
         "reorder_qty",
+        *ERROR_QUANTILES,
     ]
 
-    reorder_df = recent[reorder_cols].sort_values("reorder_qty", ascending=False)
+    return recent[reorder_cols].sort_values("reorder_qty", ascending=False)
+
+@profiled(entry=True)
+def main():
+    if not FORECAST_FILE.exists():
+        raise FileNotFoundError("Run `python -m src.predict` first.")
+
+    # Only today's rows are needed (the horizon file covers lead-time demand)
+    _, today = store.date_bounds(FORECAST_FILE)
+    df = store.read_forecast(since=today)
+    horizon = schema.read_parquet(FORECAST_HORIZON_FILE, "forecast_horizon") if FORECAST_HORIZON_FILE.exists() else None
+
+    sketch = ResidualSketch.load(SKETCH_FILE) if SKETCH_FILE.exists() else None
+
+    reorder_df = build_reorder_plan(df, horizon, sketch)
 
     reorder_df.to_csv(REORDER_FILE, index=False)
+    store.write_ipc(reorder_df, REORDER_FILE)
 
     print(f"Reorder plan saved to: {REORDER_FILE}")
     print("SKUs needing reorder:", (reorder_df["reorder_qty"] > 0).sum())
+    print("Safety stock from residual quantiles:", "yes" if sketch is not None else f"no ({SKETCH_FILE} missing)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,158 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import schema, store
+from src.profiling import profiled
+
+PROCESSED = Path("data/processed")
+FORECAST_FILE = PROCESSED / "forecast.parquet"
+# Daily sums of |error|, |actual| and row counts per (date, sku, channel)
+ROLLUP_CUBE_FILE = PROCESSED / "rollup_cube.parquet"
+# Cumulative sums of the same over a gap-free daily axis, one row per channel plus "All"
+ROLLUP_PREFIX_FILE = PROCESSED / "rollup_prefix.npz"
+
+ALL_CHANNELS = "All"
+SUM_COLUMNS = ["rows", "abs_error", "abs_actual"]
+FORECAST_COLUMNS = ["date", "sku", "channel", "target_units_next_day", "abs_error"]
+
+# -----------------------------
+# Building
+# -----------------------------
+@profiled()
+def build_cube(forecast_df: pd.DataFrame) -> pd.DataFrame:
+    """Sum forecast rows into the (date, sku, channel) cube."""
+    df = pd.DataFrame({
+        "date": pd.to_datetime(forecast_df["date"]),
+        "sku": forecast_df["sku"],
+        "channel": forecast_df["channel"],
+        "rows": 1,
+        "abs_error": forecast_df["abs_error"].to_numpy(dtype=np.float64),
+        "abs_actual": np.abs(forecast_df["target_units_next_day"].to_numpy(dtype=np.float64)),
+    })
+    cube = df.groupby(["date", "sku", "channel"], observed=True, sort=False).sum().reset_index()
+    return schema.sort(schema.cast(cube, "rollup"), "rollup")
+
+@profiled()
+def build_prefix(cube: pd.DataFrame) -> dict:
+    """
+    Per-channel prefix sums: prefix[col][k, i] is the sum of col over the first i days
+    for channel k, so any [start, end] range is prefix[col][k, j] - prefix[col][k, i].
+    """
+    day = cube["date"].to_numpy(dtype="datetime64[D]")
+    dates = np.arange(day.min(), day.max() + np.timedelta64(1, "D"))
+    n_days = len(dates)
+
+    channel = cube["channel"].astype(str)
+    channels = sorted(channel.unique())
+    cell = channel.map({c: k for k, c in enumerate(channels)}).to_numpy() * n_days + (day - dates[0]).astype(np.int64)
+
+    out = {"dates": dates, "channels": np.array([ALL_CHANNELS] + channels)}
+    for col in SUM_COLUMNS:
+        per_channel = np.bincount(cell, weights=cube[col].to_numpy(dtype=np.float64), minlength=len(channels) * n_days)
+        per_channel = per_channel.reshape(len(channels), n_days)
+        daily = np.vstack([per_channel.sum(axis=0), per_channel])
+        prefix = np.zeros((len(channels) + 1, n_days + 1))
+        np.cumsum(daily, axis=1, out=prefix[:, 1:])
+        out[col] = prefix.astype(np.int64) if col == "rows" else prefix
+    return out
+
+def merge_cubes(cubes) -> pd.DataFrame:
+    """One cube from cubes of disjoint series (e.g. per shard), as build_cube gives for all rows."""
+    return schema.sort(schema.cast(pd.concat(cubes, ignore_index=True), "rollup"), "rollup")
+
+def write_rollup(cube: pd.DataFrame):
+    schema.write_parquet(cube, ROLLUP_CUBE_FILE, "rollup")
+    np.savez(ROLLUP_PREFIX_FILE, **build_prefix(cube))
+
+@profiled()
+def refresh(since=None) -> pd.DataFrame:
+    """
+    Rebuild the rollup from the forecast store. With `since`, only forecast days >= since
+    are read and re-aggregated; older days are kept from the existing cube.
+    """
+    if since is not None and not ROLLUP_CUBE_FILE.exists():
+        since = None
+    cube = build_cube(store.read(FORECAST_FILE, "forecast", since=since, columns=FORECAST_COLUMNS))
+    if since is not None:
+        old = load_cube()
+        cube = schema.sort(schema.cast(pd.concat([old[old["date"] < pd.Timestamp(since)], cube]), "rollup"), "rollup")
+    write_rollup(cube)
+    return cube
+
+# -----------------------------
+# Loading + range queries
+# -----------------------------
+def load_cube() -> pd.DataFrame:
+    return schema.read_parquet(ROLLUP_CUBE_FILE, "rollup")
+
+def load_prefix() -> dict:
+    with np.load(ROLLUP_PREFIX_FILE, allow_pickle=False) as z:
+        return {k: z[k] for k in z.files}
+
+def _bounds(dates: np.ndarray, start, end):
+    """Prefix positions [i, j) of the inclusive date range."""
+    i = np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date(), "D"), side="left")
+    j = np.searchsorted(dates, np.datetime64(pd.Timestamp(end).date(), "D"), side="right")
+    return i, max(i, j)
+
+def range_sums(prefix: dict, start, end, channel: str = ALL_CHANNELS) -> dict:
+    k = int(np.flatnonzero(prefix["channels"] == channel)[0])
+    i, j = _bounds(prefix["dates"], start, end)
+    return {col: prefix[col][k, j] - prefix[col][k, i] for col in SUM_COLUMNS}
+
+def range_kpis(prefix: dict, start, end, channel: str = ALL_CHANNELS) -> dict:
+    """Rows, MAE and WAPE over an inclusive date range from two prefix lookups per sum."""
+    s = range_sums(prefix, start, end, channel)
+    rows = int(s["rows"])
+    return {
+        "rows": rows,
+        "mae": float(s["abs_error"] / rows) if rows else np.nan,
+        "wape": float(s["abs_error"] / s["abs_actual"]) if s["abs_actual"] > 0 else np.nan,
+    }
+
+def daily_error(prefix: dict, start, end, channel: str = ALL_CHANNELS) -> pd.DataFrame:
+    """Mean absolute error per day with data in the range (differences of the prefix sums)."""
+    k = int(np.flatnonzero(prefix["channels"] == channel)[0])
+    i, j = _bounds(prefix["dates"], start, end)
+    rows = np.diff(prefix["rows"][k, i:j + 1])
+    err = np.diff(prefix["abs_error"][k, i:j + 1])
+    has = rows > 0
+    return pd.DataFrame({
+        "date": pd.to_datetime(prefix["dates"][i:j][has]),
+        "abs_err": err[has] / rows[has],
+    })
+
+def top_skus(cube: pd.DataFrame, start, end, channel: str = ALL_CHANNELS, n: int = 10) -> pd.DataFrame:
+    """SKUs with the largest total absolute error in the range (a date-sorted slice of the cube)."""
+    dates = cube["date"].to_numpy()
+    i = np.searchsorted(dates, pd.Timestamp(start).normalize().to_datetime64(), side="left")
+    j = np.searchsorted(dates, (pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).to_datetime64(), side="left")
+    part = cube.iloc[i:j]
+    if channel != ALL_CHANNELS:
+        part = part[part["channel"] == channel]
+    out = part.groupby("sku", observed=True, as_index=False)["abs_error"].sum()
+    return out.rename(columns={"abs_error": "abs_err"}).nlargest(n, "abs_err").reset_index(drop=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the forecast error rollup used by the Overview page.")
+    parser.add_argument("--since", default=None, help="Only re-aggregate forecast days from this date (YYYY-MM-DD)")
+    return parser.parse_args(argv)
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+    if not FORECAST_FILE.exists():
+        raise FileNotFoundError("Missing forecast.parquet. Run `python -m src.predict` first.")
+
+    cube = refresh(since=args.since)
+    prefix = load_prefix()
+    kpis = range_kpis(prefix, prefix["dates"][0], prefix["dates"][-1])
+    print(f"Rollup cube saved to: {ROLLUP_CUBE_FILE} ({len(cube)} rows)")
+    print(f"Prefix sums saved to: {ROLLUP_PREFIX_FILE} ({len(prefix['dates'])} days x {len(prefix['channels'])} channels)")
+    print(f"All history: MAE={kpis['mae']:.3f} | WAPE={kpis['wape']:.3f} | rows={kpis['rows']}")
+
+if __name__ == "__main__":
+    main()
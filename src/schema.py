@@ -0,0 +1,65 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.config import ARTIFACT_SCHEMAS, ARTIFACT_SORT_KEYS
+from src.profiling import profiled
+
+ARROW_TYPES = {
+    # int32 dictionary indices everywhere, so fragments of one dataset share a schema
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "datetime64[ns]": pa.timestamp("ns"),
+    "int8": pa.int8(),
+    "int16": pa.int16(),
+    "int32": pa.int32(),
+    "float32": pa.float32(),
+    "float64": pa.float64(),
+}
+
+def arrow_schema(artifact: str, columns=None) -> pa.Schema:
+    spec = ARTIFACT_SCHEMAS[artifact]
+    return pa.schema([(c, ARROW_TYPES[spec[c]]) for c in (columns or spec)])
+
+def _as_category(s: pd.Series) -> pd.Series:
+    """Category dtype with only the observed values, in sorted order (so sorting stays lexical)."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.cat.remove_unused_categories()
+        cats = s.cat.categories
+        return s if cats.is_monotonic_increasing else s.cat.reorder_categories(cats.sort_values())
+    return s.astype("category")
+
+def cast(df: pd.DataFrame, artifact: str) -> pd.DataFrame:
+    """Cast the schema columns present in df; other columns are left alone."""
+    spec = ARTIFACT_SCHEMAS[artifact]
+    new = {}
+    for col in df.columns:
+        dtype = spec.get(col)
+        if dtype is None:
+            continue
+        if dtype == "category":
+            new[col] = _as_category(df[col])
+        elif df[col].dtype != dtype:
+            new[col] = df[col].astype(dtype)
+    return df.assign(**new) if new else df
+
+def sort(df: pd.DataFrame, artifact: str) -> pd.DataFrame:
+    keys = [k for k in ARTIFACT_SORT_KEYS.get(artifact, []) if k in df.columns]
+    return df.sort_values(keys, kind="stable").reset_index(drop=True) if keys else df
+
+def to_table(df: pd.DataFrame, artifact: str) -> pa.Table:
+    df = sort(cast(df, artifact), artifact)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    spec = ARTIFACT_SCHEMAS[artifact]
+    target = pa.schema([
+        pa.field(f.name, ARROW_TYPES[spec[f.name]]) if f.name in spec else f for f in table.schema
+    ]).with_metadata(table.schema.metadata)
+    return table.cast(target)
+
+@profiled()
+def write_parquet(df: pd.DataFrame, path, artifact: str, row_group_size: int = None):
+    """Cast to the artifact schema, sort by its keys and write with row-group statistics."""
+    pq.write_table(to_table(df, artifact), path, row_group_size=row_group_size, write_statistics=True)
+
+@profiled()
+def read_parquet(path, artifact: str, **kwargs) -> pd.DataFrame:
+    return cast(pd.read_parquet(path, **kwargs), artifact)
@@ -0,0 +1,188 @@
+from pathlib import Path
+
+import numpy as np
+
+MODELS = Path("models")
+SCORER_FILE = MODELS / "scorer.npz"
+
+
+def export_linear_scorer(pipe, path: Path = SCORER_FILE, model_digest: str = "") -> Path:
+    """Write the parameters of a fitted prep + Ridge pipeline to an .npz artifact."""
+    return LinearScorer.from_pipeline(pipe, model_digest=model_digest).save(path)
+
+
+class LinearScorer:
+    """
+    Drop-in replacement for the fitted pipeline's predict(), using NumPy only.
+
+    Numeric columns are imputed with the stored medians and dotted with their Ridge
+    coefficients; each categorical column adds the coefficient gathered from its
+    one-hot vocabulary. Loading needs neither sklearn nor unpickling.
+    """
+
+    def __init__(self, numeric, medians, coef_numeric, categorical, cat_fill, vocabs, coef_cats, intercept,
+                 model_digest=""):
+        self.numeric = list(numeric)
+        self.medians = medians
+        self.coef_numeric = coef_numeric
+        self.categorical = list(categorical)
+        self.cat_fill = list(cat_fill)
+        self.vocabs = vocabs
+        self.coef_cats = coef_cats
+        self.intercept = float(intercept)
+        self.model_digest = model_digest
+
+    @classmethod
+    def from_pipeline(cls, pipe, model_digest: str = "") -> "LinearScorer":
+        prep = pipe.named_steps["prep"]
+        ridge = pipe.named_steps["model"]
+        num = prep.named_transformers_["num"]
+        cat = prep.named_transformers_["cat"]
+
+        vocabs = [np.array(v, dtype=str) for v in cat.named_steps["onehot"].categories_]
+        coef = np.asarray(ridge.coef_, dtype=np.float64)
+        n_num = len(num.feature_names_in_)
+        bounds = np.cumsum([n_num] + [len(v) for v in vocabs])
+        return cls(
+            numeric=list(num.feature_names_in_),
+            medians=np.asarray(num.named_steps["imputer"].statistics_, dtype=np.float64),
+            coef_numeric=coef[:n_num],
+            categorical=list(cat.feature_names_in_),
+            cat_fill=[str(v) for v in cat.named_steps["imputer"].statistics_],
+            vocabs=vocabs,
+            coef_cats=[coef[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])],
+            intercept=ridge.intercept_,
+            model_digest=model_digest,
+        )
+
+    def save(self, path: Path = SCORER_FILE) -> Path:
+        arrays = {
+            "numeric": np.array(self.numeric, dtype=str),
+            "medians": np.asarray(self.medians, dtype=np.float64),
+            "coef_numeric": np.asarray(self.coef_numeric, dtype=np.float64),
+            "categorical": np.array(self.categorical, dtype=str),
+            "cat_fill": np.array(self.cat_fill, dtype=str),
+            "intercept": np.float64(self.intercept),
+            "model_digest": np.array(self.model_digest),
+        }
+        for i, (vocab, coef) in enumerate(zip(self.vocabs, self.coef_cats)):
+            arrays[f"vocab_{i}"] = np.array(vocab, dtype=str)
+            arrays[f"coef_cat_{i}"] = np.asarray(coef, dtype=np.float64)
+        np.savez(path, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path: Path = SCORER_FILE) -> "LinearScorer":
+        with np.load(path, allow_pickle=False) as z:
+            n_cat = len(z["categorical"])
+            return cls(
+                numeric=z["numeric"].tolist(),
+                medians=z["medians"],
+                coef_numeric=z["coef_numeric"],
+                categorical=z["categorical"].tolist(),
+                cat_fill=z["cat_fill"].tolist(),
+                vocabs=[z[f"vocab_{i}"] for i in range(n_cat)],
+                coef_cats=[z[f"coef_cat_{i}"] for i in range(n_cat)],
+                intercept=z["intercept"],
+                model_digest=str(z["model_digest"]),
+            )
+
+    def predict(self, X) -> np.ndarray:
+        """Score a DataFrame (or any mapping of column -> array) with the pipeline's columns."""
+        M = np.column_stack([np.asarray(X[c], dtype=np.float64) for c in self.numeric])
+        M = np.where(np.isnan(M), self.medians, M)
+        y = M @ self.coef_numeric + self.intercept
+
+        for col, fill, vocab, coef in zip(self.categorical, self.cat_fill, self.vocabs, self.coef_cats):
+            values = np.asarray(X[col], dtype=object)
+            missing = (values != values) | np.equal(values, None)
+            values = np.where(missing, fill, values).astype(str)
+
+            # Vocabularies are sorted; unknown categories contribute 0 (handle_unknown="ignore")
+            idx = np.searchsorted(vocab, values).clip(0, len(vocab) - 1)
+            known = vocab[idx] == values
+            y += np.where(known, coef[idx], 0.0)
+        return y
+
+
+def assert_parity(pipe, scorer: LinearScorer, X, rtol: float = 1e-9, atol: float = 1e-9):
+    """Raise if the compact scorer does not reproduce pipe.predict on X."""
+    expected = pipe.predict(X)
+    got = scorer.predict(X)
+    if not np.allclose(got, expected, rtol=rtol, atol=atol):
+        worst = float(np.max(np.abs(got - expected)))
+        raise AssertionError(f"Compact scorer diverges from the sklearn pipeline (max abs diff {worst:.3e})")
+    return float(np.max(np.abs(got - expected))) if len(got) else 0.0
+
+
+# -----------------------------
+# Per-series local models (train --local): one Ridge per (sku, channel) on the numeric
+# features, stacked into a coefficient matrix; the global scorer covers everything else
+# -----------------------------
+LOCAL_MODELS_FILE = MODELS / "local_models.npz"
+
+
+def series_keys(sku, channel) -> np.ndarray:
+    """One sortable string key per row for (sku, channel) lookups."""
+    return np.char.add(np.char.add(np.asarray(sku, dtype=str), "\x1f"), np.asarray(channel, dtype=str))
+
+
+def export_local_models(path: Path, numeric, medians, keys, coef, intercept, model_digest: str = "", **info) -> Path:
+    """Write stacked per-series coefficients; `keys` must be sorted (see series_keys)."""
+    np.savez(
+        path,
+        numeric=np.array(numeric, dtype=str),
+        medians=np.asarray(medians, dtype=np.float64),
+        keys=np.asarray(keys, dtype=str),
+        coef=np.asarray(coef, dtype=np.float64),
+        intercept=np.asarray(intercept, dtype=np.float64),
+        model_digest=np.array(model_digest),
+        **{k: np.asarray(v) for k, v in info.items()},
+    )
+    return path
+
+
+class LocalLinearScorer:
+    """
+    Per-series linear models with a global fallback.
+
+    Rows whose series has a local model are scored with one batched row-wise product
+    against the gathered coefficient rows; all other rows (new or low-history series)
+    get the global model's prediction.
+    """
+
+    def __init__(self, fallback, numeric, medians, keys, coef, intercept):
+        self.fallback = fallback
+        self.numeric = list(numeric)
+        self.medians = medians
+        self.keys = keys
+        self.coef = coef
+        self.intercept = intercept
+        self.model_digest = getattr(fallback, "model_digest", "")
+
+    @classmethod
+    def load(cls, fallback, path: Path = LOCAL_MODELS_FILE) -> "LocalLinearScorer":
+        with np.load(path, allow_pickle=False) as z:
+            return cls(fallback, z["numeric"].tolist(), z["medians"], z["keys"], z["coef"], z["intercept"])
+
+    @staticmethod
+    def digest(path: Path = LOCAL_MODELS_FILE) -> str:
+        with np.load(path, allow_pickle=False) as z:
+            return str(z["model_digest"])
+
+    def predict(self, X) -> np.ndarray:
+        y = np.asarray(self.fallback.predict(X), dtype=np.float64).copy()
+        if len(self.keys) == 0 or len(y) == 0:
+            return y
+
+        keys = series_keys(X["sku"], X["channel"])
+        idx = np.searchsorted(self.keys, keys).clip(0, len(self.keys) - 1)
+        local = self.keys[idx] == keys
+        if not local.any():
+            return y
+
+        M = np.column_stack([np.asarray(X[c], dtype=np.float64)[local] for c in self.numeric])
+        M = np.where(np.isnan(M), self.medians, M)
+        rows = idx[local]
+        y[local] = np.einsum("ij,ij->i", M, self.coef[rows]) + self.intercept[rows]
+        return y
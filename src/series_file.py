@@ -0,0 +1,203 @@
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src import schema, store
+from src.profiling import profiled
+from src.utils import lttb
+
+PROCESSED = Path("data/processed")
+FORECAST_FILE = PROCESSED / "forecast.parquet"
+# Uncompressed Arrow IPC file sorted by (sku, channel, date): memory-mapped, so a series is a zero-copy slice
+SERIES_FILE = PROCESSED / "forecast_series.arrow"
+# Rows scored since the last compaction, one file per predict run in the same layout
+SEGMENTS_DIR = PROCESSED / "forecast_series_segments"
+# (sku, channel, segment) -> [start, stop) row offsets into SERIES_FILE or a segment; a
+# series' rows are its ranges in segment order
+SERIES_INDEX_FILE = PROCESSED / "forecast_series_index.parquet"
+# Segments kept before refresh folds them back into SERIES_FILE
+COMPACT_SEGMENTS = 30
+
+KEYS = ["sku", "channel"]
+PLAN_COLUMNS = ["date", "sku", "channel", "price", "promo_flag"]
+
+# -----------------------------
+# Building
+# -----------------------------
+@profiled()
+def build(forecast_df: pd.DataFrame, features_df: pd.DataFrame):
+    """
+    Join price/promo_flag from the feature rows onto the forecast, sort by series and date.
+    Returns (table, index).
+    """
+    plan = features_df[PLAN_COLUMNS].astype({"sku": "str", "channel": "str"})
+    df = forecast_df.astype({"sku": "str", "channel": "str"}).merge(plan, on=["date", "sku", "channel"], how="left")
+    table = schema.to_table(df, "forecast_series").combine_chunks()
+    return table, build_index(table)
+
+def build_index(table: pa.Table) -> pd.DataFrame:
+    """(sku, channel, start, stop) of each series in a table sorted by series."""
+    keys = table.select(KEYS).to_pandas()
+    sizes = keys.groupby(KEYS, observed=True, sort=False).size()
+    stop = np.cumsum(sizes.to_numpy())
+    index = sizes.index.to_frame(index=False).astype(str)
+    index["start"] = stop - sizes.to_numpy()
+    index["stop"] = stop
+    return index
+
+@profiled()
+def merge(parts):
+    """
+    Combine (table, index) pairs into the layout build gives for all of their rows at
+    once: series in (sku, channel) order and sorted sku/channel dictionaries. A series
+    found in several parts (e.g. the existing file, then newly scored days) keeps its
+    rows in part order. Whole series are gathered, nothing is re-sorted.
+    """
+    tables = [t for t, _ in parts]
+    offsets = np.cumsum([0] + [t.num_rows for t in tables[:-1]])
+    index = pd.concat([i.assign(start=i["start"] + o, stop=i["stop"] + o) for (_, i), o in zip(parts, offsets)])
+    index = index.sort_values(KEYS, kind="stable").reset_index(drop=True)
+
+    sizes = (index["stop"] - index["start"]).to_numpy()
+    stop = np.cumsum(sizes)
+    rows = np.repeat(index["start"].to_numpy() - (stop - sizes), sizes) + np.arange(stop[-1] if len(stop) else 0)
+
+    table = pa.concat_tables(tables)
+    for name in KEYS:
+        # Re-point every chunk's indices at the sorted union of the chunk dictionaries
+        col = table.column(name)
+        chunks = [(c.indices.to_numpy(zero_copy_only=False), c.dictionary.to_numpy(zero_copy_only=False).astype(str))
+                  for c in col.chunks]
+        values = np.unique(np.concatenate([d for _, d in chunks]))
+        dictionary = pa.array(values)
+        col = pa.chunked_array([
+            pa.DictionaryArray.from_arrays(pa.array(np.searchsorted(values, d)[i], pa.int32()), dictionary)
+            for i, d in chunks
+        ], col.type)
+        table = table.set_column(table.schema.get_field_index(name), name, col)
+    table = table.take(rows).combine_chunks()
+
+    index["start"] = stop - sizes
+    index["stop"] = stop
+    index = index.groupby(KEYS, sort=False, as_index=False).agg(start=("start", "min"), stop=("stop", "max"))
+    return table, index
+
+def _write_file(table: pa.Table, path: Path):
+    tmp = path.with_name(path.name + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return tmp
+
+def _replace_index(index: pd.DataFrame):
+    tmp = SERIES_INDEX_FILE.with_name(SERIES_INDEX_FILE.name + ".tmp")
+    index.to_parquet(tmp, index=False)
+    os.replace(tmp, SERIES_INDEX_FILE)
+
+def segment_files():
+    return sorted(SEGMENTS_DIR.glob("segment-*.arrow")) if SEGMENTS_DIR.exists() else []
+
+def write(table: pa.Table, index: pd.DataFrame):
+    """Replace the series file, its index and any segments; readers holding the old mapping keep their copy."""
+    tmp = _write_file(table, SERIES_FILE)
+    os.replace(tmp, SERIES_FILE)
+    _replace_index(index.assign(segment=SERIES_FILE.name)[KEYS + ["segment", "start", "stop"]])
+    for path in segment_files():
+        path.unlink()
+
+def append(table: pa.Table, index: pd.DataFrame) -> Path:
+    """
+    Write (table, index) as a new segment and add its ranges to the index. Only the new
+    rows and the index are written; the segment must hold later dates of its series than
+    the file and earlier segments do.
+    """
+    SEGMENTS_DIR.mkdir(parents=True, exist_ok=True)
+    existing = segment_files()
+    n = int(existing[-1].stem.split("-")[1]) + 1 if existing else 0
+    path = SEGMENTS_DIR / f"segment-{n:05d}.arrow"
+    os.replace(_write_file(table, path), path)
+    index = index.assign(segment=path.name)[KEYS + ["segment", "start", "stop"]]
+    _replace_index(pd.concat([pd.read_parquet(SERIES_INDEX_FILE), index], ignore_index=True))
+    return path
+
+@profiled()
+def compact():
+    """Fold the segments back into one series file (merge keeps each series' ranges in segment order)."""
+    tables, index = open_series()
+    parts = [(tables[name], index.loc[index["segment"] == name, KEYS + ["start", "stop"]])
+             for name in index["segment"].drop_duplicates()]
+    table, index = merge(parts) if len(parts) > 1 else parts[0]
+    write(table, index)
+    return index
+
+@profiled()
+def refresh(since: pd.DataFrame = None):
+    """
+    Rebuild the series file from the forecast and features stores. `since` holds the
+    first newly scored date per series (sku, channel, date): only those rows are read and
+    appended as a segment, and every COMPACT_SEGMENTS runs the segments are compacted.
+    """
+    if since is None or not (SERIES_FILE.exists() and SERIES_INDEX_FILE.exists()):
+        table, index = build(store.read(FORECAST_FILE, "forecast"), store.read_features(columns=PLAN_COLUMNS))
+        write(table, index)
+        return index
+    first = since["date"].min()
+    since = since.astype({"sku": "str", "channel": "str"}).rename(columns={"date": "since"})
+    forecast_df = store.read(FORECAST_FILE, "forecast", since=first).astype({"sku": "str", "channel": "str"})
+    forecast_df = forecast_df.merge(since, on=KEYS)
+    forecast_df = forecast_df[forecast_df["date"] >= forecast_df["since"]].drop(columns="since")
+    features_df = store.read_features(since=first, columns=PLAN_COLUMNS)
+    append(*build(forecast_df, features_df))
+    if len(segment_files()) >= COMPACT_SEGMENTS:
+        return compact()
+    return pd.read_parquet(SERIES_INDEX_FILE)
+
+# -----------------------------
+# Reading
+# -----------------------------
+def open_series():
+    """
+    ({file name: memory-mapped table}, index) for the series file and its segments.
+    Nothing is read until a slice is converted.
+    """
+    index = pd.read_parquet(SERIES_INDEX_FILE)
+    paths = {SERIES_FILE.name: SERIES_FILE, **{p.name: p for p in segment_files()}}
+    tables = {name: pa.ipc.open_file(pa.memory_map(str(paths[name]), "r")).read_all()
+              for name in [SERIES_FILE.name, *index["segment"].drop_duplicates()]}
+    return tables, index
+
+def read_series(tables: dict, index: pd.DataFrame, sku: str, channel: str) -> pd.DataFrame:
+    """Rows of one series in date order; index lookups and slices instead of a scan."""
+    hit = index[(index["sku"] == sku) & (index["channel"] == channel)]
+    table = tables[SERIES_FILE.name]
+    if len(hit) == 0:
+        return schema.cast(table.slice(0, 0).to_pandas(), "forecast_series")
+    slices = [tables[s].slice(int(a), int(b) - int(a)) for s, a, b in hit[["segment", "start", "stop"]].itertuples(index=False)]
+    return schema.cast(pa.concat_tables(slices).to_pandas(), "forecast_series")
+
+def downsample(df: pd.DataFrame, columns, n_out: int) -> pd.DataFrame:
+    """
+    At most n_out rows: LTTB picks n_out / len(columns) rows per column (against date)
+    and the picks are merged, so every line keeps its own peaks and troughs.
+    """
+    if len(df) <= n_out:
+        return df
+    x = df["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    per_line = max(3, n_out // len(columns))
+    keep = np.unique(np.concatenate([lttb(x, df[c].to_numpy(dtype=np.float64), per_line) for c in columns]))
+    return df.iloc[keep]
+
+@profiled(entry=True)
+def main(argv=None):
+    argparse.ArgumentParser(description="Rebuild the per-series forecast file used by the Forecast Explorer.").parse_args(argv)
+    if not FORECAST_FILE.exists():
+        raise FileNotFoundError("Missing forecast.parquet. Run `python -m src.predict` first.")
+    index = refresh()
+    print(f"Series file saved to: {SERIES_FILE} ({int((index['stop'] - index['start']).sum())} rows)")
+    print(f"Series index saved to: {SERIES_INDEX_FILE} ({len(index)} series)")
+
+if __name__ == "__main__":
+    main()
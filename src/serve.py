@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+from src import features
+from src.predict import load_model
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BATCH = 256          # requests coalesced into one predict call
+MAX_WAIT_MS = 5.0        # how long the first request of a batch waits for company
+LATENCY_WINDOW = 10_000  # recent requests kept for p50/p99
+
+class ForecastService:
+    """
+    Next-day forecasts from the latest per-series feature state, with what-if overrides.
+
+    The model and one feature row per (sku, channel) (day T, built from the incremental
+    tail) are loaded once. Concurrent requests are queued and coalesced into micro-batches
+    that are scored with a single vectorized predict call.
+    """
+
+    def __init__(self, model, base_rows: pd.DataFrame, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.model = model
+        self.base_rows = base_rows
+        self.row_index = {key: i for i, key in enumerate(zip(base_rows["sku"], base_rows["channel"]))}
+        self.overridable = set(base_rows.columns) - set(features.GROUP_COLS + ["date"])
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = None
+        self.batch_task = None
+
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.errors = 0
+
+    @classmethod
+    def from_artifacts(cls, **kwargs) -> "ForecastService":
+        df = features.build_features(features.load_series_tail())
+        base_rows = df.groupby(features.GROUP_COLS, sort=False).tail(1).reset_index(drop=True)
+        return cls(load_model(), base_rows.drop(columns=["target_units_next_day"]), **kwargs)
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        # Held so the task is not garbage-collected mid-run and can be cancelled by stop()
+        self.batch_task = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        if self.batch_task is None:
+            return
+        self.batch_task.cancel()
+        try:
+            await self.batch_task
+        except asyncio.CancelledError:
+            pass
+        self.batch_task = None
+
+    async def forecast(self, request: dict) -> dict:
+        if not isinstance(request, dict):
+            raise TypeError("Each forecast request must be a JSON object")
+        key = (request.get("sku"), request.get("channel"))
+        if key not in self.row_index:
+            raise KeyError(f"Unknown series {key[0]!r}/{key[1]!r}")
+        overrides = request.get("overrides") or {}
+        if not isinstance(overrides, dict):
+            raise TypeError("overrides must be a JSON object")
+        overrides = {col: float(v) for col, v in overrides.items()}
+        bad = set(overrides) - self.overridable
+        if bad:
+            raise ValueError(f"Cannot override {sorted(bad)}")
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((time.perf_counter(), self.row_index[key], overrides, fut))
+        return await fut
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                preds = await loop.run_in_executor(None, self._predict_batch, batch)
+            except Exception as exc:
+                for *_, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+
+            done = time.perf_counter()
+            self.batch_sizes[len(batch)] += 1
+            for (t0, row, _, fut), y in zip(batch, preds):
+                self.latencies_ms.append((done - t0) * 1000.0)
+                if fut.done():  # client went away
+                    continue
+                base = self.base_rows.iloc[row]
+                fut.set_result({
+                    "sku": base["sku"],
+                    "channel": base["channel"],
+                    "origin_date": str(base["date"].date()),
+                    "date": str((base["date"] + pd.Timedelta(days=1)).date()),
+                    "prediction": float(y),
+                    "batch_size": len(batch),
+                })
+
+    def _predict_batch(self, batch) -> np.ndarray:
+        X = self.base_rows.iloc[[row for _, row, _, _ in batch]].reset_index(drop=True)
+
+        # What-if overrides, applied column by column across the batch
+        columns = {col for _, _, overrides, _ in batch for col in overrides}
+        for col in columns:
+            values = X[col].to_numpy(dtype=np.float64, copy=True)
+            for i, (_, _, overrides, _) in enumerate(batch):
+                if col in overrides:
+                    values[i] = overrides[col]
+            X[col] = values
+
+        return self.model.predict(X)
+
+    def metrics(self) -> dict:
+        lat = np.array(self.latencies_ms) if self.latencies_ms else np.array([np.nan])
+        n_batches = sum(self.batch_sizes.values())
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "series": len(self.row_index),
+            "latency_ms": {
+                "p50": float(np.nanpercentile(lat, 50)),
+                "p99": float(np.nanpercentile(lat, 99)),
+                "window": len(self.latencies_ms),
+            },
+            "batches": n_batches,
+            "batch_size_mean": (sum(k * v for k, v in self.batch_sizes.items()) / n_batches) if n_batches else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+        }
+
+# -----------------------------
+# Minimal HTTP/1.1 over TCP or a Unix socket (stdlib only, works offline)
+# -----------------------------
+async def read_request(reader: asyncio.StreamReader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, path, headers, body
+
+def write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+    )
+
+def make_handler(service: ForecastService):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (asyncio.IncompleteReadError, ValueError):
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                status, payload = 200, None
+                if method == "GET" and path == "/metrics":
+                    payload = service.metrics()
+                elif method == "GET" and path == "/health":
+                    payload = {"status": "ok", "series": len(service.row_index)}
+                elif method == "POST" and path == "/forecast":
+                    try:
+                        data = json.loads(body or b"{}")
+                        items = data if isinstance(data, list) else [data]
+                        service.requests += len(items)
+                        # Reject the whole body before any item is queued
+                        if not all(isinstance(item, dict) for item in items):
+                            raise TypeError("Body must be a JSON object or a list of objects")
+                        results = await asyncio.gather(*(service.forecast(item) for item in items))
+                        payload = results if isinstance(data, list) else results[0]
+                    except (KeyError, ValueError, TypeError) as exc:
+                        service.errors += 1
+                        status, payload = 400, {"error": str(exc.args[0]) if exc.args else str(exc)}
+                    except Exception as exc:
+                        service.errors += 1
+                        status, payload = 500, {"error": str(exc)}
+                else:
+                    status, payload = 404, {"error": f"No route for {method} {path}"}
+
+                write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+    return handle
+
+async def serve(args):
+    service = ForecastService.from_artifacts(max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    await service.start()
+
+    handler = make_handler(service)
+    if args.unix_socket:
+        server = await asyncio.start_unix_server(handler, path=args.unix_socket)
+        where = f"unix:{args.unix_socket}"
+    else:
+        server = await asyncio.start_server(handler, host=args.host, port=args.port)
+        where = f"http://{args.host}:{args.port}"
+
+    print(f"Forecast server for {len(service.row_index)} series listening on {where}")
+    print("POST /forecast {\"sku\": ..., \"channel\": ..., \"overrides\": {\"price\": ..., \"promo_flag\": ...}}")
+    print("GET  /metrics, GET /health")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local micro-batching forecast server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix-socket", default=None, help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src import decision, features, predict, reorder, rollup, schema, series_file, store
+from src.profiling import profiled
+from src.sketch import SKETCH_FILE, ResidualSketch
+
+# Series are hash-partitioned by (sku, channel) into shards (store.series_shards); with more
+# shards than workers, a slow shard is balanced by the others. One worker by default: the
+# speedup from more has only been measured on a single CPU, where they are slower
+DEFAULT_WORKERS = 1
+
+# -----------------------------
+# Phase 1 (per shard): features -> predict -> horizon, written as the shard's own fragments
+# -----------------------------
+_worker_inputs = None
+
+def _init_worker(inputs):
+    global _worker_inputs
+    _worker_inputs = inputs
+
+@profiled()
+def run_shard_forecast(shard: int) -> dict:
+    """
+    Featurize and score one shard's series and append them to features.parquet and
+    forecast.parquet as shard-<n> fragments. Returns what the coordinator merges: the
+    residual sketch, the horizon forecast, the feature state tail and the last
+    LOOKBACK_DAYS of the forecast (all reorder and decision need), plus the shard's
+    rollup cube and series file part.
+    """
+    sales, shards, model, horizon = _worker_inputs
+    t0 = time.perf_counter()
+    sales = sales[shards == shard].reset_index(drop=True)
+    if len(sales) == 0:
+        return {"shard": shard, "series": 0, "rows": 0, "seconds": 0.0}
+
+    model_df = features.model_frame(features.build_features(sales))
+    high_water_mark = sales["date"].max()
+    store.write_partitioned(model_df, features.FEATURES_FILE, "features",
+                            name=f"{features.fragment_name(high_water_mark)}-shard{shard:03d}", mirror=True)
+
+    forecast_df = predict.score_features(model_df, model)
+    store.write_partitioned(forecast_df, predict.FORECAST_FILE, "forecast", name=f"full-shard{shard:03d}", mirror=True)
+
+    tail = (
+        sales[features.SALES_COLUMNS]
+        .sort_values(["sku", "channel", "date"])
+        .groupby(features.GROUP_COLS, sort=False)
+        .tail(features.state_rows())
+    )
+    last = forecast_df["date"].max()
+    return {
+        "shard": shard,
+        "series": int(tail[["sku", "channel"]].drop_duplicates().shape[0]),
+        "rows": len(forecast_df),
+        "abs_error": float(forecast_df["abs_error"].sum()),
+        "high_water_mark": high_water_mark,
+        "last": last,
+        "recent": forecast_df[forecast_df["date"] >= last - pd.Timedelta(days=decision.LOOKBACK_DAYS)],
+        "tail": tail,
+        "sketch": ResidualSketch.from_forecast(forecast_df, window=reorder.LEAD_TIME_DAYS),
+        "horizon": predict.forecast_horizon(model, tail, horizon) if horizon > 0 else None,
+        "cube": rollup.build_cube(forecast_df),
+        "series_file": series_file.build(forecast_df, model_df),
+        "seconds": time.perf_counter() - t0,
+    }
+
+# -----------------------------
+# Phase 2 (per shard): reorder -> decision on the shard's recent forecast
+# -----------------------------
+def run_shard_decision(task) -> tuple:
+    recent, horizon, sketch, inventory, policy = task
+    plan = reorder.build_reorder_plan(recent, horizon, sketch, inventory=inventory)
+    return plan, decision.build_decision_report(recent, plan, policy)
+
+def write_rollup(cubes):
+    rollup.write_rollup(rollup.merge_cubes(cubes))
+
+def merge_sorted(frames, column: str, **sort_kwargs) -> pd.DataFrame:
+    """
+    Concatenate per-shard outputs and sort them as the single-process stage does: from
+    (sku, channel) order by `column`, descending. Same input order, same algorithm,
+    so ties land exactly where an unsharded run puts them.
+    """
+    out = pd.concat(frames, ignore_index=True).astype({"sku": "str", "channel": "str"})
+    out = out.sort_values(["sku", "channel"], kind="stable").reset_index(drop=True)
+    out = out.sort_values(column, ascending=False, **sort_kwargs)
+    return out.astype({"sku": "category", "channel": "category"})
+
+# -----------------------------
+# Coordinator
+# -----------------------------
+@profiled()
+def run(n_shards: int, workers: int, horizon: int = predict.DEFAULT_HORIZON) -> dict:
+    """
+    Run features -> predict -> reorder -> decision with the series split into n_shards,
+    in a pool of `workers` processes. The trained model is loaded once here and shared
+    read-only with the workers (copy-on-write where workers are forked, as on Linux).
+    Writes the same artifacts as the single-process stages.
+    """
+    if not predict.MODEL_FILE.exists():
+        raise FileNotFoundError("Missing model.pkl. Run `python -m src.train` first.")
+
+    sales = features.load_clean_sales()
+    shards = store.series_shards(sales["sku"], sales["channel"], n_shards)
+    inputs = (sales, shards, predict.load_model(), horizon)
+
+    features.reset_features_dir()
+    predict.reset_forecast_dir()
+
+    timings = {}
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(inputs,)) if workers > 1 else None
+    try:
+        t0 = time.perf_counter()
+        if pool is not None:
+            parts = list(pool.map(run_shard_forecast, range(n_shards)))
+        else:
+            _init_worker(inputs)
+            parts = [run_shard_forecast(s) for s in range(n_shards)]
+        parts = [p for p in parts if p["rows"]]
+        timings["forecast_s"] = time.perf_counter() - t0
+
+        # Merge. Jobs that only write files run on the pool, next to reorder and decision
+        t0 = time.perf_counter()
+        run_id = features.new_run_id()
+        jobs = [
+            (features.save_state, (pd.concat([p["tail"] for p in parts], ignore_index=True),
+                                   max(p["high_water_mark"] for p in parts), run_id)),
+            (write_rollup, ([p.pop("cube") for p in parts],)),
+        ]
+        pending = [pool.submit(fn, *args) for fn, args in jobs] if pool is not None else [fn(*args) for fn, args in jobs]
+        series_file.write(*series_file.merge([p.pop("series_file") for p in parts]))
+        predict.save_cache_meta(predict.cache_key(run_id), max(p["last"] for p in parts),
+                                max(p["high_water_mark"] for p in parts))
+        sketch = ResidualSketch.empty(window=reorder.LEAD_TIME_DAYS)
+        for p in parts:
+            sketch.merge(p["sketch"])
+        sketch.save(SKETCH_FILE)
+        if horizon > 0:
+            schema.write_parquet(pd.concat([p["horizon"] for p in parts], ignore_index=True),
+                                 predict.FORECAST_HORIZON_FILE, "forecast_horizon")
+        timings["merge_s"] = time.perf_counter() - t0
+
+        # "Today" and the placeholder inventory are global: drawn once over all series
+        t0 = time.perf_counter()
+        today = max(p["last"] for p in parts)
+        current = [p for p in parts if p["last"] == today]   # other shards have no series left today
+        keys = pd.concat([p["recent"].loc[p["recent"]["date"] == today, ["sku", "channel"]] for p in current])
+        keys = keys.astype(str).sort_values(["sku", "channel"], kind="stable").reset_index(drop=True)
+        keys["inventory_on_hand"] = reorder.simulated_inventory(len(keys))
+        shard_of_key = store.series_shards(keys["sku"], keys["channel"], n_shards)
+
+        policy = decision.load_policy()
+        tasks = [(p["recent"], p["horizon"], p["sketch"], keys[shard_of_key == p["shard"]], policy)
+                 for p in current]
+        results = list(pool.map(run_shard_decision, tasks)) if pool is not None else [run_shard_decision(t) for t in tasks]
+        if pool is not None:
+            for job in pending:
+                job.result()
+        timings["decision_s"] = time.perf_counter() - t0
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    plan = merge_sorted([r[0] for r in results], "reorder_qty")
+    plan.to_csv(reorder.REORDER_FILE, index=False)
+    store.write_ipc(plan, reorder.REORDER_FILE)
+    report = merge_sorted([r[1] for r in results], "reorder_qty_adjusted", na_position="last")
+    report.to_csv(decision.DECISION_FILE, index=False)
+    store.write_ipc(report, decision.DECISION_FILE)
+
+    return {"parts": parts, "plan": plan, "report": report, "timings": timings}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run features -> predict -> reorder -> decision per SKU-channel shard in a process pool."
+    )
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--shards", type=int, default=None, help="Series shards (default: one per worker)")
+    parser.add_argument("--horizon", type=int, default=predict.DEFAULT_HORIZON,
+                        help="Days ahead for the multi-horizon forecast (0 disables it)")
+    return parser.parse_args(argv)
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+    n_shards = args.shards or args.workers
+
+    t0 = time.perf_counter()
+    out = run(n_shards, args.workers, args.horizon)
+    seconds = time.perf_counter() - t0
+
+    parts = out["parts"]
+    print(f"Sharded run: {n_shards} shards on {args.workers} worker(s) in {seconds:.2f}s "
+          + " | ".join(f"{k[:-2]} {v:.2f}s" for k, v in out["timings"].items()))
+    print(f"{'shard':>6} {'series':>8} {'rows':>11} {'seconds':>8}")
+    for p in parts:
+        print(f"{p['shard']:>6} {p['series']:>8} {p['rows']:>11,} {p['seconds']:>8.2f}")
+    print(f"Features saved to: {features.FEATURES_FILE}")
+    print(f"Forecast saved to: {predict.FORECAST_FILE}")
+    print(f"Reorder plan saved to: {reorder.REORDER_FILE}")
+    print(f"Decision report saved to: {decision.DECISION_FILE}")
+    print("LOW confidence rows:", int((out["report"]["confidence"] == "LOW").sum()))
+
+if __name__ == "__main__":
+    main()
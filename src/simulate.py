@@ -0,0 +1,272 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import store
+from src.profiling import profiled
+from src.reorder import LEAD_TIME_DAYS, MIN_ORDER_QTY, SERVICE_LEVEL_Z, SERVICE_QUANTILE, SKETCH_MIN_COUNT
+
+PROCESSED = Path("data/processed")
+FORECAST_FILE = PROCESSED / "forecast.parquet"
+SIMULATION_FILE = PROCESSED / "simulation_report.csv"
+
+# Cost of keeping one unit on hand overnight
+HOLDING_COST_PER_UNIT_DAY = 0.02
+
+# The reorder.py policy (plus a holding cost) as simulation parameters
+SIM_POLICY = {
+    "lead_time_days": LEAD_TIME_DAYS,
+    "service_level_z": SERVICE_LEVEL_Z,
+    "service_quantile": SERVICE_QUANTILE,
+    "min_order_qty": MIN_ORDER_QTY,
+    "holding_cost": HOLDING_COST_PER_UNIT_DAY,
+}
+
+DEFAULT_PATHS = 1000
+DEFAULT_DAYS = 365
+# Paths per task; fixed so results do not depend on the number of workers
+CHUNK_PATHS = 50
+
+# -----------------------------
+# Inputs: (series x days) matrices replayed from the forecast history
+# -----------------------------
+@profiled()
+def load_history(days: int = None):
+    """
+    Forecast rows of the last `days` days as (series x days) float32 matrices.
+    Returns (series, dates, prediction, abs_error, residual); missing cells are NaN.
+    """
+    since = None
+    if days:
+        _, last = store.date_bounds(FORECAST_FILE)
+        since = last - pd.Timedelta(days=days - 1)
+    df = store.read_forecast(since=since, columns=["date", "sku", "channel", "target_units_next_day", "prediction", "abs_error"])
+
+    codes = df.groupby(["sku", "channel"], observed=True, sort=True).ngroup().to_numpy()
+    series = df[["sku", "channel"]].drop_duplicates().sort_values(["sku", "channel"]).reset_index(drop=True)
+    day = df["date"].to_numpy(dtype="datetime64[D]")
+    dates = np.arange(day.min(), day.max() + np.timedelta64(1, "D"))
+    col = (day - dates[0]).astype(np.int64)
+
+    def matrix(values):
+        m = np.full((len(series), len(dates)), np.nan, dtype=np.float32)
+        m[codes, col] = values
+        return m
+
+    prediction = matrix(df["prediction"].to_numpy(dtype=np.float32))
+    abs_error = matrix(df["abs_error"].to_numpy(dtype=np.float32))
+    residual = matrix((df["target_units_next_day"] - df["prediction"]).to_numpy(dtype=np.float32))
+    return series, dates, prediction, abs_error, residual
+
+def decision_std(abs_error: np.ndarray) -> np.ndarray:
+    """
+    Demand std used on each day, as in reorder.py: the latest known abs_error clipped at 1.
+    On day d that is the error of day d - 1 (day d's own error is only known afterwards).
+    """
+    std = np.ones_like(abs_error)
+    std[:, 1:] = np.fmax(abs_error[:, :-1], 1)
+    return std
+
+def safety_stock(abs_error: np.ndarray, residual: np.ndarray, policy: dict) -> np.ndarray:
+    """
+    Safety stock used on each day, as in reorder.py: the service_quantile of the series'
+    rolling lead-time residual sums when it has SKETCH_MIN_COUNT of them, otherwise
+    z * std * sqrt(L) with decision_std. Unlike reorder.py, the quantile is taken over
+    the whole replayed history rather than the windows known on each day, matching the
+    demand draws, which resample that same history.
+    """
+    lead = int(policy["lead_time_days"])
+    safety = policy["service_level_z"] * np.sqrt(lead) * decision_std(abs_error).astype(np.float64)
+
+    missing = np.isnan(residual)
+    zero = np.zeros((len(residual), 1))
+    cum = np.concatenate([zero, np.cumsum(np.where(missing, 0, residual), axis=1, dtype=np.float64)], axis=1)
+    gaps = np.concatenate([zero, np.cumsum(missing, axis=1)], axis=1)
+    sums = cum[:, lead:] - cum[:, :-lead]
+    sums[gaps[:, lead:] != gaps[:, :-lead]] = np.nan
+
+    use = np.count_nonzero(~np.isnan(sums), axis=1) >= SKETCH_MIN_COUNT
+    if use.any():
+        q = np.nanquantile(sums[use], policy["service_quantile"], axis=1, method="lower")
+        safety[use] = np.maximum(q, 0)[:, None]
+    return safety.astype(np.float32)
+
+def lead_time_demand(prediction: np.ndarray, lead: int) -> np.ndarray:
+    """
+    Lead-time demand used on each day, the replay's counterpart of reorder.lead_time_demand:
+    there it is the multi-horizon forecast summed over the lead time; here the forecast for
+    each of the next `lead` days is that day's replayed prediction (the mean of the simulated
+    demand), so it is their sum. Days without a prediction add nothing. The last lead - 1
+    days, whose window runs past the history, use reorder's fallback, prediction * lead.
+    """
+    pred = np.nan_to_num(prediction).astype(np.float64)
+    cum = np.concatenate([np.zeros((len(pred), 1)), np.cumsum(pred, axis=1)], axis=1)
+    demand = pred * lead
+    if pred.shape[1] >= lead:
+        demand[:, :pred.shape[1] - lead + 1] = cum[:, lead:] - cum[:, :-lead]
+    return demand.astype(np.float32)
+
+# -----------------------------
+# Simulation: lost-sales daily review with the reorder.py order-up-to rule
+# -----------------------------
+def simulate_paths(prediction, safety, residual, policy: dict, n_paths: int, rng) -> dict:
+    """
+    Run n_paths demand paths for all series at once; state arrays are (paths x series).
+
+    Each day: receive the order placed lead_time_days ago, order up to
+    lead_time_demand + safety stock against on hand + on order (skipped below
+    min_order_qty), then demand = prediction + a residual resampled from the same
+    series' history (rounded, floored at 0) is served from stock; unmet demand is lost.
+
+    Days without a prediction (before a series starts, or gaps) have no demand and
+    place no orders, and their missing residuals are not in the pool. A series starts
+    with its first active day's target in stock.
+
+    Returns per-series sums over paths plus the per-path fill rate.
+    """
+    n_series, n_days = prediction.shape
+    lead = int(policy["lead_time_days"])
+    # Day-major copies so each day's inputs are contiguous rows
+    active = np.ascontiguousarray(~np.isnan(prediction).T)
+    pred = np.ascontiguousarray(np.nan_to_num(prediction).T)
+    target = np.ascontiguousarray((lead_time_demand(prediction, lead) + safety).T)
+    # Known residuals packed per series: a draw is one np.take at series offset + random index
+    known = ~np.isnan(residual)
+    n_known = known.sum(axis=1)
+    pool = np.append(residual[known].astype(np.float32), np.float32(0))   # series without residuals draw 0
+    offsets = np.where(n_known > 0, np.cumsum(n_known) - n_known, len(pool) - 1)
+    n_draw = np.maximum(n_known, 1)
+
+    first = active.argmax(axis=0)
+    initial = np.where(active.any(axis=0), np.round(target[first, np.arange(n_series)]), 0).astype(np.float32)
+    on_hand = np.zeros((n_paths, n_series), dtype=np.float32)
+    pipeline = np.zeros((lead, n_paths, n_series), dtype=np.float32)
+    on_order = np.zeros((n_paths, n_series), dtype=np.float32)
+
+    demand_sum = np.zeros((n_paths, n_series))
+    sales_sum = np.zeros((n_paths, n_series))
+    stockout_days = np.zeros(n_series)
+    holding = np.zeros(n_series)
+    orders = np.zeros(n_series)
+
+    for d in range(n_days):
+        slot = d % lead
+        on_hand += pipeline[slot] + np.where(first == d, initial, 0)
+        on_order -= pipeline[slot]
+
+        qty = target[d] - (on_hand + on_order)
+        qty = np.where(active[d] & (qty >= policy["min_order_qty"]), np.round(qty), 0).astype(np.float32)
+        pipeline[slot] = qty
+        on_order += qty
+
+        draw = np.take(pool, offsets + rng.integers(0, n_draw, size=(n_paths, n_series)))
+        demand = np.where(active[d], np.maximum(np.round(pred[d] + draw), 0), 0)
+        sales = np.minimum(on_hand, demand)
+        on_hand -= sales
+
+        demand_sum += demand
+        sales_sum += sales
+        stockout_days += np.count_nonzero(demand > sales, axis=0)
+        holding += on_hand.sum(axis=0, dtype=np.float64)
+        orders += np.count_nonzero(qty, axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fill = np.where(demand_sum > 0, sales_sum / demand_sum, 1.0)
+    return {
+        "fill_rate": fill.astype(np.float32),
+        "demand": demand_sum.sum(axis=0),
+        "sales": sales_sum.sum(axis=0),
+        "stockout_days": stockout_days,
+        "holding_cost": holding * policy["holding_cost"],
+        "orders": orders,
+    }
+
+_worker_inputs = None
+
+def _init_worker(inputs):
+    global _worker_inputs
+    _worker_inputs = inputs
+
+def _run_chunk(task) -> dict:
+    seed, n_paths = task
+    prediction, safety, residual, policy = _worker_inputs
+    return simulate_paths(prediction, safety, residual, policy, n_paths, np.random.default_rng(seed))
+
+@profiled()
+def simulate(prediction, safety, residual, policy: dict = SIM_POLICY, n_paths: int = DEFAULT_PATHS,
+             seed: int = 42, workers: int = 1, chunk_paths: int = CHUNK_PATHS) -> pd.DataFrame:
+    """
+    Split the paths into fixed-size chunks (one seed each) and run them in a process pool.
+    Returns one row per series: fill_rate (pooled), fill_rate_p05 (across paths), and
+    stockout_days, holding_cost and orders per path.
+    """
+    sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = list(zip(seeds, sizes))
+    inputs = (prediction, safety, residual, policy)
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(inputs,)) as pool:
+            results = list(pool.map(_run_chunk, tasks))
+    else:
+        _init_worker(inputs)
+        results = [_run_chunk(t) for t in tasks]
+
+    fill = np.concatenate([r["fill_rate"] for r in results], axis=0)
+    total = {k: sum(r[k] for r in results) for k in ["demand", "sales", "stockout_days", "holding_cost", "orders"]}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fill_rate = np.where(total["demand"] > 0, total["sales"] / total["demand"], 1.0)
+    return pd.DataFrame({
+        "fill_rate": fill_rate,
+        "fill_rate_p05": np.quantile(fill, 0.05, axis=0),
+        "stockout_days": total["stockout_days"] / n_paths,
+        "holding_cost": total["holding_cost"] / n_paths,
+        "orders": total["orders"] / n_paths,
+    })
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo replay of the reorder policy over the forecast history.")
+    parser.add_argument("--paths", type=int, default=DEFAULT_PATHS)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Most recent days of forecast history to replay")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lead-time", type=int, default=SIM_POLICY["lead_time_days"])
+    parser.add_argument("--z", type=float, default=SIM_POLICY["service_level_z"],
+                        help="Safety stock z (series with too little residual history)")
+    parser.add_argument("--service-quantile", type=float, default=SIM_POLICY["service_quantile"],
+                        help="Quantile of the lead-time residual sums used as safety stock")
+    parser.add_argument("--moq", type=float, default=SIM_POLICY["min_order_qty"], help="Minimum order quantity")
+    parser.add_argument("--holding-cost", type=float, default=SIM_POLICY["holding_cost"], help="Per unit per day")
+    return parser.parse_args(argv)
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+    if not FORECAST_FILE.exists():
+        raise FileNotFoundError("Run `python -m src.predict` first.")
+
+    policy = {
+        "lead_time_days": args.lead_time,
+        "service_level_z": args.z,
+        "service_quantile": args.service_quantile,
+        "min_order_qty": args.moq,
+        "holding_cost": args.holding_cost,
+    }
+    series, dates, prediction, abs_error, residual = load_history(args.days)
+    metrics = simulate(prediction, safety_stock(abs_error, residual, policy), residual, policy, args.paths, args.seed,
+                       args.workers)
+    report = pd.concat([series.astype(str), metrics], axis=1)
+    report.to_csv(SIMULATION_FILE, index=False)
+
+    print(f"Simulated {args.paths} paths x {len(series)} series x {len(dates)} days "
+          f"({dates[0]} .. {dates[-1]}), policy {policy}")
+    print(f"Fill rate: mean {report['fill_rate'].mean():.3f} | worst series {report['fill_rate'].min():.3f}")
+    print(f"Stock-out days per series: {report['stockout_days'].mean():.1f}")
+    print(f"Holding cost per series: {report['holding_cost'].mean():.2f}")
+    print(f"Simulation report saved to: {SIMULATION_FILE}")
+
+if __name__ == "__main__":
+    main()
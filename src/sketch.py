@@ -0,0 +1,164 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROCESSED = Path("data/processed")
+SKETCH_FILE = PROCESSED / "residual_sketch.npz"
+
+# Quantile estimates are within SKETCH_ALPHA relative error for |residual| in
+# [SKETCH_MIN_VALUE, SKETCH_MAX_VALUE]; smaller values count as 0, larger ones
+# fall into the outermost bucket
+SKETCH_ALPHA = 0.02
+SKETCH_MIN_VALUE = 0.01
+SKETCH_MAX_VALUE = 1e5
+
+
+def window_sums(forecast_df: pd.DataFrame, window: int = 1, ends_after=None) -> pd.DataFrame:
+    """
+    Residual (actual - prediction) summed over every run of `window` consecutive days
+    per series: sku, channel, date (the window's last day), residual. Windows with a
+    missing day or residual are skipped; with ends_after, so are those ending on or before it.
+    """
+    df = forecast_df[["sku", "channel", "date", "target_units_next_day", "prediction"]]
+    df = df.astype({"sku": "str", "channel": "str"}).sort_values(["sku", "channel", "date"], kind="stable")
+    residual = df["target_units_next_day"].to_numpy(np.float64) - df["prediction"].to_numpy(np.float64)
+    day = df["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    series = df.groupby(["sku", "channel"], sort=False).ngroup().to_numpy()
+
+    missing = np.isnan(residual)
+    cum = np.concatenate([[0.0], np.cumsum(np.where(missing, 0.0, residual))])
+    cum_missing = np.concatenate([[0], np.cumsum(missing)])
+    end = np.arange(window - 1, len(df))
+    start = end - (window - 1)
+    ok = (
+        (series[start] == series[end])
+        & (day[end] - day[start] == window - 1)
+        & (cum_missing[end + 1] == cum_missing[start])
+    )
+    if ends_after is not None:
+        ok &= day[end] > np.datetime64(pd.Timestamp(ends_after).date(), "D").astype(np.int64)
+    end, start = end[ok], start[ok]
+    out = df.iloc[end][["sku", "channel", "date"]].reset_index(drop=True)
+    out["residual"] = cum[end + 1] - cum[start]
+    return out
+
+
+class ResidualSketch:
+    """
+    One fixed-size log-bucket histogram (DDSketch-style) per (sku, channel) series, of
+    forecast residuals summed over `window` consecutive days (1: daily residuals).
+
+    Bucket k of each sign holds |x| in (min * gamma^(k-1), min * gamma^k] with
+    gamma = (1 + alpha) / (1 - alpha), and reports 2 * min * gamma^k / (gamma + 1),
+    which is within alpha of every value in the bucket. Columns run from the most
+    negative bucket through zero to the most positive, so a row's cumulative counts
+    are in value order. Sketches merge by adding counts.
+    """
+
+    def __init__(self, sku, channel, counts, alpha=SKETCH_ALPHA, min_value=SKETCH_MIN_VALUE,
+                 max_value=SKETCH_MAX_VALUE, window=1):
+        self.window = int(window)
+        self.alpha = float(alpha)
+        self.min_value = float(min_value)
+        self.max_value = float(max_value)
+        self.gamma = (1 + self.alpha) / (1 - self.alpha)
+        self.n_side = int(np.ceil(np.log(self.max_value / self.min_value) / np.log(self.gamma))) + 1
+        self.index = pd.MultiIndex.from_arrays([np.asarray(sku, dtype=str), np.asarray(channel, dtype=str)],
+                                               names=["sku", "channel"])
+        self.counts = np.asarray(counts, dtype=np.uint32).reshape(len(self.index), 2 * self.n_side + 1)
+
+    @classmethod
+    def empty(cls, **params) -> "ResidualSketch":
+        return cls([], [], np.zeros(0), **params)
+
+    @classmethod
+    def from_residuals(cls, sku, channel, residual, **params) -> "ResidualSketch":
+        return cls.empty(**params).add(sku, channel, residual)
+
+    @classmethod
+    def from_forecast(cls, forecast_df: pd.DataFrame, ends_after=None, **params) -> "ResidualSketch":
+        """
+        Sketch of actual - prediction (positive: demand above forecast) per series, summed
+        over params["window"] days (see window_sums).
+        """
+        sums = window_sums(forecast_df, params.get("window", 1), ends_after)
+        return cls.from_residuals(sums["sku"], sums["channel"], sums["residual"], **params)
+
+    def _columns(self, x: np.ndarray) -> np.ndarray:
+        mag = np.abs(x)
+        with np.errstate(divide="ignore"):
+            k = np.ceil(np.log(mag / self.min_value) / np.log(self.gamma))
+        k = np.clip(np.nan_to_num(k, neginf=0), 0, self.n_side - 1).astype(np.int64)
+        col = np.where(x > 0, self.n_side + 1 + k, self.n_side - 1 - k)
+        return np.where(mag < self.min_value, self.n_side, col)
+
+    def bucket_values(self) -> np.ndarray:
+        """Representative value of every column, in column (= value) order."""
+        side = 2 * self.min_value * self.gamma ** np.arange(self.n_side) / (self.gamma + 1)
+        return np.concatenate([-side[::-1], [0.0], side])
+
+    def _rows(self, index: pd.MultiIndex) -> np.ndarray:
+        """Row of every key, appending rows for series not seen before."""
+        new = index.unique().difference(self.index)
+        if len(new):
+            self.index = self.index.append(new)
+            self.counts = np.vstack([self.counts, np.zeros((len(new), self.counts.shape[1]), dtype=np.uint32)])
+        return self.index.get_indexer(index)
+
+    def add(self, sku, channel, residual) -> "ResidualSketch":
+        """Count new residuals into their series' buckets (NaNs are skipped)."""
+        residual = np.asarray(residual, dtype=np.float64)
+        ok = ~np.isnan(residual)
+        keys = pd.MultiIndex.from_arrays([np.asarray(sku, dtype=str)[ok], np.asarray(channel, dtype=str)[ok]],
+                                         names=["sku", "channel"])
+        rows = self._rows(keys)
+        width = self.counts.shape[1]
+        flat = np.bincount(rows * width + self._columns(residual[ok]), minlength=self.counts.size)
+        self.counts += flat.reshape(self.counts.shape).astype(np.uint32)
+        return self
+
+    def merge(self, other: "ResidualSketch") -> "ResidualSketch":
+        """Add another sketch's counts (same bucket parameters) into this one."""
+        if (other.window, other.alpha, other.min_value, other.max_value) != (self.window, self.alpha, self.min_value,
+                                                                              self.max_value):
+            raise ValueError("Cannot merge sketches with different bucket parameters")
+        rows = self._rows(other.index)   # may grow self.counts, so index it afterwards
+        self.counts[rows] += other.counts
+        return self
+
+    def count(self) -> np.ndarray:
+        return self.counts.sum(axis=1, dtype=np.int64)
+
+    def quantiles(self, qs) -> pd.DataFrame:
+        """Per-series quantile estimates, one column per q (NaN for series without residuals)."""
+        cum = np.cumsum(self.counts, axis=1, dtype=np.int64)
+        n = cum[:, -1]
+        values = self.bucket_values()
+        out = {}
+        for q in qs:
+            rank = np.floor(q * np.maximum(n - 1, 0))
+            col = np.argmax(cum > rank[:, None], axis=1)
+            out[f"q{int(round(q * 100)):02d}"] = np.where(n > 0, values[col], np.nan)
+        return pd.DataFrame(out, index=self.index).reset_index()
+
+    def save(self, path: Path = SKETCH_FILE) -> Path:
+        np.savez(
+            path,
+            sku=np.asarray(self.index.get_level_values("sku"), dtype=str),
+            channel=np.asarray(self.index.get_level_values("channel"), dtype=str),
+            counts=self.counts,
+            params=np.array([self.alpha, self.min_value, self.max_value, self.window]),
+        )
+        return path
+
+    @classmethod
+    def load(cls, path: Path = SKETCH_FILE) -> "ResidualSketch":
+        with np.load(path, allow_pickle=False) as z:
+            params = z["params"]
+            if params.shape != (4,):
+                raise ValueError(f"{path} has sketch params {params.tolist()}; expected [alpha, min_value, max_value, "
+                                 "window]. Rebuild it with `python -m src.predict --full`")
+            alpha, min_value, max_value, window = params
+            return cls(z["sku"], z["channel"], z["counts"], alpha=alpha, min_value=min_value, max_value=max_value,
+                       window=window)
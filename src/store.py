@@ -0,0 +1,284 @@
+import hashlib
+import os
+import shutil
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from src import schema
+from src.config import PROCESSED, STORE_PARTITION_COLS, STORE_ROWS_PER_GROUP, STORE_SKU_BUCKETS
+from src.profiling import profiled
+
+FEATURES_FILE = PROCESSED / "features.parquet"
+FORECAST_FILE = PROCESSED / "forecast.parquet"
+
+PARTITIONING = ds.partitioning(pa.schema([("year_month", pa.string()), ("sku_bucket", pa.int32())]), flavor="hive")
+
+# -----------------------------
+# Writing
+# -----------------------------
+def sku_buckets(skus) -> np.ndarray:
+    """Stable bucket per SKU (crc32, so it does not depend on PYTHONHASHSEED)."""
+    skus = pd.Series(skus).astype("category")
+    per_cat = np.array([zlib.crc32(str(s).encode()) % STORE_SKU_BUCKETS for s in skus.cat.categories], dtype=np.int32)
+    return per_cat[skus.cat.codes.to_numpy()]
+
+def series_shards(sku, channel, n_shards: int) -> np.ndarray:
+    """Stable shard per (sku, channel) series: crc32 of the series key modulo n_shards."""
+    sku = pd.Series(sku).astype("category")
+    channel = pd.Series(channel).astype("category")
+    n_channels = len(channel.cat.categories)
+    pairs = sku.cat.codes.to_numpy().astype(np.int64) * n_channels + channel.cat.codes.to_numpy()
+    series, codes = np.unique(pairs, return_inverse=True)
+    per_series = np.array([
+        zlib.crc32(f"{sku.cat.categories[p // n_channels]}\x1f{channel.cat.categories[p % n_channels]}".encode()) % n_shards
+        for p in series
+    ], dtype=np.int32)
+    return per_series[codes]
+
+@profiled()
+def write_partitioned(df: pd.DataFrame, root, artifact: str, name: str, mirror: bool = False):
+    """
+    Append df to the dataset at root as one file per (year_month, sku_bucket) partition,
+    named {name}-0.parquet. Rows keep the artifact's sort order inside each file.
+    mirror=True also writes the Arrow IPC mirror of each new file (see write_fragment_ipc);
+    only the new rows are written, so concurrent writers of distinct names are safe.
+    """
+    root = Path(root)
+    rows = schema.to_table(df, artifact)
+    dates = rows.column("date").to_numpy().astype("datetime64[M]")
+    table = rows.append_column("year_month", pa.array(dates.astype(str)))
+    table = table.append_column("sku_bucket", pa.array(sku_buckets(table.column("sku").to_pandas()), pa.int32()))
+    written = []
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{name}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        preserve_order=True,
+        # Without a floor, every input batch that touches a partition becomes its own tiny row group
+        min_rows_per_group=STORE_ROWS_PER_GROUP,
+        max_rows_per_group=max(STORE_ROWS_PER_GROUP, 1 << 20),
+        file_visitor=lambda f: written.append(f.path),
+    )
+
+    if mirror and ipc_enabled():
+        keys = table.select(STORE_PARTITION_COLS).to_pandas()
+        rows_of = keys.groupby(STORE_PARTITION_COLS, sort=False).indices
+        for path in written:
+            part = dict(seg.split("=", 1) for seg in Path(path).relative_to(root).parts[:-1])
+            write_fragment_ipc(rows.take(rows_of[(part["year_month"], int(part["sku_bucket"]))]), root, path)
+
+# -----------------------------
+# Reading: column projection + filters pushed down to partitions and row-group statistics
+# -----------------------------
+def dataset(root, files=None) -> ds.Dataset:
+    """Parquet dataset at root; with `files`, only those files of it."""
+    if files is not None:
+        return ds.dataset([str(f) for f in files], format="parquet", partitioning=PARTITIONING,
+                          partition_base_dir=str(root))
+    if root.is_dir():
+        return ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    return ds.dataset(root, format="parquet")   # legacy single file
+
+def filter_expr(data: ds.Dataset, since=None, until=None, skus=None, channels=None):
+    """Filter expression for inclusive date bounds and SKU/channel lists (None = no filter)."""
+    partitioned = "year_month" in data.schema.names
+    parts = []
+    if since is not None:
+        since = pd.Timestamp(since)
+        parts.append(ds.field("date") >= since.to_pydatetime())
+        if partitioned:
+            parts.append(ds.field("year_month") >= f"{since:%Y-%m}")
+    if until is not None:
+        until = pd.Timestamp(until)
+        parts.append(ds.field("date") <= until.to_pydatetime())
+        if partitioned:
+            parts.append(ds.field("year_month") <= f"{until:%Y-%m}")
+    if skus is not None:
+        skus = [str(s) for s in skus]
+        parts.append(ds.field("sku").isin(skus))
+        if partitioned:
+            parts.append(ds.field("sku_bucket").isin(np.unique(sku_buckets(skus)).tolist()))
+    if channels is not None:
+        parts.append(ds.field("channel").isin([str(c) for c in channels]))
+
+    expr = None
+    for p in parts:
+        expr = p if expr is None else expr & p
+    return expr
+
+def scan(root, columns=None, filter_fn=filter_expr, files=None, **filters):
+    """
+    (table, mapped): the columns of the rows of the dataset at root (or of its `files`)
+    that filter_fn(data, **filters) selects, read from the memory-mapped IPC mirror when
+    every file the filter can touch has a current one (mapped=True), otherwise from parquet.
+    """
+    data = dataset(root, files)
+    expr = filter_fn(data, **filters)
+    mirror = open_mirror(root, data, expr)
+    source = data if mirror is None else mirror
+    if columns is None:
+        columns = [c for c in source.schema.names if c not in STORE_PARTITION_COLS]
+    return source.to_table(columns=columns, filter=expr), mirror is not None
+
+@profiled()
+def read(root, artifact: str, since=None, until=None, skus=None, channels=None, columns=None,
+         files=None) -> pd.DataFrame:
+    """Rows of the dataset at root (or of its `files`), from its memory-mapped IPC mirror when that is current."""
+    table, mapped = scan(root, columns, files=files, since=since, until=until, skus=skus, channels=channels)
+    if mapped:
+        # split_blocks: numeric columns without nulls stay views of the mapped file
+        return schema.cast(table.to_pandas(split_blocks=True), artifact)
+    return schema.cast(table.to_pandas(), artifact)
+
+def read_forecast(since=None, until=None, skus=None, channels=None, columns=None) -> pd.DataFrame:
+    return read(FORECAST_FILE, "forecast", since, until, skus, channels, columns)
+
+def read_features(since=None, until=None, skus=None, channels=None, columns=None) -> pd.DataFrame:
+    return read(FEATURES_FILE, "features", since, until, skus, channels, columns)
+
+def date_bounds(root):
+    """(min date, max date) reading only the first and last month partitions."""
+    data = dataset(root)
+    if "year_month" not in data.schema.names:
+        dates = data.to_table(columns=["date"]).column("date").to_pandas()
+        return dates.min(), dates.max()
+    months = sorted({seg.split("=", 1)[1] for f in data.files for seg in f.split("/") if seg.startswith("year_month=")})
+    month = lambda data, value: ds.field("year_month") == value
+    lo = pc.min(scan(root, ["date"], month, value=months[0])[0].column("date"))
+    hi = pc.max(scan(root, ["date"], month, value=months[-1])[0].column("date"))
+    return pd.Timestamp(lo.as_py()), pd.Timestamp(hi.as_py())
+
+def distinct(root, columns) -> pd.DataFrame:
+    """Distinct values of a few (usually dictionary-encoded) columns."""
+    return dataset(root).to_table(columns=list(columns)).to_pandas().drop_duplicates().reset_index(drop=True)
+
+# -----------------------------
+# Arrow IPC mirrors: an uncompressed Arrow IPC (Feather v2) copy of a parquet artifact,
+# next to it as <name>.arrow, that readers memory-map instead of decoding parquet. A
+# partitioned dataset's mirror is a directory with one .arrow file per parquet file, at
+# the same relative path, so appends only write the new files and reads keep partition
+# pruning. Parquet stays the archive; a mirror file records a signature of the file it
+# was written from and is ignored as soon as that changes, so a missed update only
+# costs speed.
+# -----------------------------
+IPC_ENV = "BEVOPS_IPC"
+IPC_SOURCE_KEY = b"bevops.source"
+MMAP_FS = pafs.LocalFileSystem(use_mmap=True)
+
+def ipc_enabled() -> bool:
+    return os.environ.get(IPC_ENV, "1").strip().lower() not in ("0", "false", "no", "off")
+
+def ipc_path(path) -> Path:
+    return Path(path).with_suffix(".arrow")
+
+def source_signature(path) -> str:
+    """Names, sizes and mtimes of the parquet files of a dataset directory (or of one file)."""
+    path = Path(path)
+    if not path.exists():
+        return ""
+    files = sorted(path.rglob("*.parquet")) if path.is_dir() else [path]
+    h = hashlib.sha256()
+    for f in files:
+        stat = f.stat()
+        h.update(f"{f.relative_to(path) if path.is_dir() else f.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+def fragment_ipc_path(root, path) -> Path:
+    """Mirror of one parquet file of the dataset at root: same relative path under <root>.arrow/."""
+    root = Path(root)
+    return ipc_path(root) / Path(path).relative_to(root).with_suffix(".arrow")
+
+def is_current(path, mirror) -> bool:
+    """Whether the mirror file was written from path as it is now."""
+    if not mirror.is_file():
+        return False
+    with pa.memory_map(str(mirror), "r") as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return metadata.get(IPC_SOURCE_KEY) == source_signature(path).encode()
+
+def open_ipc(path):
+    """Memory-mapped mirror of the file at path as a pa.Table, or None when disabled, missing or stale."""
+    mirror = ipc_path(path)
+    if not (ipc_enabled() and is_current(path, mirror)):
+        return None
+    return pa.ipc.open_file(pa.memory_map(str(mirror), "r")).read_all()
+
+def open_mirror(root, data: ds.Dataset = None, filter=None):
+    """
+    Memory-mapped IPC dataset over the mirrors of the files of the dataset at root that
+    `filter` can select (partition pruning), or None when disabled or any of them is
+    missing or stale.
+    """
+    root = Path(root)
+    if not (ipc_enabled() and root.is_dir() and ipc_path(root).is_dir()):
+        return None
+    data = dataset(root) if data is None else data
+    files = [f.path for f in data.get_fragments(filter=filter)]
+    mirrors = [fragment_ipc_path(root, f) for f in files]
+    if not files or not all(is_current(f, m) for f, m in zip(files, mirrors)):
+        return None
+    return ds.dataset([str(m.absolute()) for m in mirrors], format="ipc", partitioning=PARTITIONING,
+                      partition_base_dir=str(ipc_path(root).absolute()), filesystem=MMAP_FS)
+
+def write_fragment_ipc(table: pa.Table, root, path):
+    """Mirror of one just-written parquet file of the dataset at root, holding its rows `table`."""
+    mirror_root = ipc_path(root)
+    if mirror_root.is_file():
+        mirror_root.unlink()   # single-file mirror from before per-file mirrors
+    return write_ipc(table, path, mirror=fragment_ipc_path(root, path))
+
+def write_ipc(df, path, artifact: str = None, mirror: Path = None):
+    """
+    Write the mirror of path, which must already be written: df (a DataFrame, cast to
+    `artifact` when given, or a pa.Table). mirror defaults to ipc_path(path). Returns
+    the mirror path, or None when disabled.
+    """
+    if not ipc_enabled():
+        return None
+    if isinstance(df, pa.Table):
+        table = df
+    else:
+        table = schema.to_table(df, artifact) if artifact else pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), IPC_SOURCE_KEY: source_signature(path).encode()}
+    # The IPC file format allows one dictionary per field, so chunks get a common one
+    table = table.replace_schema_metadata(metadata).unify_dictionaries()
+
+    mirror = ipc_path(path) if mirror is None else Path(mirror)
+    mirror.parent.mkdir(parents=True, exist_ok=True)
+    tmp = mirror.with_name(mirror.name + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, mirror)   # readers holding the old mapping keep their (unlinked) copy
+    return mirror
+
+def refresh_ipc(root):
+    """Mirror the parquet files of a dataset that have no current mirror (e.g. written with BEVOPS_IPC=0)."""
+    if not ipc_enabled():
+        return None
+    root = Path(root)
+    for path in sorted(root.rglob("*.parquet")):
+        if not is_current(path, fragment_ipc_path(root, path)):
+            write_fragment_ipc(ds.dataset(path, format="parquet").to_table(), root, path)
+    return ipc_path(root)
+
+def drop_ipc(path):
+    mirror = ipc_path(path)
+    if mirror.is_dir():
+        shutil.rmtree(mirror)
+    else:
+        mirror.unlink(missing_ok=True)
+
+def read_ipc(path) -> pd.DataFrame:
+    """Frame written with write_ipc next to path (e.g. a CSV export), or None when not current."""
+    table = open_ipc(path)
+    return None if table is None else table.to_pandas(split_blocks=True)
@@ -1,3 +1,4 @@
+import argparse
 import json
 from pathlib import Path
 
@@ -12,6 +13,20 @@ from sklearn.linear_model import Ridge
 from sklearn.metrics import mean_absolute_error
 import joblib
 
+from src import schema, store
+from src.profiling import profiled
+from src.scorer import (
+    LOCAL_MODELS_FILE,
+    SCORER_FILE,
+    LinearScorer,
+    LocalLinearScorer,
+    assert_parity,
+    export_linear_scorer,
+    export_local_models,
+    series_keys,
+)
+from src.utils import file_digest
+
 PROCESSED = Path("data/processed")
 FEATURES_FILE = PROCESSED / "features.parquet"
 
@@ -22,6 +37,40 @@ MODEL_FILE = MODELS_DIR / "model.pkl"
 META_FILE = MODELS_DIR / "metadata.json"
 
 TARGET = "target_units_next_day"
+SPLIT_DATE = "2025-07-01"
+RIDGE_ALPHA = 1.0
+
+# Define features
+NUMERIC_FEATURES = [
+    "price",
+    "promo_flag",
+    "dayofweek",
+    "month",
+    "weekofyear",
+    "is_weekend",
+    "units_lag_1",
+    "units_lag_7",
+    "units_lag_14",
+    "units_roll7_mean",
+    "units_roll14_mean",
+    "price_lag_1",
+    "price_lag_7",
+    "price_lag_14",
+    "promo_lag_1",
+    "promo_lag_7",
+    "promo_lag_14",
+]
+CATEGORICAL_FEATURES = ["sku", "channel"]
+
+# Local (per-series) models: Ridge on the numeric features for series with enough history
+LOCAL_ALPHA = 1.0
+LOCAL_MIN_ROWS = 60
+LOCAL_CHUNK_ROWS = 50_000   # rows per outer-product block when accumulating X^T X
+
+# Streaming (out-of-core) training: rows per batch read from the features dataset, and
+# histogram bins used to locate exact medians without holding a column in memory
+STREAM_BATCH_ROWS = 250_000
+MEDIAN_BINS = 4096
 
 def wape(y_true, y_pred) -> float:
     denom = np.sum(np.abs(y_true))
@@ -29,7 +78,7 @@ def wape(y_true, y_pred) -> float:
         return float("nan")
     return float(np.sum(np.abs(y_true - y_pred)) / denom)
 
-def time_split(df: pd.DataFrame, split_date: str = "2025-07-01"):
+def time_split(df: pd.DataFrame, split_date: str = SPLIT_DATE):
     """
     Train on dates < split_date, validate on dates >= split_date.
     You can move this split later once you want a bigger train set.
@@ -46,45 +95,9 @@ def baseline_naive(valid: pd.DataFrame) -> np.ndarray:
     """
     return valid["units_lag_1"].to_numpy()
 
-def main():
-    df = pd.read_parquet(FEATURES_FILE)
-
-    # Safety: ensure date type and sorted
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values(["sku", "channel", "date"]).reset_index(drop=True)
-
-    # Split
-    train_df, valid_df = time_split(df, split_date="2025-07-01")
-    if len(train_df) == 0 or len(valid_df) == 0:
-        raise ValueError("Time split produced empty train or valid set. Adjust split_date.")
-
-    # Define features
-    numeric_features = [
-        "price",
-        "promo_flag",
-        "dayofweek",
-        "month",
-        "weekofyear",
-        "is_weekend",
-        "units_lag_1",
-        "units_lag_7",
-        "units_lag_14",
-        "units_roll7_mean",
-        "units_roll14_mean",
-        "price_lag_1",
-        "price_lag_7",
-        "price_lag_14",
-        "promo_lag_1",
-        "promo_lag_7",
-        "promo_lag_14",
-    ]
-    categorical_features = ["sku", "channel"]
-
-    X_train = train_df[numeric_features + categorical_features]
-    y_train = train_df[TARGET].to_numpy()
-
-    X_valid = valid_df[numeric_features + categorical_features]
-    y_valid = valid_df[TARGET].to_numpy()
+def build_pipeline(numeric_features=None, categorical_features=None) -> Pipeline:
+    numeric_features = numeric_features or NUMERIC_FEATURES
+    categorical_features = categorical_features or CATEGORICAL_FEATURES
 
     # Preprocess: impute + one-hot encode categoricals
     preprocessor = ColumnTransformer(
@@ -100,13 +113,36 @@ def main():
     )
 
     # Model: Ridge regression (strong baseline, fast, stable)
-    model = Ridge(alpha=1.0, random_state=42)
+    model = Ridge(alpha=RIDGE_ALPHA, random_state=42)
 
-    pipe = Pipeline(steps=[
+    return Pipeline(steps=[
         ("prep", preprocessor),
         ("model", model)
     ])
 
+@profiled()
+def fit(df: pd.DataFrame, split_date: str = SPLIT_DATE):
+    """
+    Fit the Ridge pipeline on the time split and evaluate it against the naive baseline.
+    Returns (pipe, meta, X_valid).
+    """
+    # Safety: ensure date type and sorted
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values(["sku", "channel", "date"]).reset_index(drop=True)
+
+    # Split
+    train_df, valid_df = time_split(df, split_date=split_date)
+    if len(train_df) == 0 or len(valid_df) == 0:
+        raise ValueError("Time split produced empty train or valid set. Adjust split_date.")
+
+    X_train = train_df[NUMERIC_FEATURES + CATEGORICAL_FEATURES]
+    y_train = train_df[TARGET].to_numpy()
+
+    X_valid = valid_df[NUMERIC_FEATURES + CATEGORICAL_FEATURES]
+    y_valid = valid_df[TARGET].to_numpy()
+
+    pipe = build_pipeline()
     pipe.fit(X_train, y_train)
 
     # Baseline metrics
@@ -124,12 +160,9 @@ def main():
     print(f"Baseline (yesterday): MAE={base_mae:.3f} | WAPE={base_wape:.3f}")
     print(f"Ridge model        : MAE={model_mae:.3f} | WAPE={model_wape:.3f}")
 
-    # Save model + metadata
-    joblib.dump(pipe, MODEL_FILE)
-
     meta = {
         "target": TARGET,
-        "split_date": "2025-07-01",
+        "split_date": split_date,
         "train_rows": int(len(train_df)),
         "valid_rows": int(len(valid_df)),
         "metrics": {
@@ -137,16 +170,379 @@ def main():
             "ridge": {"mae": float(model_mae), "wape": float(model_wape)},
         },
         "features": {
-            "numeric": numeric_features,
-            "categorical": categorical_features,
+            "numeric": NUMERIC_FEATURES,
+            "categorical": CATEGORICAL_FEATURES,
+        },
+    }
+    return pipe, meta, X_valid
+
+def fit_local_models(X: np.ndarray, y: np.ndarray, codes: np.ndarray, n_series: int,
+                     alpha: float = LOCAL_ALPHA, min_rows: int = LOCAL_MIN_ROWS):
+    """
+    Ridge per series from segmented normal equations, solved for all series at once.
+
+    Rows are grouped by series code; per-series means are removed (the intercept is not
+    penalized, as in sklearn's Ridge), X^T X and X^T y are accumulated block by block with
+    reduceat over segment starts, and every (X^T X + alpha I) w = X^T y system is solved in
+    one batched np.linalg.solve. Series with fewer than min_rows rows get no local model.
+    Returns (fitted, coef, intercept) indexed by series code.
+    """
+    order = np.argsort(codes, kind="stable")
+    X, y, codes = X[order], y[order], codes[order]
+    n_rows, p = X.shape
+
+    counts = np.bincount(codes, minlength=n_series)
+    present = np.flatnonzero(counts)
+    starts = np.concatenate([[0], np.cumsum(counts[present])[:-1]])
+    seg = np.repeat(np.arange(len(present)), counts[present])
+
+    mean_x = np.add.reduceat(X, starts, axis=0) / counts[present, None]
+    mean_y = np.add.reduceat(y, starts) / counts[present]
+    Xc = X - mean_x[seg]
+    yc = y - mean_y[seg]
+
+    xtx = np.zeros((len(present), p, p))
+    xty = np.zeros((len(present), p))
+    for lo in range(0, n_rows, LOCAL_CHUNK_ROWS):
+        hi = min(lo + LOCAL_CHUNK_ROWS, n_rows)
+        s = seg[lo:hi]
+        block_starts = np.flatnonzero(np.r_[True, s[1:] != s[:-1]])
+        block_seg = s[block_starts]
+        # Segments split across blocks are summed into the same accumulator row
+        np.add.at(xtx, block_seg, np.add.reduceat(np.einsum("ni,nj->nij", Xc[lo:hi], Xc[lo:hi]), block_starts, axis=0))
+        np.add.at(xty, block_seg, np.add.reduceat(Xc[lo:hi] * yc[lo:hi, None], block_starts, axis=0))
+
+    fitted = np.zeros(n_series, dtype=bool)
+    coef = np.zeros((n_series, p))
+    intercept = np.zeros(n_series)
+
+    ok = counts[present] >= min_rows
+    if ok.any():
+        A = xtx[ok] + alpha * np.eye(p)
+        w = np.linalg.solve(A, xty[ok][..., None])[..., 0]
+        sid = present[ok]
+        fitted[sid] = True
+        coef[sid] = w
+        intercept[sid] = mean_y[ok] - np.einsum("ij,ij->i", mean_x[ok], w)
+    return fitted, coef, intercept
+
+@profiled()
+def fit_local(df: pd.DataFrame, pipe: Pipeline, split_date: str = SPLIT_DATE,
+              alpha: float = LOCAL_ALPHA, min_rows: int = LOCAL_MIN_ROWS):
+    """
+    Fit local models on the same time split as the global pipeline and compare them on
+    the validation rows (global fallback for series without a local model).
+    Returns (arrays for export_local_models, meta).
+    """
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    train_df, valid_df = time_split(df, split_date=split_date)
+
+    medians = pipe.named_steps["prep"].named_transformers_["num"].named_steps["imputer"].statistics_
+    keys_train = series_keys(train_df["sku"], train_df["channel"])
+    keys, codes = np.unique(keys_train, return_inverse=True)
+
+    X = train_df[NUMERIC_FEATURES].to_numpy(dtype=np.float64)
+    X = np.where(np.isnan(X), medians, X)
+    fitted, coef, intercept = fit_local_models(X, train_df[TARGET].to_numpy(dtype=np.float64), codes, len(keys),
+                                               alpha=alpha, min_rows=min_rows)
+    arrays = {
+        "numeric": NUMERIC_FEATURES,
+        "medians": medians,
+        "keys": keys[fitted],
+        "coef": coef[fitted],
+        "intercept": intercept[fitted],
+        "alpha": alpha,
+        "min_rows": min_rows,
+    }
+
+    # Validation: local where fitted, global elsewhere
+    X_valid = valid_df[NUMERIC_FEATURES + CATEGORICAL_FEATURES]
+    y_valid = valid_df[TARGET].to_numpy()
+    y_global = pipe.predict(X_valid)
+    local = LocalLinearScorer(pipe, NUMERIC_FEATURES, medians, arrays["keys"], arrays["coef"], arrays["intercept"])
+    y_local = local.predict(X_valid)
+
+    meta = {
+        "file": LOCAL_MODELS_FILE.name,
+        "alpha": alpha,
+        "min_rows": min_rows,
+        "series_local": int(fitted.sum()),
+        "series_fallback": int((~fitted).sum()),
+        "metrics": {
+            "global": {"mae": float(mean_absolute_error(y_valid, y_global)), "wape": wape(y_valid, y_global)},
+            "local": {"mae": float(mean_absolute_error(y_valid, y_local)), "wape": wape(y_valid, y_local)},
+        },
+    }
+    m = meta["metrics"]
+    print(f"Local models       : MAE={m['local']['mae']:.3f} | WAPE={m['local']['wape']:.3f} "
+          f"({meta['series_local']} local, {meta['series_fallback']} global fallback)")
+    return arrays, meta
+
+def save_local_models(arrays: dict):
+    """Export local models tied to the current model.pkl (predict ignores them after a plain retrain)."""
+    export_local_models(LOCAL_MODELS_FILE, model_digest=file_digest(MODEL_FILE), **arrays)
+    print(f"Saved local models to: {LOCAL_MODELS_FILE}")
+
+@profiled()
+def save_model(pipe: Pipeline, meta: dict, X_valid: pd.DataFrame):
+    # Save model + compact scorer (checked against the pipeline on the validation rows)
+    joblib.dump(pipe, MODEL_FILE)
+    export_linear_scorer(pipe, SCORER_FILE, model_digest=file_digest(MODEL_FILE))
+    parity = assert_parity(pipe, LinearScorer.load(SCORER_FILE), X_valid)
+
+    meta = {**meta, "scorer": {"file": SCORER_FILE.name, "max_abs_diff_valid": parity}}
+    with open(META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"\nSaved model to: {MODEL_FILE}")
+    print(f"Saved compact scorer to: {SCORER_FILE} (max abs diff vs pipeline: {parity:.2e})")
+    print(f"Saved metadata to: {META_FILE}")
+
+# -----------------------------
+# Streaming training (train --streaming): the same prep + Ridge model fitted from
+# sufficient statistics, reading the features dataset one batch at a time
+# -----------------------------
+def iter_feature_batches(columns, split_date: str = SPLIT_DATE, train: bool = True, path=None):
+    """Yield pandas batches of the train (date < split_date) or valid rows, filter pushed down to parquet."""
+    split = pd.Timestamp(split_date)
+    dataset = store.dataset(path or FEATURES_FILE)
+    bounds = {"until": split - pd.Timedelta(days=1)} if train else {"since": split}
+    flt = store.filter_expr(dataset, **bounds)
+    for batch in dataset.to_batches(columns=columns, filter=flt, batch_size=STREAM_BATCH_ROWS):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def _numeric_block(batch: pd.DataFrame) -> np.ndarray:
+    return np.column_stack([batch[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in NUMERIC_FEATURES])
+
+def _bin_index(values: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    if hi <= lo:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.minimum(((values - lo) / (hi - lo) * MEDIAN_BINS).astype(np.int64), MEDIAN_BINS - 1)
+
+@profiled()
+def streaming_prep_stats(split_date: str = SPLIT_DATE) -> dict:
+    """
+    Fit the imputers and the one-hot vocabularies on the training rows in three passes:
+    counts/min/max/sums and category counts; a fixed-bin histogram per numeric column;
+    and the distinct values inside the bins holding the middle ranks. Medians are exact
+    (np.median semantics) with memory bounded by bins + distinct values near the median.
+    """
+    q = len(NUMERIC_FEATURES)
+    n_rows, y_sum = 0, 0.0
+    count, total = np.zeros(q, dtype=np.int64), np.zeros(q)
+    lo, hi = np.full(q, np.inf), np.full(q, -np.inf)
+    cat_counts = {c: pd.Series(dtype="int64") for c in CATEGORICAL_FEATURES}
+
+    for batch in iter_feature_batches(NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TARGET], split_date):
+        M = _numeric_block(batch)
+        ok = ~np.isnan(M)
+        n_rows += len(batch)
+        y_sum += float(batch[TARGET].sum())
+        count += ok.sum(axis=0)
+        total += np.where(ok, M, 0.0).sum(axis=0)
+        with np.errstate(invalid="ignore"):
+            lo = np.fmin(lo, np.nanmin(M, axis=0))
+            hi = np.fmax(hi, np.nanmax(M, axis=0))
+        for c in CATEGORICAL_FEATURES:
+            vc = batch[c].value_counts()
+            vc = vc[vc > 0]  # dictionary-encoded batches also list unused categories
+            cat_counts[c] = cat_counts[c].add(vc.set_axis(vc.index.astype(str)), fill_value=0)
+
+    if n_rows == 0:
+        raise ValueError("Time split produced empty train set. Adjust split_date.")
+
+    # Pass 2: histograms locate the bins holding the middle order statistics
+    hist = np.zeros((q, MEDIAN_BINS), dtype=np.int64)
+    for batch in iter_feature_batches(NUMERIC_FEATURES, split_date):
+        M = _numeric_block(batch)
+        for j in range(q):
+            v = M[:, j][~np.isnan(M[:, j])]
+            hist[j] += np.bincount(_bin_index(v, lo[j], hi[j]), minlength=MEDIAN_BINS)
+
+    ranks = np.stack([(count - 1) // 2, count // 2], axis=1)
+    cum = np.cumsum(hist, axis=1)
+    bins = np.stack([np.searchsorted(cum[j], ranks[j], side="right") for j in range(q)])
+
+    # Pass 3: distinct values (with counts) inside those bins
+    near = [pd.Series(dtype="int64") for _ in range(q)]
+    for batch in iter_feature_batches(NUMERIC_FEATURES, split_date):
+        M = _numeric_block(batch)
+        for j in range(q):
+            v = M[:, j][~np.isnan(M[:, j])]
+            b = _bin_index(v, lo[j], hi[j])
+            v = v[(b >= bins[j, 0]) & (b <= bins[j, 1])]
+            if len(v):
+                near[j] = near[j].add(pd.Series(v).value_counts(), fill_value=0)
+
+    medians = np.full(q, np.nan)
+    for j in range(q):
+        if count[j] == 0:
+            continue
+        values = near[j].sort_index()
+        below = cum[j, bins[j, 0] - 1] if bins[j, 0] > 0 else 0
+        pos = np.cumsum(values.to_numpy()) + below
+        idx = np.searchsorted(pos, ranks[j], side="right")
+        medians[j] = values.index.to_numpy()[idx].mean()
+
+    # most_frequent: highest count, ties to the smallest value (SimpleImputer behaviour)
+    cat_fill = [str(cat_counts[c].sort_index().idxmax()) for c in CATEGORICAL_FEATURES]
+    vocabs = [np.array(sorted(cat_counts[c].index), dtype=str) for c in CATEGORICAL_FEATURES]
+    # Rough column means, used as a shift so the moment sums do not lose precision
+    shift = np.where(count > 0, total / np.maximum(count, 1), 0.0)
+    return {
+        "rows": n_rows, "y_shift": y_sum / n_rows, "medians": medians, "shift": np.nan_to_num(shift),
+        "cat_fill": cat_fill, "vocabs": vocabs,
+    }
+
+@profiled()
+def fit_streaming(split_date: str = SPLIT_DATE, alpha: float = RIDGE_ALPHA):
+    """
+    Out-of-core version of fit(): accumulate the normal equations of the imputed + one-hot
+    design one batch at a time and solve the intercept-centred Ridge system exactly.
+    The one-hot blocks are never materialised: their cross products are bincounts.
+    Validation metrics come from a second streaming pass. Returns (scorer, meta).
+    """
+    stats = streaming_prep_stats(split_date)
+    medians, shift, vocabs = stats["medians"], stats["shift"], stats["vocabs"]
+    q = len(NUMERIC_FEATURES)
+    sizes = [len(v) for v in vocabs]
+    offsets = np.cumsum([q] + sizes)[:-1]
+    p = q + sum(sizes)
+
+    A = np.zeros((p, p))   # X^T X of the shifted design
+    g = np.zeros(p)        # X^T y
+    s = np.zeros(p)        # column sums
+    n, sy = 0, 0.0
+
+    for batch in iter_feature_batches(NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TARGET], split_date):
+        Z = _numeric_block(batch)
+        Z = np.where(np.isnan(Z), medians, Z) - shift
+        y = batch[TARGET].to_numpy(dtype=np.float64) - stats["y_shift"]
+        idx = [
+            np.searchsorted(vocab, batch[c].astype(object).fillna(fill).to_numpy(dtype=str))
+            for c, vocab, fill in zip(CATEGORICAL_FEATURES, vocabs, stats["cat_fill"])
+        ]
+
+        n += len(batch)
+        sy += y.sum()
+        A[:q, :q] += Z.T @ Z
+        g[:q] += Z.T @ y
+        s[:q] += Z.sum(axis=0)
+        for k, (ik, ok, vk) in enumerate(zip(idx, offsets, sizes)):
+            A[ok:ok + vk, :q] += np.column_stack([np.bincount(ik, weights=Z[:, j], minlength=vk) for j in range(q)])
+            g[ok:ok + vk] += np.bincount(ik, weights=y, minlength=vk)
+            s[ok:ok + vk] += np.bincount(ik, minlength=vk)
+            for il, ol, vl in zip(idx[k + 1:], offsets[k + 1:], sizes[k + 1:]):
+                A[ok:ok + vk, ol:ol + vl] += np.bincount(ik * vl + il, minlength=vk * vl).reshape(vk, vl)
+
+    # Mirror the blocks accumulated on one side; one-hot self blocks are diagonal counts
+    for ok, vk in zip(offsets, sizes):
+        A[:q, ok:ok + vk] = A[ok:ok + vk, :q].T
+        A[ok:ok + vk, ok:ok + vk] = np.diag(s[ok:ok + vk])
+    for k, (ok, vk) in enumerate(zip(offsets, sizes)):
+        for ol, vl in zip(offsets[k + 1:], sizes[k + 1:]):
+            A[ol:ol + vl, ok:ok + vk] = A[ok:ok + vk, ol:ol + vl].T
+
+    mean_x, mean_y = s / n, sy / n
+    xtx = A - n * np.outer(mean_x, mean_x)
+    xty = g - n * mean_x * mean_y
+    w = np.linalg.solve(xtx + alpha * np.eye(p), xty)
+    intercept = (stats["y_shift"] + mean_y) - (mean_x + np.r_[shift, np.zeros(p - q)]) @ w
+
+    scorer = LinearScorer(
+        numeric=NUMERIC_FEATURES,
+        medians=medians,
+        coef_numeric=w[:q],
+        categorical=CATEGORICAL_FEATURES,
+        cat_fill=stats["cat_fill"],
+        vocabs=vocabs,
+        coef_cats=[w[o:o + v] for o, v in zip(offsets, sizes)],
+        intercept=intercept,
+    )
+
+    # Second pass: validation metrics from running sums
+    sums = {"rows": 0, "actual": 0.0, "baseline": 0.0, "ridge": 0.0}
+    for batch in iter_feature_batches(NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TARGET], split_date, train=False):
+        y = batch[TARGET].to_numpy(dtype=np.float64)
+        sums["rows"] += len(y)
+        sums["actual"] += np.abs(y).sum()
+        sums["baseline"] += np.abs(y - baseline_naive(batch)).sum()
+        sums["ridge"] += np.abs(y - scorer.predict(batch)).sum()
+    if sums["rows"] == 0:
+        raise ValueError("Time split produced empty valid set. Adjust split_date.")
+
+    metrics = {
+        name: {
+            "mae": float(sums[name] / sums["rows"]),
+            "wape": float(sums[name] / sums["actual"]) if sums["actual"] else float("nan"),
         }
+        for name in ("baseline", "ridge")
+    }
+    print("=== Validation Metrics (Time Split, streaming) ===")
+    print(f"Train rows: {n} | Valid rows: {sums['rows']}")
+    print(f"Baseline (yesterday): MAE={metrics['baseline']['mae']:.3f} | WAPE={metrics['baseline']['wape']:.3f}")
+    print(f"Ridge model        : MAE={metrics['ridge']['mae']:.3f} | WAPE={metrics['ridge']['wape']:.3f}")
+
+    meta = {
+        "target": TARGET,
+        "split_date": split_date,
+        "train_rows": int(n),
+        "valid_rows": int(sums["rows"]),
+        "metrics": metrics,
+        "features": {
+            "numeric": NUMERIC_FEATURES,
+            "categorical": CATEGORICAL_FEATURES,
+        },
+        "training": "streaming",
     }
+    return scorer, meta
 
+def save_streaming_model(scorer: LinearScorer, meta: dict):
+    # model.pkl holds the scorer itself (there is no sklearn pipeline on this path)
+    joblib.dump(scorer, MODEL_FILE)
+    scorer.model_digest = file_digest(MODEL_FILE)
+    scorer.save(SCORER_FILE)
+
+    meta = {**meta, "scorer": {"file": SCORER_FILE.name, "max_abs_diff_valid": 0.0}}
     with open(META_FILE, "w", encoding="utf-8") as f:
         json.dump(meta, f, indent=2)
 
     print(f"\nSaved model to: {MODEL_FILE}")
+    print(f"Saved compact scorer to: {SCORER_FILE}")
     print(f"Saved metadata to: {META_FILE}")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the forecasting model.")
+    parser.add_argument("--local", action="store_true",
+                        help="Also fit per-series local Ridge models (global model as fallback)")
+    parser.add_argument("--local-min-rows", type=int, default=LOCAL_MIN_ROWS,
+                        help="Training rows a series needs for its own model")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Fit from sufficient statistics, one feature batch at a time (memory independent of rows)")
+    args = parser.parse_args(argv)
+    if args.streaming and args.local:
+        parser.error("--local needs the in-memory path; drop --streaming")
+    return args
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+    if args.streaming:
+        save_streaming_model(*fit_streaming())
+        return
+
+    df = store.read_features()
+    pipe, meta, X_valid = fit(df)
+
+    local = None
+    if args.local:
+        local, meta["local_models"] = fit_local(df, pipe, min_rows=args.local_min_rows)
+
+    save_model(pipe, meta, X_valid)
+    if local is not None:
+        save_local_models(local)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,292 @@
+import argparse
+import itertools
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import store
+from src.decision import (ACTIVE_POLICY_FILE, LOOKBACK_DAYS, POLICY, POLICY_DIR, compute_metrics, load_policy,
+                          policy_file)
+from src.features import SALES_COLUMNS, load_clean_sales, state_rows
+from src.predict import forecast_horizon, load_model
+from src.profiling import profiled
+from src.reorder import (LEAD_TIME_DAYS, SERVICE_LEVEL_Z, apply_error_quantiles, lead_time_demand,
+                         lead_time_error_quantiles, order_quantity, simulated_inventory)
+from src.sketch import ResidualSketch, window_sums
+
+PROCESSED = Path("data/processed")
+FORECAST_FILE = PROCESSED / "forecast.parquet"
+PRODUCTS_FILE = Path("data/raw/products.csv")
+FRONTIER_FILE = PROCESSED / "policy_frontier.csv"
+
+# Candidate values per knob; every combination is scored (min_history_days stays as in POLICY)
+POLICY_GRID = {
+    "high_wape_threshold": np.round(np.linspace(0.10, 0.50, 9), 3),
+    "volatility_cv_threshold": np.round(np.linspace(0.15, 0.75, 9), 3),
+    "regime_change_z": np.array([1.5, 2.0, 2.5, 3.0, 3.5, 4.0]),
+    "buffer_low_conf": np.array([0.0, 0.05, 0.10, 0.15, 0.20, 0.25, 0.30, 0.40]),
+    "buffer_high_conf": np.array([0.0, 0.05, 0.10, 0.15, 0.20]),
+}
+
+DEFAULT_ORIGINS = 26
+DEFAULT_STEP_DAYS = 7
+# Combinations x samples evaluated per broadcast block
+BLOCK_CELLS = 4_000_000
+
+# -----------------------------
+# Samples: one row per (decision date, series), diagnostics computed once
+# -----------------------------
+@profiled()
+def build_samples(df: pd.DataFrame, n_origins: int, step_days: int, lead_time: int = LEAD_TIME_DAYS,
+                  windows: pd.DataFrame = None, model=None, sales: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Replay decision dates every step_days back from the last date that still has
+    lead_time days of realized demand after it. Per (origin, series): the decision.py
+    diagnostics over the LOOKBACK_DAYS window, the reorder.py plan (cover quantity =
+    lead-time demand + safety stock, the placeholder inventory on hand, and the order
+    up to the cover with the minimum order quantity) and the demand realized over the
+    lead time.
+
+    windows: rolling lead_time-day residual sums (sketch.window_sums) over the whole
+    history. The safety stock then comes, as in reorder.py, from a sketch of the
+    windows known on each decision date; without them it is z * abs_error * sqrt(L).
+
+    model, sales: the scoring model and the clean sales. The lead-time demand is then,
+    as in reorder.py, the multi-horizon forecast made from the sales known on each
+    decision date, summed over the lead time; without them it is reorder.py's fallback,
+    the flat next-day prediction * lead_time.
+    """
+    df = df.sort_values(["sku", "channel", "date"]).reset_index(drop=True)
+    if sales is not None:
+        sales = sales[SALES_COLUMNS].sort_values(["sku", "channel", "date"]).reset_index(drop=True)
+    last_origin = df["date"].max() - pd.Timedelta(days=lead_time - 1)
+    origins = [last_origin - pd.Timedelta(days=step_days * k) for k in range(n_origins)][::-1]
+    if windows is not None:
+        windows = windows.sort_values("date", kind="stable").reset_index(drop=True)
+        window_end = windows["date"].to_numpy()
+        sketch = ResidualSketch.empty(window=lead_time)
+        added = 0
+
+    samples = []
+    for origin in origins:
+        window = df[(df["date"] >= origin - pd.Timedelta(days=LOOKBACK_DAYS)) & (df["date"] <= origin)]
+        if len(window) == 0:
+            continue
+        metrics = compute_metrics(window)
+
+        today = df[df["date"] == origin][["sku", "channel", "prediction"]]
+        # Latest known error on the decision date is the previous day's (as in simulate.py)
+        prev = df[df["date"] == origin - pd.Timedelta(days=1)][["sku", "channel", "abs_error"]]
+        ahead = df[(df["date"] >= origin) & (df["date"] < origin + pd.Timedelta(days=lead_time))]
+        realized = ahead.groupby(["sku", "channel"], observed=True).agg(
+            realized=("target_units_next_day", "sum"), days=("date", "count")
+        ).reset_index()
+        realized = realized[realized["days"] == lead_time].drop(columns="days")
+
+        s = today.merge(prev, on=["sku", "channel"], how="left").merge(realized, on=["sku", "channel"])
+        s = s.astype({"sku": "str", "channel": "str"}).sort_values(["sku", "channel"]).reset_index(drop=True)
+        std = s["abs_error"].astype(np.float64).fillna(1).clip(lower=1)
+        s["safety_stock"] = SERVICE_LEVEL_Z * std * np.sqrt(lead_time)
+        if windows is not None:
+            # Windows whose residuals are all known on the origin (the origin's own is not)
+            known = int(np.searchsorted(window_end, origin.to_datetime64(), side="left"))
+            new = windows.iloc[added:known]
+            sketch.add(new["sku"], new["channel"], new["residual"])
+            added = max(added, known)
+            s = apply_error_quantiles(s, lead_time_error_quantiles(sketch, lead_time))
+        horizon = None
+        if model is not None:
+            known = sales[sales["date"] <= origin].groupby(["sku", "channel"], sort=False, observed=True).tail(state_rows())
+            horizon = forecast_horizon(model, known, lead_time)
+        s["lead_time_demand"] = lead_time_demand(s, horizon, lead_time)
+        s["cover_qty"] = s["lead_time_demand"] + s["safety_stock"]
+        s["inventory_on_hand"] = simulated_inventory(len(s))
+        s["reorder_qty"] = order_quantity(s["cover_qty"], s["inventory_on_hand"])
+        s = s.merge(metrics, on=["sku", "channel"], how="left")
+        samples.append(s.assign(origin=origin))
+
+    out = pd.concat(samples, ignore_index=True)
+    return out.astype({"sku": "str", "channel": "str"})
+
+def attach_costs(samples: pd.DataFrame, products: pd.DataFrame) -> pd.DataFrame:
+    """Ordered units left unsold cost unit_cost each; unmet demand loses the margin base_price - unit_cost."""
+    costs = products[["sku", "base_price", "unit_cost"]].astype({"sku": "str"})
+    out = samples.merge(costs, on="sku", how="left")
+    out["over_cost"] = out["unit_cost"]
+    out["under_cost"] = (out["base_price"] - out["unit_cost"]).clip(lower=0)
+    return out
+
+# -----------------------------
+# Grid evaluation: (combinations x samples) blocks
+# -----------------------------
+def policy_grid(grid: dict = POLICY_GRID) -> pd.DataFrame:
+    return pd.DataFrame(list(itertools.product(*grid.values())), columns=list(grid))
+
+@profiled()
+def evaluate(samples: pd.DataFrame, combos: pd.DataFrame, min_history_days: int = POLICY["min_history_days"]) -> pd.DataFrame:
+    """
+    Over- and under-order cost of every combination, with the decision.apply_policy rules
+    as broadcast comparisons: a sample is low confidence when any threshold trips, and the
+    ordered quantity is round(reorder_qty * (1 + buffer)), as in decision's
+    reorder_qty_adjusted. Stock over the lead time is inventory on hand plus that order;
+    over-order counts only ordered units left over, under-order the demand it misses.
+    """
+    history = samples["history_days"].to_numpy(dtype=np.float64)
+    low_history = np.isnan(history) | (history < min_history_days)
+    wape = samples["wape_28d"].to_numpy(dtype=np.float64)
+    cv = samples["demand_cv_28d"].to_numpy(dtype=np.float64)
+    abs_z = np.abs(samples["regime_z"].to_numpy(dtype=np.float64))
+    reorder = samples["reorder_qty"].to_numpy(dtype=np.float64)
+    inventory = samples["inventory_on_hand"].to_numpy(dtype=np.float64)
+    realized = samples["realized"].to_numpy(dtype=np.float64)
+    over_cost = samples["over_cost"].to_numpy(dtype=np.float64)
+    under_cost = samples["under_cost"].to_numpy(dtype=np.float64)
+
+    c = {k: combos[k].to_numpy(dtype=np.float64)[:, None] for k in POLICY_GRID}
+    over = np.empty(len(combos))
+    under = np.empty(len(combos))
+    low_share = np.empty(len(combos))
+
+    block = max(1, BLOCK_CELLS // max(len(samples), 1))
+    for lo in range(0, len(combos), block):
+        sl = slice(lo, lo + block)
+        # NaN diagnostics never trip a threshold (comparisons with NaN are False)
+        low = (
+            low_history
+            | (wape >= c["high_wape_threshold"][sl])
+            | (cv >= c["volatility_cv_threshold"][sl])
+            | (abs_z >= c["regime_change_z"][sl])
+        )
+        qty = np.round(reorder * (1.0 + np.where(low, c["buffer_low_conf"][sl], c["buffer_high_conf"][sl])))
+        gap = inventory + qty - realized
+        over[sl] = (np.minimum(np.maximum(gap, 0), qty) * over_cost).sum(axis=1)
+        under[sl] = (np.maximum(-gap, 0) * under_cost).sum(axis=1)
+        low_share[sl] = low.mean(axis=1)
+
+    out = combos.copy()
+    out["over_cost"] = over
+    out["under_cost"] = under
+    out["total_cost"] = over + under
+    out["low_conf_share"] = low_share
+    return out
+
+def pareto_frontier(scores: pd.DataFrame) -> pd.DataFrame:
+    """Combinations no other combination beats on both over- and under-order cost."""
+    s = scores.sort_values(["over_cost", "under_cost"], kind="stable")
+    under = s["under_cost"].to_numpy()
+    best_before = np.r_[np.inf, np.minimum.accumulate(under)[:-1]]
+    return s[under < best_before].reset_index(drop=True)
+
+def choose_policy(scores: pd.DataFrame, current: dict) -> pd.Series:
+    """
+    Lowest total cost. Among equal costs, the combination closest to `current` (knob
+    differences scaled by their grid range), so the current policy stays when it ties.
+    """
+    best = scores[np.isclose(scores["total_cost"], scores["total_cost"].min(), rtol=1e-12, atol=0)]
+    distance = sum((best[k] - current[k]).abs() / max(np.ptp(POLICY_GRID[k]), 1e-12) for k in POLICY_GRID)
+    return best.loc[distance.idxmin()]
+
+# -----------------------------
+# Versioned policy files (read by decision.load_policy)
+# -----------------------------
+def next_policy_path() -> Path:
+    versions = [int(p.stem.split("_v")[1]) for p in POLICY_DIR.glob("policy_v*.json")]
+    return policy_file(max(versions, default=0) + 1)
+
+def save_policy(chosen: pd.Series, baseline: pd.Series, search: dict) -> Path:
+    path = next_policy_path()
+    POLICY_DIR.mkdir(parents=True, exist_ok=True)
+    policy = {**POLICY, **{k: float(chosen[k]) for k in POLICY_GRID}}
+    record = {
+        "version": int(path.stem.split("_v")[1]),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "policy": policy,
+        "scores": {k: float(chosen[k]) for k in ["over_cost", "under_cost", "total_cost", "low_conf_share"]},
+        "baseline_scores": {k: float(baseline[k]) for k in ["over_cost", "under_cost", "total_cost", "low_conf_share"]},
+        "search": search,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    return path
+
+def promote(version: int):
+    """Make decision use policy_v<version>.json (0: back to the decision.POLICY defaults)."""
+    if version == 0:
+        ACTIVE_POLICY_FILE.unlink(missing_ok=True)
+        return None
+    path = policy_file(version)
+    if not path.exists():
+        raise FileNotFoundError(f"No policy version {version} ({path}).")
+    record = {"version": version, "promoted_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    with open(ACTIVE_POLICY_FILE, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    return path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Grid-search decision.POLICY thresholds and buffers on the forecast history.")
+    parser.add_argument("--origins", type=int, default=DEFAULT_ORIGINS, help="Decision dates replayed")
+    parser.add_argument("--step-days", type=int, default=DEFAULT_STEP_DAYS, help="Days between decision dates")
+    parser.add_argument("--dry-run", action="store_true", help="Report the frontier without writing a policy version")
+    parser.add_argument("--apply", action="store_true",
+                        help="Promote the policy version this run writes (decision only uses promoted versions)")
+    parser.add_argument("--promote", type=int, default=None, metavar="VERSION",
+                        help="Only promote an existing policy version (0: back to the defaults) and exit")
+    args = parser.parse_args(argv)
+    if args.apply and args.dry_run:
+        parser.error("--apply writes a policy version; drop --dry-run")
+    return args
+
+@profiled(entry=True)
+def main(argv=None):
+    args = parse_args(argv)
+    if args.promote is not None:
+        path = promote(args.promote)
+        print(f"Promoted policy: {path or 'decision.POLICY defaults'}")
+        return
+    if not FORECAST_FILE.exists():
+        raise FileNotFoundError("Missing forecast.parquet. Run `python -m src.predict` first.")
+
+    _, last = store.date_bounds(FORECAST_FILE)
+    since = last - pd.Timedelta(days=args.step_days * args.origins + LOOKBACK_DAYS + LEAD_TIME_DAYS)
+    df = store.read_forecast(since=since)
+    windows = window_sums(store.read_forecast(columns=["sku", "channel", "date", "target_units_next_day", "prediction"]),
+                          LEAD_TIME_DAYS)
+    samples = build_samples(df, args.origins, args.step_days, windows=windows, model=load_model(), sales=load_clean_sales())
+    samples = attach_costs(samples, pd.read_csv(PRODUCTS_FILE))
+
+    combos = policy_grid()
+    t0 = time.perf_counter()
+    scores = evaluate(samples, combos)
+    seconds = time.perf_counter() - t0
+    frontier = pareto_frontier(scores)
+    frontier.to_csv(FRONTIER_FILE, index=False)
+
+    current = load_policy()
+    baseline = evaluate(samples, pd.DataFrame([{k: current[k] for k in POLICY_GRID}])).iloc[0]
+    chosen = choose_policy(scores, current)
+
+    print(f"Scored {len(combos)} policies on {len(samples)} samples "
+          f"({samples['origin'].nunique()} decision dates) in {seconds:.2f}s")
+    print(f"Pareto frontier: {len(frontier)} policies, saved to: {FRONTIER_FILE}")
+    print(f"Current policy: over={baseline['over_cost']:.0f} under={baseline['under_cost']:.0f} total={baseline['total_cost']:.0f}")
+    print(f"Chosen        : over={chosen['over_cost']:.0f} under={chosen['under_cost']:.0f} total={chosen['total_cost']:.0f}")
+    print("  " + ", ".join(f"{k}={chosen[k]:g}" for k in POLICY_GRID))
+
+    if not args.dry_run:
+        search = {"policies": len(combos), "samples": len(samples), "origins": args.origins,
+                  "step_days": args.step_days, "lead_time_days": LEAD_TIME_DAYS}
+        path = save_policy(chosen, baseline, search)
+        version = int(path.stem.split("_v")[1])
+        print(f"Policy saved to: {path}")
+        if args.apply:
+            promote(version)
+            print("Promoted: decision uses it from the next run")
+        else:
+            print(f"Not in use until promoted: python -m src.tune_policy --promote {version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import features, schema
+
+SKUS = ["FB_LATTE_VAN", "FB_LATTE_MOCHA", "FB_FRAPPE_CHOC"]
+CHANNELS = ["online", "retail"]
+START_DATE = "2025-03-01"
+END_DATE = "2025-09-30"   # straddles train.SPLIT_DATE
+
+
+@pytest.fixture
+def sales() -> pd.DataFrame:
+    """Small clean-sales frame: weekly seasonality, price changes and promos per series."""
+    rng = np.random.default_rng(7)
+    dates = pd.date_range(START_DATE, END_DATE, freq="D")
+    frames = []
+    for i, sku in enumerate(SKUS):
+        for channel in CHANNELS:
+            promo = (rng.random(len(dates)) < 0.1).astype(int)
+            price = np.round(4.5 + i - 0.5 * promo + rng.normal(0, 0.05, len(dates)), 2)
+            weekly = 1 + 0.3 * (dates.dayofweek >= 5)
+            units = rng.poisson((30 + 10 * i) * weekly * (1 + 0.4 * promo))
+            frames.append(pd.DataFrame({"date": dates, "sku": sku, "channel": channel,
+                                        "units_sold": units, "price": price, "promo_flag": promo}))
+    # One series that only starts mid-way
+    late = frames[0][frames[0]["date"] >= "2025-06-15"].assign(sku="FB_COLD_BREW")
+    return schema.cast(pd.concat(frames + [late], ignore_index=True), "clean_sales")
+
+
+@pytest.fixture
+def features_df(sales) -> pd.DataFrame:
+    return features.model_frame(features.build_features(sales))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty project dir: stage modules use paths relative to the working directory."""
+    (tmp_path / "data" / "processed").mkdir(parents=True)
+    (tmp_path / "models").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from src import features, schema, store
+
+
+def write_clean(sales):
+    schema.write_parquet(sales, features.CLEAN_PARQUET, "clean_sales")
+
+
+def sorted_features(df):
+    return df.sort_values(["sku", "channel", "date"], kind="stable").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("ipc", ["1", "0"])
+def test_incremental_matches_full_rebuild(workdir, sales, monkeypatch, ipc):
+    """Two incremental runs on top of a full run give the rows a full rebuild gives."""
+    monkeypatch.setenv(store.IPC_ENV, ipc)
+    cuts = [pd.Timestamp("2025-06-20"), pd.Timestamp("2025-08-05")]
+
+    write_clean(sales[sales["date"] <= cuts[0]])
+    features.run_full()
+    run_id = features.full_run_id()
+    write_clean(sales[sales["date"] <= cuts[1]])
+    assert features.run_incremental() is not None
+    write_clean(sales)
+    assert features.run_incremental() is not None
+
+    expected = sorted_features(features.model_frame(features.build_features(sales)))
+    got = sorted_features(store.read_features())
+    pd.testing.assert_frame_equal(got, expected)
+    # Incremental runs extend the full run they started from
+    assert features.full_run_id() == run_id
+
+
+def test_incremental_without_new_sales_writes_nothing(workdir, sales):
+    write_clean(sales)
+    features.run_full()
+    _, model_df, path = features.run_incremental()
+    assert path is None and len(model_df) == 0
+
+
+def test_incremental_needs_state(workdir, sales):
+    write_clean(sales)
+    assert features.run_incremental() is None
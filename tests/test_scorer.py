@@ -0,0 +1,32 @@
+import numpy as np
+
+from src import train
+from src.scorer import LinearScorer
+
+
+def test_linear_scorer_matches_pipeline(features_df):
+    pipe, _, X_valid = train.fit(features_df)
+    scorer = LinearScorer.from_pipeline(pipe)
+    np.testing.assert_allclose(scorer.predict(X_valid), pipe.predict(X_valid), rtol=1e-9, atol=1e-9)
+
+
+def test_linear_scorer_imputes_like_pipeline(features_df):
+    """Missing numerics take the train medians; missing and unseen categories match the one-hot encoder."""
+    pipe, _, X_valid = train.fit(features_df)
+    scorer = LinearScorer.from_pipeline(pipe)
+
+    X = X_valid.head(40).copy()
+    X = X.astype({"sku": "object", "channel": "object"})
+    X.loc[X.index[:10], "price_lag_7"] = np.nan
+    X.loc[X.index[5:15], "units_roll7_mean"] = np.nan
+    X.loc[X.index[20:25], "sku"] = "FB_NOT_IN_TRAIN"
+    X.loc[X.index[30:35], "channel"] = np.nan   # how a missing category comes out of the features store
+    np.testing.assert_allclose(scorer.predict(X), pipe.predict(X), rtol=1e-9, atol=1e-9)
+
+
+def test_linear_scorer_save_load_round_trip(features_df, tmp_path):
+    pipe, _, X_valid = train.fit(features_df)
+    scorer = LinearScorer.from_pipeline(pipe, model_digest="abc")
+    loaded = LinearScorer.load(scorer.save(tmp_path / "scorer.npz"))
+    assert loaded.model_digest == "abc"
+    np.testing.assert_array_equal(loaded.predict(X_valid), scorer.predict(X_valid))
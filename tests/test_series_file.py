@@ -0,0 +1,37 @@
+import pandas as pd
+import pyarrow as pa
+
+from src import features, predict, schema, series_file, train
+
+
+def test_daily_segments_read_and_compact_like_a_rebuild(workdir, sales, features_df, monkeypatch):
+    pipe, meta, X_valid = train.fit(features_df)
+    train.save_model(pipe, meta, X_valid)
+    monkeypatch.setattr(series_file, "COMPACT_SEGMENTS", 3)
+
+    def run(cut, *args):
+        schema.write_parquet(sales[sales["date"] <= cut], features.CLEAN_PARQUET, "clean_sales")
+        if args:
+            features.run_full()
+        else:
+            features.run_incremental()
+        predict.main(["--horizon", "0", "--workers", "1", *args])
+
+    run(sales["date"].max(), "--full")
+    expected = pa.ipc.open_file(str(series_file.SERIES_FILE)).read_all()
+    keys = pd.read_parquet(series_file.SERIES_INDEX_FILE)[series_file.KEYS]
+    rebuilt = series_file.open_series()
+
+    run(sales["date"].max() - pd.Timedelta(days=4), "--full")
+    for day in range(3, -1, -1):
+        run(sales["date"].max() - pd.Timedelta(days=day))
+    assert len(series_file.segment_files()) == 1   # three appends compacted, then one more
+
+    tables, index = series_file.open_series()
+    for sku, channel in keys.itertuples(index=False):
+        pd.testing.assert_frame_equal(series_file.read_series(tables, index, sku, channel).reset_index(drop=True),
+                                      series_file.read_series(*rebuilt, sku, channel).reset_index(drop=True))
+
+    series_file.compact()
+    assert series_file.segment_files() == []
+    assert pa.ipc.open_file(str(series_file.SERIES_FILE)).read_all().equals(expected)
@@ -0,0 +1,32 @@
+import numpy as np
+
+from src import features, store, train
+from src.scorer import LinearScorer
+
+
+def write_features(df):
+    features.reset_features_dir()
+    store.write_partitioned(df, features.FEATURES_FILE, "features", name="part-test")
+
+
+def test_streaming_fit_matches_batch_fit(workdir, features_df, monkeypatch):
+    # Missing values exercise the streamed medians; small batches split every partition
+    rng = np.random.default_rng(3)
+    df = features_df.copy()
+    for col in ["price_lag_7", "units_roll14_mean", "promo_lag_14"]:
+        df.loc[rng.random(len(df)) < 0.05, col] = np.nan
+    write_features(df)
+    monkeypatch.setattr(train, "STREAM_BATCH_ROWS", 97)
+
+    pipe, meta, X_valid = train.fit(store.read_features())
+    scorer, stream_meta = train.fit_streaming()
+    ref = LinearScorer.from_pipeline(pipe)
+
+    np.testing.assert_array_equal(scorer.medians, ref.medians)
+    assert scorer.cat_fill == ref.cat_fill
+    for got, expected in zip(scorer.vocabs, ref.vocabs):
+        np.testing.assert_array_equal(got, expected)
+    np.testing.assert_allclose(scorer.predict(X_valid), pipe.predict(X_valid), rtol=1e-7, atol=1e-6)
+    assert stream_meta["train_rows"] == meta["train_rows"]
+    assert stream_meta["valid_rows"] == meta["valid_rows"]
+    assert np.isclose(stream_meta["metrics"]["ridge"]["mae"], meta["metrics"]["ridge"]["mae"], rtol=1e-6)